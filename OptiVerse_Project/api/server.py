@@ -0,0 +1,214 @@
+import os
+import json
+import hmac
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from modules.api_config.config_manager import get_snowflake_connections
+from modules.query_optimizer.core import optimize_query, optimize_and_explain, get_column_hints, DEFAULT_PROVIDER, DEFAULT_MODEL
+from modules.query_optimizer.explain_utils import run_explain, is_plan_error
+from modules.query_optimizer.candidate_search import search_rewrites
+from modules.query_optimizer.template_cache import remember_rewrite
+from modules.stale_tables.stale_scan import run_stale_scan, valid_keyword
+from shared.home_metrics import get_home_metrics
+from modules.ledger.ledger import record_optimization, start_periodic_sync
+from shared.connection_pool import close_all
+from llm.ollama_manager import preload_configured_model
+from shared.fanout import fan_out, merge_tagged, fan_out_status, DEFAULT_TIMEOUT_SECONDS
+
+DEFAULT_PORT = 8080
+DEFAULT_WORKERS = 16
+# Requests waiting beyond the pool are refused with 503 instead of piling up threads
+MAX_PENDING_REQUESTS = 256
+MAX_BODY_BYTES = 1_000_000
+# Each candidate holds a worker thread and an LLM call for the whole search
+MAX_CANDIDATES = 8
+
+class BadRequest(Exception):
+    pass
+
+def _connection(params: dict) -> dict:
+    name = params.get("connection")
+    conn_details = get_snowflake_connections().get(name)
+    if not conn_details:
+        raise BadRequest(f"Unknown connection: {name}")
+    return conn_details
+
+def _require(params: dict, key: str):
+    if not params.get(key):
+        raise BadRequest(f"Missing field: {key}")
+    return params[key]
+
+def handle_home_metrics(params: dict) -> dict:
+    return get_home_metrics(_connection(params))
+
+def handle_explain(params: dict) -> dict:
+    return {"plan": run_explain(_require(params, "query"), _connection(params))}
+
+def handle_optimize(params: dict) -> dict:
+    query, conn_details = _require(params, "query"), _connection(params)
+    provider, model = params.get("provider") or DEFAULT_PROVIDER, params.get("model") or DEFAULT_MODEL
+    if params.get("explain"):
+        result = optimize_and_explain(query, conn_details, provider, model, params.get("workload_hint", ""))
+        # A reused template shares its shape with an earlier entry, whose savings already count
+        if result["valid"] and not result["template_reused"]:
+            result["ledger_entry"] = record_optimization(conn_details, query, result["optimized_query"], result["original_plan"],
+                                                         result["optimized_plan"], "llm", provider, model)
+        return result
+    return optimize_query(query, conn_details, provider, model, params.get("workload_hint", ""))
+
+def handle_search(params: dict) -> dict:
+    query, conn_details = _require(params, "query"), _connection(params)
+    providers = params.get("providers") or [[DEFAULT_PROVIDER, DEFAULT_MODEL]]
+    if not isinstance(providers, list) or not all(
+            isinstance(p, list) and len(p) == 2 and all(isinstance(v, str) for v in p) for p in providers):
+        raise BadRequest("providers must be a list of [provider, model] pairs")
+    n_candidates = int(params.get("n_candidates", 4))
+    if not 1 <= n_candidates <= MAX_CANDIDATES:
+        raise BadRequest(f"n_candidates must be between 1 and {MAX_CANDIDATES}")
+
+    schema_hint, candidate_hint = get_column_hints(query, conn_details)
+    search = search_rewrites(query, conn_details, [tuple(p) for p in providers], n_candidates, schema_hint,
+                             params.get("workload_hint", ""), candidate_hint, bool(params.get("early_stop", True)))
+    best = search["best"]
+    if best and not is_plan_error(search["original_plan"]):
+        kind = f"llm:{best['strategy']}"
+        search["ledger_entry"] = record_optimization(conn_details, query, best["query"], search["original_plan"], best["plan"],
+                                                     kind, best["provider"], best.get("model", ""))
+        remember_rewrite(conn_details, query, best["query"], search["original_plan"], best["plan"], kind,
+                         best["provider"], best.get("model", ""))
+    return search
+
+def handle_stale_tables(params: dict) -> dict:
+    keywords = params.get("keywords")
+    # A bare string would be scanned one character at a time
+    if keywords is not None and not (isinstance(keywords, list) and all(valid_keyword(k) for k in keywords)):
+        raise BadRequest("keywords must be a list of words made of letters, digits and underscores")
+    tables = run_stale_scan(_connection(params), keywords, int(params.get("inactivity_days", 30)))
+    return {"tables": tables}
+
+def handle_fleet_metrics(params: dict) -> dict:
+    results = fan_out(get_home_metrics, get_snowflake_connections(), timeout=float(params.get("timeout", DEFAULT_TIMEOUT_SECONDS)))
+    return {"metrics": merge_tagged(results), "status": fan_out_status(results)}
+
+ROUTES = {
+    ("GET", "/metrics/home"): handle_home_metrics,
+    ("POST", "/explain"): handle_explain,
+    ("POST", "/optimize"): handle_optimize,
+    ("POST", "/search"): handle_search,
+    ("POST", "/stale-tables"): handle_stale_tables,
+    ("GET", "/fleet/metrics"): handle_fleet_metrics,
+}
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "OptiVerse/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status: int, body: dict):
+        payload = json.dumps(body, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _authorized(self) -> bool:
+        token = self.server.token
+        if not token:
+            return True
+        return hmac.compare_digest(self.headers.get("Authorization", ""), f"Bearer {token}")
+
+    def _dispatch(self, method: str):
+        url = urlparse(self.path)
+        # Always drain the body so a refused request does not leave bytes on a keep-alive connection
+        try:
+            length = int(self.headers.get("Content-Length", 0) or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # The body cannot be drained without a usable length, so the connection is not reused
+            self.close_connection = True
+            return self._send(400, {"error": "Invalid Content-Length"})
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            return self._send(413, {"error": "Request body too large"})
+        body = self.rfile.read(length) if length else b""
+
+        if url.path == "/health":
+            return self._send(200, {"status": "ok"})
+        if not self._authorized():
+            return self._send(401, {"error": "Unauthorized"})
+        handler = ROUTES.get((method, url.path))
+        if handler is None:
+            return self._send(404, {"error": f"No route for {method} {url.path}"})
+
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        try:
+            if method == "POST":
+                params.update(json.loads(body or b"{}"))
+            self._send(200, handler(params))
+        except (BadRequest, ValueError) as e:
+            self._send(400, {"error": str(e)})
+        except Exception as e:
+            self._send(500, {"error": str(e)})
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that hands each connection to a bounded worker pool instead of a new thread."""
+
+    daemon_threads = True
+
+    def __init__(self, address, handler, workers: int, token: str = ""):
+        super().__init__(address, handler)
+        self.token = token
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="optiverse-api")
+        self.pending = threading.BoundedSemaphore(MAX_PENDING_REQUESTS)
+
+    def process_request(self, request, client_address):
+        if not self.pending.acquire(blocking=False):
+            request.sendall(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            self.shutdown_request(request)
+            return
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.pending.release()
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+        close_all()
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless OptiVerse API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("OPTIVERSE_API_PORT", DEFAULT_PORT)))
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    preload_configured_model()
+    start_periodic_sync(get_snowflake_connections)
+    server = PooledHTTPServer((args.host, args.port), ApiHandler, args.workers, os.getenv("OPTIVERSE_API_TOKEN", ""))
+    print(f"OptiVerse API listening on http://{args.host}:{args.port} with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import time
+import hashlib
+import threading
+from concurrent.futures import Future
+from modules.api_config.config_manager import load_all_config
+from llm.ollama_helpers import LLMError
+
+# Requests per minute and tokens per minute; None means unmetered
+DEFAULT_RATE_LIMITS = {
+    "groq": {"rpm": 30, "tpm": 6000},
+    "together": {"rpm": 60, "tpm": 60000},
+    "ollama": {"rpm": None, "tpm": None},
+}
+CHARS_PER_TOKEN = 4
+# Longest a caller queues for its turn; metering runs on the router's shared executor, so an unbounded
+# wait behind a paused provider would hold a worker that other providers' calls need
+METER_WAIT_S = 60.0
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+# --- Token Buckets with a FIFO Wait Queue ---
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        # Requests larger than the bucket are admitted once it is full rather than never
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+class ProviderMeter:
+    def __init__(self, rpm: float = None, tpm: float = None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.condition = threading.Condition()
+        self.next_ticket = 0
+        self.serving = 0
+        self.abandoned = set()
+        self.paused_until = 0.0
+
+    def acquire(self, tokens: int, timeout: float = None):
+        """Waits for this caller's turn and its budget; raises LLMError once timeout seconds pass."""
+        buckets = [(b, n) for b, n in [(self.requests, 1), (self.tokens, tokens)] if b]
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.condition:
+            ticket = self.next_ticket
+            self.next_ticket += 1
+            # Tickets are served strictly in arrival order so no caller starves
+            while True:
+                now = time.monotonic()
+                delay = None
+                if ticket == self.serving:
+                    for bucket, _ in buckets:
+                        bucket.refill(now)
+                    delay = max([self.paused_until - now] + [b.wait_time(n) for b, n in buckets])
+                    if delay <= 0:
+                        for bucket, amount in buckets:
+                            bucket.tokens -= min(amount, bucket.capacity)
+                        self._advance(ticket)
+                        return
+                if deadline is not None:
+                    if now >= deadline:
+                        # Give up the ticket so the callers queued behind it are not stuck waiting for it
+                        self._advance(ticket)
+                        raise LLMError(f"Rate limit queue wait exceeded {timeout:g}s.")
+                    delay = min(delay, deadline - now) if delay is not None else deadline - now
+                self.condition.wait(delay)
+
+    def _advance(self, ticket: int):
+        # Called with the condition held when a ticket is served or given up; a ticket given up out of turn is
+        # skipped once the queue reaches it
+        if ticket != self.serving:
+            self.abandoned.add(ticket)
+            return
+        self.serving += 1
+        while self.serving in self.abandoned:
+            self.abandoned.discard(self.serving)
+            self.serving += 1
+        self.condition.notify_all()
+
+    def pause(self, seconds: float):
+        with self.condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+_meters = {}
+_meters_lock = threading.Lock()
+
+def get_meter(provider: str) -> ProviderMeter:
+    with _meters_lock:
+        if provider not in _meters:
+            limits = {**DEFAULT_RATE_LIMITS.get(provider, {}), **load_all_config().get("rate_limits", {}).get(provider, {})}
+            _meters[provider] = ProviderMeter(limits.get("rpm"), limits.get("tpm"))
+        return _meters[provider]
+
+def meter_request(provider: str, prompt: str, timeout: float = METER_WAIT_S):
+    get_meter(provider).acquire(estimate_tokens(prompt), timeout)
+
+def back_off(provider: str, retry_after: float = None):
+    # A 429 drains the whole provider queue instead of letting every waiter retry at once
+    get_meter(provider).pause(retry_after or 5.0)
+
+# --- Single-Flight Coalescing ---
+
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+def request_key(*parts) -> str:
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+def single_flight(key: str, fn):
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _in_flight[key] = future
+
+    if not leader:
+        return future.result()
+
+    try:
+        future.set_result(fn())
+    except BaseException as e:
+        future.set_exception(e)
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+    return future.result()
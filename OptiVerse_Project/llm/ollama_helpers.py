@@ -3,30 +3,50 @@ from together import Together
 from modules.api_config.config_manager import get_api_credentials
 
 OLLAMA_URL = "http://localhost:11434"
+# Only for the liveness check; generation timeouts are set by llm.ollama_manager
 TIMEOUT_MS = 10000
+GROQ_TIMEOUT_MS = 60000
 
-# Unified LLM call
-def call_llm(prompt: str, model: str, provider: str = "together") -> str:
+class LLMError(Exception):
+    pass
+
+class LLMRateLimitError(LLMError):
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def _retry_after(response) -> float:
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+# Single provider call, raises LLMError on any failure
+def call_provider(prompt: str, model: str, provider: str, temperature: float = None) -> str:
     provider = provider.lower()
     creds = get_api_credentials().get(provider, {})
     api_key = creds.get("api_key", "")
 
     if provider == "ollama":
+        from llm.ollama_manager import get_ollama_manager, ollama_settings
+
         if not is_ollama_up():
-            return "❌ Ollama is not running. Please start it with: `ollama run model-name`"
+            raise LLMError("Ollama is not running. Please start it with: `ollama run model-name`")
+        # The manager queues beyond the host's concurrency and allows for a cold model load
         try:
-            response = requests.post(
-                f"{OLLAMA_URL}/api/generate",
-                json={"model": model, "prompt": prompt, "stream": False},
-                timeout=TIMEOUT_MS / 1000
+            response = get_ollama_manager().generate(
+                {"model": model, "prompt": prompt, "stream": False, "keep_alive": ollama_settings()["keep_alive"],
+                 **({"options": {"temperature": temperature}} if temperature is not None else {})}
             )
-            if response.status_code == 200:
-                result = response.json().get("response", "").strip()
-                return result.replace("```sql", "").replace("```", "").strip() or "⚠️ No output from the model."
-            else:
-                return f"❌ Ollama error {response.status_code}: {response.text}"
-        except requests.exceptions.RequestException as e:
-            return f"❌ Ollama request failed: {e}"
+        except (requests.exceptions.RequestException, TimeoutError) as e:
+            raise LLMError(f"Ollama request failed: {e}")
+        if response.status_code != 200:
+            raise LLMError(f"Ollama error {response.status_code}: {response.text}")
+        result = response.json().get("response", "").strip()
+        result = result.replace("```sql", "").replace("```", "").strip()
+        if not result:
+            raise LLMError("No output from the model.")
+        return result
 
     elif provider == "together":
         try:
@@ -34,31 +54,67 @@ def call_llm(prompt: str, model: str, provider: str = "together") -> str:
             response = client.chat.completions.create(
                 model=model,
                 messages=[{"role": "user", "content": prompt}],
-                stream=False
+                stream=False,
+                **({"temperature": temperature} if temperature is not None else {})
             )
             return response.choices[0].message.content.strip()
         except Exception as e:
-            return f"❌ Together API error: {e}"
+            if getattr(e, "status_code", None) == 429:
+                raise LLMRateLimitError(f"Together API rate limited: {e}")
+            raise LLMError(f"Together API error: {e}")
 
     elif provider == "groq":
+        headers = {"Authorization": f"Bearer {api_key}"}
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt}
+            ]
+        }
+        if temperature is not None:
+            payload["temperature"] = temperature
         try:
-            headers = {"Authorization": f"Bearer {api_key}"}
-            payload = {
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": prompt}
-                ]
-            }
-            response = requests.post("https://api.groq.com/openai/v1/chat/completions", headers=headers, json=payload)
-            if response.status_code == 200:
-                return response.json()["choices"][0]["message"]["content"].strip()
-            else:
-                return f"❌ Groq error {response.status_code}: {response.text}"
+            response = requests.post("https://api.groq.com/openai/v1/chat/completions", headers=headers, json=payload,
+                                     timeout=GROQ_TIMEOUT_MS / 1000)
         except Exception as e:
-            return f"❌ Groq request failed: {e}"
+            raise LLMError(f"Groq request failed: {e}")
+        if response.status_code == 429:
+            raise LLMRateLimitError(f"Groq rate limited: {response.text}", _retry_after(response))
+        if response.status_code != 200:
+            raise LLMError(f"Groq error {response.status_code}: {response.text}")
+        return response.json()["choices"][0]["message"]["content"].strip()
+
+    raise LLMError("Unknown provider specified. Use 'together', 'groq', or 'ollama'.")
+
+# Unified LLM call
+def call_llm(prompt: str, model: str, provider: str = "together", temperature: float = None) -> str:
+    from llm.provider_router import route_llm
+    from llm.gateway import single_flight, request_key
+
+    from shared.cassette import get_cassette, record_llm, replay_llm
+    from shared.shared_cache import shared_cached
+
+    cassette = get_cassette()
+    if cassette is not None and cassette.mode == "replay":
+        return replay_llm(cassette, prompt, model, provider, temperature)
+
+    def call():
+        # Identical concurrent prompts (e.g. several tabs) share one upstream request
+        key = request_key(provider.lower(), model, temperature, prompt)
+
+        def live():
+            try:
+                return single_flight(key, lambda: route_llm(prompt, model, provider, temperature))
+            except LLMError as e:
+                return f"❌ {e}"
+
+        # In server mode a completion is also reused by later sessions sending the same prompt
+        return shared_cached("llm", [key], live, keep=lambda result: not result.startswith("❌"))
 
-    return "⚠️ Unknown provider specified. Use 'together', 'groq', or 'ollama'."
+    if cassette is not None:
+        return record_llm(cassette, call, prompt, model, provider, temperature)
+    return call()
 
 def is_ollama_up(timeout=TIMEOUT_MS) -> bool:
     try:
@@ -0,0 +1,159 @@
+import time
+import threading
+import requests
+from modules.api_config.config_manager import get_api_credentials
+from llm.ollama_helpers import OLLAMA_URL
+
+DEFAULT_KEEP_ALIVE = "30m"
+# CPU-only hosts serve one generation at a time well; more just slows every request down
+DEFAULT_MAX_CONCURRENCY = 1
+# A cold load of a large model on CPU can take minutes; a warm generation should not
+LOAD_TIMEOUT_S = 300
+GENERATE_TIMEOUT_S = 120
+QUEUE_TIMEOUT_S = 300
+PS_CACHE_SECONDS = 5
+
+def keep_alive_value(value):
+    # Ollama reads a bare number as seconds only when it is a JSON number; the string "-1" is rejected
+    value = str(value if value is not None else "").strip() or DEFAULT_KEEP_ALIVE
+    return int(value) if value.lstrip("-").isdigit() else value
+
+def ollama_settings() -> dict:
+    creds = get_api_credentials().get("ollama", {})
+    return {
+        "model": creds.get("model", ""),
+        "keep_alive": keep_alive_value(creds.get("keep_alive")),
+        "max_concurrency": int(creds.get("max_concurrency") or DEFAULT_MAX_CONCURRENCY),
+    }
+
+def _same_model(name: str, model: str) -> bool:
+    # /api/ps reports the full tag, e.g. "mistral:latest" for "mistral"
+    return name == model or name == f"{model}:latest"
+
+class OllamaManager:
+    """Keeps the configured Ollama model resident and queues generations beyond what the host can serve."""
+
+    def __init__(self, max_concurrency: int):
+        self.lock = threading.Lock()
+        self.max_concurrency = max_concurrency
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.in_flight = 0
+        self.queued = 0
+        self.loading = set()
+        self.errors = {}
+        self.ps_cache = (0.0, [])
+
+    # --- Resident Models ---
+
+    def running_models(self, refresh: bool = False) -> list:
+        with self.lock:
+            fetched_at, models = self.ps_cache
+        if not refresh and time.monotonic() - fetched_at < PS_CACHE_SECONDS:
+            return models
+        try:
+            response = requests.get(f"{OLLAMA_URL}/api/ps", timeout=2)
+            models = response.json().get("models", []) if response.status_code == 200 else []
+        except (requests.exceptions.RequestException, ValueError):
+            models = []
+        with self.lock:
+            self.ps_cache = (time.monotonic(), models)
+        return models
+
+    def is_loaded(self, model: str) -> bool:
+        return any(_same_model(m.get("name", ""), model) for m in self.running_models())
+
+    def _load(self, model: str, keep_alive):
+        try:
+            # A generate request without a prompt only loads the model
+            response = requests.post(f"{OLLAMA_URL}/api/generate", json={"model": model, "keep_alive": keep_alive},
+                                     timeout=LOAD_TIMEOUT_S)
+            error = None if response.status_code == 200 else f"Ollama error {response.status_code}: {response.text}"
+        except requests.exceptions.RequestException as e:
+            error = f"Ollama load failed: {e}"
+        with self.lock:
+            self.loading.discard(model)
+            if error:
+                self.errors[model] = error
+            else:
+                self.errors.pop(model, None)
+            self.ps_cache = (0.0, [])
+
+    def preload(self, model: str, keep_alive) -> bool:
+        with self.lock:
+            if not model or model in self.loading:
+                return False
+            self.loading.add(model)
+        threading.Thread(target=self._load, args=(model, keep_alive), name="ollama-preload", daemon=True).start()
+        return True
+
+    # --- Generation ---
+
+    def generate(self, payload: dict) -> requests.Response:
+        model = payload["model"]
+        with self.lock:
+            self.queued += 1
+        acquired = self.slots.acquire(timeout=QUEUE_TIMEOUT_S)
+        with self.lock:
+            self.queued -= 1
+            if acquired:
+                self.in_flight += 1
+        if not acquired:
+            raise TimeoutError(f"Waited {QUEUE_TIMEOUT_S}s for a free Ollama slot")
+        try:
+            # Allow for the load only when the model is not already resident
+            read_timeout = GENERATE_TIMEOUT_S if self.is_loaded(model) else LOAD_TIMEOUT_S + GENERATE_TIMEOUT_S
+            return requests.post(f"{OLLAMA_URL}/api/generate", json=payload, timeout=(5, read_timeout))
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+                self.ps_cache = (0.0, [])
+            self.slots.release()
+
+    def status(self, model: str) -> dict:
+        resident = next((m for m in self.running_models() if _same_model(m.get("name", ""), model)), None)
+        with self.lock:
+            if resident:
+                state = "loaded"
+            elif model in self.loading:
+                state = "loading"
+            elif model in self.errors:
+                state = "error"
+            else:
+                state = "not loaded"
+            return {
+                "model": model,
+                "state": state,
+                "error": self.errors.get(model),
+                "expires_at": resident.get("expires_at") if resident else None,
+                "size_vram": resident.get("size_vram") if resident else None,
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "max_concurrency": self.max_concurrency,
+            }
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_ollama_manager() -> OllamaManager:
+    global _manager
+    with _manager_lock:
+        # The concurrency cap is read once; changing it takes effect on the next start
+        if _manager is None:
+            _manager = OllamaManager(ollama_settings()["max_concurrency"])
+        return _manager
+
+_preloaded = set()
+
+def preload_configured_model():
+    """Starts loading the configured Ollama model once per process; later calls are no-ops."""
+    settings = ollama_settings()
+    model = settings["model"]
+    with _manager_lock:
+        if not model or model in _preloaded:
+            return
+        _preloaded.add(model)
+    get_ollama_manager().preload(model, settings["keep_alive"])
+
+def ollama_status() -> dict:
+    model = ollama_settings()["model"]
+    return get_ollama_manager().status(model) if model else None
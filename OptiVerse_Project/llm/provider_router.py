@@ -0,0 +1,178 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from llm.ollama_helpers import call_provider, LLMError, LLMRateLimitError
+from llm.gateway import meter_request, back_off, METER_WAIT_S
+from modules.api_config.config_manager import get_api_credentials
+
+STATS_WINDOW = 50
+MIN_SAMPLES_FOR_P95 = 5
+DEFAULT_HEDGE_AFTER_S = 8.0
+MIN_HEDGE_AFTER_S = 1.0
+FAILURE_THRESHOLD = 3
+CIRCUIT_COOLDOWN_S = 60
+
+# --- Rolling Provider Health ---
+
+class ProviderStats:
+    def __init__(self):
+        self.latencies = deque(maxlen=STATS_WINDOW)
+        self.outcomes = deque(maxlen=STATS_WINDOW)
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_started = None
+
+    def p95(self) -> float:
+        if len(self.latencies) < MIN_SAMPLES_FOR_P95:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(0.95 * len(ordered)), len(ordered) - 1)]
+
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def circuit_state(self, now: float) -> str:
+        if self.opened_at is None:
+            return "closed"
+        # After the cooldown one trial request is let through (half-open)
+        return "half-open" if now - self.opened_at >= CIRCUIT_COOLDOWN_S else "open"
+
+    def admit(self, now: float) -> bool:
+        """Whether a request may go to this provider; a half-open circuit admits one trial until it is recorded."""
+        state = self.circuit_state(now)
+        if state != "half-open":
+            return state == "closed"
+        # A trial that never records (its rate-limit wait ran out) stops blocking after another cooldown
+        if self.trial_started is not None and now - self.trial_started < CIRCUIT_COOLDOWN_S:
+            return False
+        self.trial_started = now
+        return True
+
+    def record(self, ok: bool, latency: float, now: float):
+        self.trial_started = None
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+            self.opened_at = None
+        else:
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= FAILURE_THRESHOLD:
+                self.opened_at = now
+
+_stats = {}
+_stats_lock = threading.RLock()
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-router")
+
+def _get_stats(provider: str, model: str) -> ProviderStats:
+    with _stats_lock:
+        return _stats.setdefault((provider, model), ProviderStats())
+
+def _hedge_after(provider: str, model: str) -> float:
+    p95 = _get_stats(provider, model).p95()
+    return max(p95, MIN_HEDGE_AFTER_S) if p95 is not None else DEFAULT_HEDGE_AFTER_S
+
+def _timed_call(prompt: str, model: str, provider: str, temperature: float, meter_timeout: float) -> str:
+    # A rate-limit wait that runs out raises LLMError without counting against the provider's health
+    meter_request(provider, prompt, meter_timeout)
+    started = time.monotonic()
+    try:
+        result = call_provider(prompt, model, provider, temperature)
+    except Exception as e:
+        if isinstance(e, LLMRateLimitError):
+            back_off(provider, e.retry_after)
+        with _stats_lock:
+            _get_stats(provider, model).record(False, time.monotonic() - started, time.monotonic())
+        if isinstance(e, LLMError):
+            raise
+        raise LLMError(f"{provider} call failed: {e}") from e
+    with _stats_lock:
+        _get_stats(provider, model).record(True, time.monotonic() - started, time.monotonic())
+    return result
+
+def provider_chain(provider: str, model: str) -> list:
+    provider = provider.lower()
+    fallbacks = [
+        (name, creds.get("model", ""))
+        for name, creds in get_api_credentials().items()
+        if name != provider and creds.get("model") and (creds.get("api_key") or name == "ollama")
+    ]
+    now = time.monotonic()
+
+    def score(target):
+        stats = _get_stats(*target)
+        return (stats.error_rate(), stats.p95() or DEFAULT_HEDGE_AFTER_S)
+
+    chain = [(provider, model)] + sorted(fallbacks, key=score)
+    available = [t for t in chain if _get_stats(*t).circuit_state(now) != "open"]
+    # With every circuit open, still try the selected provider rather than fail outright
+    return available or chain[:1]
+
+# --- Hedged Routing ---
+
+def route_llm(prompt: str, model: str, provider: str = "together", temperature: float = None) -> str:
+    chain = provider_chain(provider, model)
+    pending = {}
+    errors = []
+    next_index = 0
+
+    def submit(target):
+        # A provider with a fallback behind it queues no longer than the hedge delay; the fallback takes over then
+        meter_timeout = _hedge_after(*target) if next_index < len(chain) else METER_WAIT_S
+        pending[_executor.submit(_timed_call, prompt, target[1], target[0], temperature, meter_timeout)] = target
+        return target
+
+    def launch():
+        # Next provider in the chain that admits a request; half-open ones with a trial in flight are passed over
+        nonlocal next_index
+        while next_index < len(chain):
+            target = chain[next_index]
+            next_index += 1
+            with _stats_lock:
+                admitted = _get_stats(*target).admit(time.monotonic())
+            if admitted:
+                return submit(target)
+        return None
+
+    last_launched = launch()
+    if last_launched is None:
+        # Every circuit open: provider_chain already chose to try the selected provider anyway. Otherwise the
+        # remaining providers are half-open with their one trial in flight, and this request must not pile on.
+        if _get_stats(*chain[0]).circuit_state(time.monotonic()) != "open":
+            raise LLMError("Every available provider is recovering and already has its trial request in flight.")
+        last_launched = submit(chain[0])
+    while pending:
+        timeout = _hedge_after(*last_launched) if next_index < len(chain) else None
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+        if not done:
+            # Slower than this provider's p95: race a duplicate on the next-best provider
+            last_launched = launch() or last_launched
+            continue
+
+        for future in done:
+            target = pending.pop(future)
+            try:
+                return future.result()
+            except LLMError as e:
+                errors.append(f"{target[0]}: {e}")
+
+        if not pending and next_index < len(chain):
+            last_launched = launch() or last_launched
+
+    raise LLMError(" | ".join(errors) if errors else "No LLM provider available.")
+
+def provider_health() -> list:
+    now = time.monotonic()
+    with _stats_lock:
+        return [
+            {
+                "Provider": provider,
+                "Model": model,
+                "p95 (s)": round(stats.p95(), 2) if stats.p95() is not None else None,
+                "Error Rate": f"{stats.error_rate():.0%}",
+                "Circuit": stats.circuit_state(now),
+            }
+            for (provider, model), stats in _stats.items()
+        ]
@@ -1,7 +1,12 @@
 import streamlit as st
-from datetime import datetime
 from modules.api_config.config_manager import get_snowflake_connections, get_api_credentials
-from shared.snowflake_connector import connect_to_snowflake
+from llm.provider_router import provider_health
+from llm.ollama_manager import preload_configured_model, ollama_status, get_ollama_manager, ollama_settings
+from shared.jobs import list_jobs, cancel_job, FINISHED_STATES
+from shared.home_metrics import get_home_metrics
+from shared.api_client import api_enabled, call_api
+from shared.shared_cache import session_connections, server_mode, get_shared_cache
+from shared.session_store import purge_stale_spills
 
 # Page setup
 st.set_page_config(page_title="OptiVerse", layout="wide")
@@ -11,11 +16,28 @@ from modules.query_optimizer import streamlit_page as query_optimizer
 from modules.api_config import streamlit_page as api_config
 from modules.stale_tables import stale_tables_page
 from modules.anomaly_detection import anomaly_detection
+from modules.warehouse_sim import streamlit_page as warehouse_sim
+from modules.hotspots import streamlit_page as hotspots_page
+from modules.clustering_advisor import streamlit_page as clustering_advisor
+from modules.mv_advisor import streamlit_page as mv_advisor
+from modules.result_cache import streamlit_page as result_cache
+from modules.idle_burn import streamlit_page as idle_burn
+from modules.fleet import streamlit_page as fleet
+from modules.overhead import streamlit_page as overhead
+from modules.ledger import streamlit_page as ledger
+from modules.ledger.ledger import start_periodic_sync
 
 # Credentials
 llm_creds = get_api_credentials()
 available_providers = list(llm_creds.keys())
 
+# Start loading the local model now so the first optimization does not pay for it
+preload_configured_model()
+# Hourly match of recorded rewrites against QUERY_HISTORY; started once per process
+start_periodic_sync(get_snowflake_connections)
+if server_mode():
+    purge_stale_spills()
+
 # App title
 st.markdown(
     "<div style='position: absolute; top: 10px; left: 15px; font-size: 14px; font-weight: bold; color: #6c757d;'>"
@@ -25,8 +47,9 @@ st.markdown(
 )
 
 # --- Session Initialization ---
-if "snowflake_connections" not in st.session_state:
-    st.session_state.snowflake_connections = get_snowflake_connections()
+# In server mode every session points at one shared dict, refreshed when the config file changes
+if server_mode() or "snowflake_connections" not in st.session_state:
+    st.session_state.snowflake_connections = session_connections()
 if "active_connection_name" not in st.session_state:
     st.session_state.active_connection_name = None
 if "selected_tab" not in st.session_state:
@@ -71,6 +94,44 @@ with st.sidebar:
         key="llm_model"
     )
 
+    health = provider_health()
+    if health:
+        with st.expander("Provider Health"):
+            st.dataframe(health, hide_index=True, use_container_width=True)
+
+    if server_mode():
+        cache = get_shared_cache().stats()
+        with st.expander("Shared Cache"):
+            st.caption(f"{cache['entries']} entries · {cache['bytes'] / 1024 / 1024:,.1f} of {cache['max_bytes'] / 1024 / 1024:,.0f} MB")
+            st.caption(f"{cache['hits']} hits · {cache['misses']} misses")
+
+    ollama = ollama_status()
+    if ollama:
+        with st.expander(f"Ollama ({ollama['state']})", expanded=ollama["state"] != "loaded"):
+            st.caption(f"{ollama['model']} · {ollama['in_flight']}/{ollama['max_concurrency']} generating · {ollama['queued']} queued")
+            if ollama["expires_at"]:
+                st.caption(f"Resident until {ollama['expires_at'][:19].replace('T', ' ')}")
+            if ollama["error"]:
+                st.caption(f"❌ {ollama['error']}")
+            if ollama["state"] in ("not loaded", "error"):
+                st.button("Load model", key="ollama_load", on_click=get_ollama_manager().preload,
+                          args=(ollama["model"], ollama_settings()["keep_alive"]))
+            else:
+                st.button("🔄 Refresh", key="ollama_refresh")
+
+    jobs = list_jobs(limit=10)
+    if jobs:
+        active_jobs = [j for j in jobs if j["status"] not in FINISHED_STATES]
+        with st.expander(f"Background Jobs ({len(active_jobs)} running)", expanded=bool(active_jobs)):
+            st.button("🔄 Refresh", key="jobs_refresh")
+            for job in jobs:
+                st.caption(f"{job['label']} · {job['status']} · {job['done']}/{job['total']}")
+                if job["status"] not in FINISHED_STATES:
+                    st.progress(job["done"] / max(job["total"], 1))
+                    st.button("Cancel", key=f"cancel_{job['job_id']}", on_click=cancel_job, args=(job["job_id"],))
+                elif job["error"]:
+                    st.caption(f"❌ {job['error']}")
+
     st.markdown("<hr style='margin-top:20px;margin-bottom:10px;'>", unsafe_allow_html=True)
 
     st.markdown("<h2 style='color: #4B5563; font-size: 18px;'>🧭 Navigation</h2>", unsafe_allow_html=True)
@@ -82,6 +143,15 @@ with st.sidebar:
         "API Configuration": "🔧 API Config",
         "Anomaly Detection": "📊 Anomaly Detection",
         "Cost Forecasting": "📈 Cost Forecasting",
+        "Warehouse Simulator": "🏭 Warehouse Simulator",
+        "Hotspots": "🔥 Spill & Pruning Hotspots",
+        "Clustering Advisor": "🧭 Clustering Advisor",
+        "MV Advisor": "🧱 Materialized View Advisor",
+        "Result Cache": "♻️ Result Cache Misses",
+        "Idle Burn": "💤 Idle Warehouse Burn",
+        "Fleet": "🌐 Fleet Overview",
+        "Overhead": "🧾 OptiVerse Overhead",
+        "Ledger": "📒 Optimization Ledger",
         "Stale table detection": "🧹 Stale Table Cleanup"
     }
 
@@ -101,29 +171,14 @@ if selected_tab == "Home":
 
     try:
         if active_conn:
-            conn = connect_to_snowflake(active_conn)
-            cur = conn.cursor()
-
-            today_str = datetime.utcnow().strftime('%Y-%m-%d')
-
-            cur.execute(f"""SELECT COUNT(*) FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY WHERE START_TIME::DATE = '{today_str}'""")
-            total_queries = cur.fetchone()[0]
-
-            cur.execute(f"""SELECT SUM(CREDITS_USED) FROM SNOWFLAKE.ACCOUNT_USAGE.WAREHOUSE_METERING_HISTORY WHERE START_TIME::DATE = '{today_str}'""")
-            total_credits = cur.fetchone()[0] or 0
-            estimated_cost = round(total_credits * 1, 2)
-
-            cur.execute("SHOW WAREHOUSES")
-            warehouses = cur.fetchall()
-            active_wh = sum(1 for w in warehouses if "RUNNING" in str(w[5]))
-
-            cur.execute("""SELECT EXECUTION_STATUS FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY WHERE START_TIME >= DATEADD(hour, -1, CURRENT_TIMESTAMP())""")
-            statuses = [row[0] for row in cur.fetchall()]
-            running_q = statuses.count("RUNNING")
-            queued_q = statuses.count("QUEUED")
-
-            cur.close()
-            conn.close()
+            if api_enabled():
+                metrics = call_api("GET", "/metrics/home", params={"connection": active_conn_name})
+            else:
+                metrics = get_home_metrics(active_conn)
+            total_queries = metrics["total_queries"]
+            estimated_cost = metrics["estimated_cost"]
+            active_wh = metrics["active_warehouses"]
+            running_q, queued_q = metrics["running_queries"], metrics["queued_queries"]
         else:
             raise ValueError("No active connection.")
     except Exception as e:
@@ -138,12 +193,16 @@ if selected_tab == "Home":
     col1.metric("Total Queries (Today)", total_queries)
     col2.metric("Estimated Cost ($)", f"${estimated_cost:,.2f}")
     col3.metric("Active Warehouses", active_wh)
+    if active_wh:
+        st.button("Check idle warehouse burn", on_click=lambda: st.session_state.update({"selected_tab": "Idle Burn"}))
 
     st.markdown("---")
     st.subheader("Live Query Status")
     col4, col5 = st.columns(2)
     col4.metric("Running Queries", running_q)
     col5.metric("Queued Queries", queued_q)
+    if queued_q:
+        st.button("Right-size with the Warehouse Simulator", on_click=lambda: st.session_state.update({"selected_tab": "Warehouse Simulator"}))
 
     st.markdown("---")
     st.subheader("System Alerts")
@@ -183,6 +242,73 @@ elif selected_tab == "Anomaly Detection":
 elif selected_tab == "Cost Forecasting":
     st.info("Cost Forecasting module is under development.")
 
+elif selected_tab == "Warehouse Simulator":
+    conn_name = st.session_state.active_connection_name
+    conn_dict = st.session_state.snowflake_connections.get(conn_name)
+    if conn_dict:
+        warehouse_sim.render(conn_dict)
+    else:
+        st.error("❌ No active Snowflake connection. Please connect from the 'Connections' tab.")
+
+elif selected_tab == "Hotspots":
+    conn_name = st.session_state.active_connection_name
+    conn_dict = st.session_state.snowflake_connections.get(conn_name)
+    if conn_dict:
+        hotspots_page.render(conn_dict)
+    else:
+        st.error("❌ No active Snowflake connection. Please connect from the 'Connections' tab.")
+
+elif selected_tab == "Clustering Advisor":
+    conn_name = st.session_state.active_connection_name
+    conn_dict = st.session_state.snowflake_connections.get(conn_name)
+    if conn_dict:
+        clustering_advisor.render(conn_dict)
+    else:
+        st.error("❌ No active Snowflake connection. Please connect from the 'Connections' tab.")
+
+elif selected_tab == "MV Advisor":
+    conn_name = st.session_state.active_connection_name
+    conn_dict = st.session_state.snowflake_connections.get(conn_name)
+    if conn_dict:
+        mv_advisor.render(conn_dict)
+    else:
+        st.error("❌ No active Snowflake connection. Please connect from the 'Connections' tab.")
+
+elif selected_tab == "Result Cache":
+    conn_name = st.session_state.active_connection_name
+    conn_dict = st.session_state.snowflake_connections.get(conn_name)
+    if conn_dict:
+        result_cache.render(conn_dict)
+    else:
+        st.error("❌ No active Snowflake connection. Please connect from the 'Connections' tab.")
+
+elif selected_tab == "Idle Burn":
+    conn_name = st.session_state.active_connection_name
+    conn_dict = st.session_state.snowflake_connections.get(conn_name)
+    if conn_dict:
+        idle_burn.render(conn_dict)
+    else:
+        st.error("❌ No active Snowflake connection. Please connect from the 'Connections' tab.")
+
+elif selected_tab == "Fleet":
+    fleet.render(st.session_state.snowflake_connections)
+
+elif selected_tab == "Overhead":
+    conn_name = st.session_state.active_connection_name
+    conn_dict = st.session_state.snowflake_connections.get(conn_name)
+    if conn_dict:
+        overhead.render(conn_dict)
+    else:
+        st.error("❌ No active Snowflake connection. Please connect from the 'Connections' tab.")
+
+elif selected_tab == "Ledger":
+    conn_name = st.session_state.active_connection_name
+    conn_dict = st.session_state.snowflake_connections.get(conn_name)
+    if conn_dict:
+        ledger.render(conn_dict)
+    else:
+        st.error("❌ No active Snowflake connection. Please connect from the 'Connections' tab.")
+
 elif selected_tab == "Stale table detection":
     conn_name = st.session_state.active_connection_name
     conn_dict = st.session_state.snowflake_connections.get(conn_name)
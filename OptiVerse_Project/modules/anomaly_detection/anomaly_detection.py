@@ -1,6 +1,5 @@
 import streamlit as st
-from datetime import datetime, timedelta, timezone
-from shared.snowflake_connector import connect_to_snowflake
+from modules.stale_tables.stale_scan import run_stale_scan
 import pandas as pd
 from shared.llm_client import call_llm  # Add LLM support
 
@@ -11,35 +10,14 @@ def render(conn_dict):
         st.error("❌ No active Snowflake connection. Please connect from the 'Connections' tab.")
         return
 
-    threshold_date = datetime.now(timezone.utc) - timedelta(days=30)
     keyword_filter = ["temp", "test", "staging", "tmp"]
 
     if "show_stale_detail" not in st.session_state:
         st.session_state.show_stale_detail = False
 
     try:
-        conn = connect_to_snowflake(conn_dict)
-        cursor = conn.cursor()
-
-        keyword_conditions = " OR ".join(
-            [f"LOWER(t.table_name) ILIKE '%{kw.lower()}%'" for kw in keyword_filter]
-        )
-
-        sql_query = f"""
-            SELECT t.table_schema, t.table_name, t.last_altered, t.created, t.bytes AS size_bytes,
-                   t.LAST_DDL_BY
-            FROM INFORMATION_SCHEMA.TABLES t
-            WHERE t.TABLE_TYPE = 'BASE TABLE'
-              AND ({keyword_conditions})
-            ORDER BY t.bytes DESC NULLS LAST
-        """
-        cursor.execute(sql_query)
-        tables = cursor.fetchall()
-
-        stale_tables = []
-        for schema, table, last_altered, created, size_bytes, last_altered_by in tables:
-            if last_altered is None or last_altered.replace(tzinfo=timezone.utc) < threshold_date:
-                stale_tables.append((schema, table, last_altered, created, size_bytes, last_altered_by))
+        # Same scan as the stale-table page: SHOW TABLES first, INFORMATION_SCHEMA only when it cannot decide
+        stale_tables = run_stale_scan(conn_dict, keyword_filter, 30)
 
         if not stale_tables:
             st.success("🎉 No stale tables found based on 30-day inactivity rule and keyword filter.")
@@ -84,8 +62,5 @@ def render(conn_dict):
                     st.session_state.show_stale_detail = False
                     st.rerun()
 
-        cursor.close()
-        conn.close()
-
     except Exception as e:
         st.error(f"❌ Error loading anomaly data: {e}")
@@ -23,11 +23,16 @@ def update_snowflake_connection(name, conn_details):
 
 def get_api_credentials():
     config = load_all_config()
-    return {
+    credentials = {
         "groq": config.get("groq", {"api_key": "", "model": "llama-4-8b"})
     }
+    for provider in ["together", "ollama"]:
+        if provider in config:
+            credentials[provider] = config[provider]
+    return credentials
 
-def update_api_credentials(provider_key, api_key, model):
+def update_api_credentials(provider_key, api_key, model, **settings):
     config = load_all_config()
-    config[provider_key] = {"api_key": api_key, "model": model}
+    # Keep provider settings saved elsewhere (e.g. Ollama keep_alive) when only the key or model changes
+    config[provider_key] = {**config.get(provider_key, {}), **settings, "api_key": api_key, "model": model}
     save_all_config(config)
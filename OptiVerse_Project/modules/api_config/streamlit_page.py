@@ -1,20 +1,33 @@
 import streamlit as st
 from modules.api_config.config_manager import get_api_credentials, update_api_credentials
+from llm.ollama_manager import DEFAULT_KEEP_ALIVE, DEFAULT_MAX_CONCURRENCY
 
 def render():
     st.subheader("🔐 API Configuration")
 
     credentials = get_api_credentials()
     provider_display_to_key = {
-        "Groq": "groq"
+        "Groq": "groq",
+        "Together": "together",
+        "Ollama": "ollama"
     }
 
     provider_display = st.selectbox("Select Model Provider", list(provider_display_to_key.keys()))
     provider_key = provider_display_to_key[provider_display]
 
-    api_key = st.text_input(f"{provider_display} API Key", value=credentials[provider_key]["api_key"], type="password")
-    model = st.text_input(f"{provider_display} Model Name", value=credentials[provider_key]["model"])
+    provider_creds = credentials.get(provider_key, {"api_key": "", "model": ""})
+
+    api_key = st.text_input(f"{provider_display} API Key", value=provider_creds["api_key"], type="password")
+    model = st.text_input(f"{provider_display} Model Name", value=provider_creds["model"])
+
+    settings = {}
+    if provider_key == "ollama":
+        settings["keep_alive"] = st.text_input("Keep Alive", value=provider_creds.get("keep_alive", DEFAULT_KEEP_ALIVE),
+                                               help="How long Ollama keeps the model loaded after a request, e.g. 30m, 2h or -1 for always.")
+        settings["max_concurrency"] = st.number_input("Max Concurrent Generations", min_value=1, max_value=16,
+                                                      value=int(provider_creds.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)),
+                                                      help="Further requests wait in a queue. Takes effect after a restart.")
 
     if st.button("Save API Configuration"):
-        update_api_credentials(provider_key, api_key, model)
+        update_api_credentials(provider_key, api_key, model, **settings)
         st.success(f"{provider_display} API credentials updated.")
@@ -0,0 +1,148 @@
+import json
+from collections import defaultdict
+from shared.snowflake_connector import connect_to_snowflake
+from shared.snowflake_costs import credits_per_hour_sql
+from shared.sql_analysis import extract_column_usage
+from shared.metadata import table_bytes
+from modules.query_optimizer.explain_utils import run_explain, parse_plan_stats
+from modules.query_optimizer.core import describe_table
+
+MIN_PARTITIONS_TOTAL = 1000
+POOR_PRUNING_RATIO = 0.5
+MAX_KEY_COLUMNS = 2
+# Expected share of partitions still scanned once the layout matches the filter
+SCAN_RATIO_AFTER_CLUSTERING = 0.05
+SCAN_RATIO_AFTER_SEARCH_OPTIMIZATION = 0.01
+# Rough planning figures; reclustering and search-optimization builds rewrite the table once
+RECLUSTER_CREDITS_PER_TB = 5.0
+SEARCH_OPTIMIZATION_CREDITS_PER_TB = 3.0
+MONTHLY_CHURN_RATIO = 0.1
+WELL_CLUSTERED_DEPTH = 2.0
+DAYS_PER_MONTH = 30
+
+def load_scan_heavy_queries(conn_details: dict, days: int = 7) -> list:
+    conn = connect_to_snowflake(conn_details)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT ANY_VALUE(QUERY_TEXT), ANY_VALUE(DATABASE_NAME), ANY_VALUE(SCHEMA_NAME), COUNT(*),
+                   SUM(PARTITIONS_SCANNED), SUM(PARTITIONS_TOTAL),
+                   SUM(EXECUTION_TIME / 3600000 * {credits_per_hour_sql()})
+            FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
+            WHERE START_TIME >= DATEADD(day, -{days}, CURRENT_TIMESTAMP())
+              AND QUERY_TYPE = 'SELECT' AND EXECUTION_STATUS = 'SUCCESS'
+              AND PARTITIONS_TOTAL >= {MIN_PARTITIONS_TOTAL}
+              AND PARTITIONS_SCANNED >= {POOR_PRUNING_RATIO} * PARTITIONS_TOTAL
+            GROUP BY QUERY_PARAMETERIZED_HASH
+        """)
+        columns = ["query_text", "database", "schema", "executions", "partitions_scanned", "partitions_total", "credits"]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+def mine_column_usage(queries: list) -> dict:
+    tables = defaultdict(lambda: {"columns": defaultdict(lambda: defaultdict(float)), "partitions_scanned": 0.0,
+                                  "partitions_total": 0.0, "credits": 0.0, "sample_query": None, "sample_database": None,
+                                  "sample_schema": None, "sample_weight": 0.0})
+    for query in queries:
+        usage = extract_column_usage(query["query_text"], query["database"] or "", query["schema"] or "")
+        scanned, total, credits = float(query["partitions_scanned"]), float(query["partitions_total"]), float(query["credits"] or 0)
+        for table in {u[0] for u in usage}:
+            stats = tables[table]
+            stats["partitions_scanned"] += scanned
+            stats["partitions_total"] += total
+            stats["credits"] += credits
+            if credits > stats["sample_weight"]:
+                stats["sample_query"], stats["sample_weight"] = query["query_text"], credits
+                stats["sample_database"], stats["sample_schema"] = query["database"], query["schema"]
+        kinds = defaultdict(set)
+        for table, column, kind in usage:
+            kinds[(table, column)].add(kind)
+        for (table, column), column_kinds in kinds.items():
+            col = tables[table]["columns"][column]
+            for kind in column_kinds:
+                col[kind] += scanned
+            if column_kinds - {"join"}:
+                col["scanned"] += scanned
+                col["saved_partitions_cluster"] += max(0.0, scanned - total * SCAN_RATIO_AFTER_CLUSTERING)
+                col["saved_partitions_search"] += max(0.0, scanned - total * SCAN_RATIO_AFTER_SEARCH_OPTIMIZATION)
+                col["credits"] += credits
+    return tables
+
+def get_clustering_information(cursor, table: str, columns: list) -> dict:
+    cursor.execute(f"SELECT SYSTEM$CLUSTERING_INFORMATION('{table}', '({', '.join(columns)})')")
+    return json.loads(cursor.fetchone()[0])
+
+def recommend(conn_details: dict, tables: dict, limit: int = 10, days: int = 7) -> list:
+    """Clustering or search-optimization DDL per table; savings are scaled from the days mined to a month."""
+    ranked = sorted(tables.items(), key=lambda t: t[1]["credits"], reverse=True)[:limit]
+    recommendations = []
+
+    conn = connect_to_snowflake(conn_details)
+    cursor = conn.cursor()
+    try:
+        for table, stats in ranked:
+            filters = {c: u for c, u in stats["columns"].items() if u["point"] or u["range"]}
+            if not filters:
+                continue
+            existing = {c.upper() for c in describe_table(table, conn_details)}
+            candidates = sorted((c for c in filters if c in existing), key=lambda c: filters[c]["point"] + filters[c]["range"], reverse=True)
+            if not candidates:
+                continue
+
+            # Confirm from the compiled plan that the heaviest query still scans the whole table; it is compiled where it
+            # ran, since its table names may be unqualified
+            sample_scope = {**conn_details, "database": stats["sample_database"] or conn_details.get("database"),
+                            "schema": stats["sample_schema"] or conn_details.get("schema")}
+            plan_stats = parse_plan_stats(run_explain(stats["sample_query"], sample_scope))
+            full_scan = None
+            if plan_stats["partitions_total"] > 0:
+                full_scan = plan_stats["partitions_assigned"] >= plan_stats["partitions_total"] * POOR_PRUNING_RATIO
+                if not full_scan:
+                    # Prunes well today (data or filters changed since the history was written); nothing to fix
+                    continue
+
+            key = candidates[:MAX_KEY_COLUMNS]
+            usage = filters[key[0]]
+            point_lookups = usage["point"] > 2 * usage["range"]
+
+            try:
+                clustering = get_clustering_information(cursor, table, key)
+            except Exception as e:
+                clustering = {"error": str(e)}
+            depth = clustering.get("average_depth")
+            table_tb = table_bytes(cursor, table) / 1e12
+
+            if point_lookups:
+                recommendation = f"ALTER TABLE {table} ADD SEARCH OPTIMIZATION ON EQUALITY({key[0]})"
+                saved = usage["saved_partitions_search"]
+                build_credits = table_tb * SEARCH_OPTIMIZATION_CREDITS_PER_TB
+            elif depth is not None and depth <= WELL_CLUSTERED_DEPTH:
+                # Layout already matches the filter; pruning is poor because the filter is not selective
+                continue
+            else:
+                recommendation = f"ALTER TABLE {table} CLUSTER BY ({', '.join(key)})"
+                saved = usage["saved_partitions_cluster"]
+                build_credits = table_tb * RECLUSTER_CREDITS_PER_TB
+
+            scan_share = saved / usage["scanned"] if usage["scanned"] else 0.0
+            # Build and maintenance are priced per month, so the look-back window's credits are scaled to match
+            monthly_saved = usage["credits"] * scan_share * DAYS_PER_MONTH / days
+            recommendations.append({
+                "table": table,
+                "recommendation": recommendation,
+                "filter_columns": ", ".join(candidates[:4]),
+                "current_scan_ratio": round(stats["partitions_scanned"] / stats["partitions_total"], 3) if stats["partitions_total"] else None,
+                "average_depth": depth,
+                "full_scan_in_plan": full_scan,
+                "partitions_saved": int(saved),
+                "monthly_credits_saved": round(monthly_saved, 2),
+                "initial_credits": round(build_credits, 2),
+                "monthly_maintenance_credits": round(build_credits * MONTHLY_CHURN_RATIO, 2),
+            })
+    finally:
+        cursor.close()
+        conn.close()
+    return sorted(recommendations, key=lambda r: r["monthly_credits_saved"] - r["initial_credits"] - r["monthly_maintenance_credits"],
+                  reverse=True)
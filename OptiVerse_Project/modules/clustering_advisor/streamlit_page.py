@@ -0,0 +1,39 @@
+import streamlit as st
+import pandas as pd
+from modules.clustering_advisor.advisor import load_scan_heavy_queries, mine_column_usage, recommend
+from shared.session_store import put_artifact, get_artifact
+
+def render(conn_dict):
+    st.header("🧭 Clustering & Search Optimization Advisor")
+    st.caption("Mines filter and join columns from scan-heavy queries and proposes clustering keys or search optimization per table.")
+    st.info("These queries are scan-bound: the table layout does not match their filters, so a SQL rewrite alone will not make them prune.")
+
+    days = st.slider("Look back (days)", min_value=1, max_value=30, value=7)
+    limit = st.number_input("Tables to inspect", min_value=1, max_value=50, value=10)
+
+    if st.button("🔍 Analyze Workload"):
+        with st.spinner("Mining QUERY_HISTORY and checking clustering depth..."):
+            try:
+                queries = load_scan_heavy_queries(conn_dict, days)
+                tables = mine_column_usage(queries)
+                put_artifact("clustering_recommendations", recommend(conn_dict, tables, int(limit), days))
+                st.session_state["clustering_query_count"] = len(queries)
+            except Exception as e:
+                st.error(f"❌ Analysis failed: {e}")
+                return
+
+    recommendations = get_artifact("clustering_recommendations")
+    if recommendations is None:
+        return
+    st.write(f"Analyzed {st.session_state.get('clustering_query_count', 0)} scan-heavy query shapes.")
+    if not recommendations:
+        st.success("✅ No table needs a new clustering key or search optimization.")
+        return
+
+    df = pd.DataFrame(recommendations)
+    df["net_first_month"] = (df["monthly_credits_saved"] - df["initial_credits"] - df["monthly_maintenance_credits"]).round(2)
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    st.caption("Credits saved are the look-back window's savings scaled to 30 days; build and maintenance credits are rough per-TB estimates.")
+
+    st.markdown("### DDL")
+    st.code(";\n".join(r["recommendation"] for r in recommendations) + ";", language="sql")
@@ -5,6 +5,7 @@ from modules.api_config.config_manager import (
     save_all_config
 )
 from shared.snowflake_connector import connect_to_snowflake
+from shared.shared_cache import session_connections
 
 def render():
     st.subheader("🔗 Manage Snowflake Connections")
@@ -64,7 +65,7 @@ def render():
 
         if st.button("Save Connection") and new_conn_name:
             update_snowflake_connection(new_conn_name, new_conn)
-            st.session_state.snowflake_connections = get_snowflake_connections()
+            st.session_state.snowflake_connections = session_connections()
             st.session_state.active_connection_name = new_conn_name
             st.success(f"✅ Connection '{new_conn_name}' saved and set as active.")
             st.rerun()
@@ -117,7 +118,7 @@ def render():
 
         if st.button("Save Changes"):
             update_snowflake_connection(selected_connection, updated_conn)
-            st.session_state.snowflake_connections = get_snowflake_connections()
+            st.session_state.snowflake_connections = session_connections()
             st.success("✅ Connection updated.")
             st.rerun()
 
@@ -130,6 +131,6 @@ def render():
             all_config = get_snowflake_connections()
             del all_config[selected_connection]
             save_all_config({"snowflake": all_config})
-            st.session_state.snowflake_connections = get_snowflake_connections()
+            st.session_state.snowflake_connections = session_connections()
             st.success("❌ Connection deleted.")
             st.rerun()
@@ -0,0 +1,69 @@
+import streamlit as st
+import pandas as pd
+from shared.fanout import fan_out, merge_tagged, fan_out_status, DEFAULT_TIMEOUT_SECONDS
+from shared.home_metrics import get_home_metrics
+from modules.stale_tables.stale_scan import run_stale_scan, DEFAULT_KEYWORDS
+from modules.hotspots.hotspot_detector import sync_hotspots
+
+def _show_status(results: dict):
+    status = pd.DataFrame(fan_out_status(results))
+    failed = status[status["status"] != "ok"]
+    if not failed.empty:
+        st.warning(f"⚠️ {len(failed)} of {len(status)} accounts did not answer; showing partial results.")
+    with st.expander("Per-account status", expanded=not failed.empty):
+        st.dataframe(status, use_container_width=True, hide_index=True)
+
+def render(connections: dict):
+    st.header("🌐 Fleet Overview")
+    st.caption("Runs the same check against every saved connection at once; a slow or unreachable account only delays itself.")
+
+    if not connections:
+        st.info("No saved connections. Add them from the 'Connections' tab.")
+        return
+    selected = st.multiselect("Connections", list(connections.keys()), default=list(connections.keys()))
+    timeout = st.slider("Timeout for all accounts (seconds)", min_value=5, max_value=600, value=DEFAULT_TIMEOUT_SECONDS,
+                        help="One deadline for the whole run; accounts that have not answered by then are reported as timed out.")
+    targets = {name: connections[name] for name in selected}
+
+    col1, col2, col3 = st.columns(3)
+    if col1.button("📊 Fleet Metrics") and targets:
+        with st.spinner(f"Querying {len(targets)} accounts..."):
+            st.session_state["fleet_metrics"] = fan_out(get_home_metrics, targets, timeout=timeout)
+    if col2.button("🧹 Fleet Stale Scan") and targets:
+        with st.spinner(f"Scanning {len(targets)} accounts..."):
+            st.session_state["fleet_stale"] = fan_out(run_stale_scan, targets, DEFAULT_KEYWORDS, 30, timeout=timeout)
+    if col3.button("🔄 Sync All Histories") and targets:
+        with st.spinner(f"Syncing QUERY_HISTORY for {len(targets)} accounts..."):
+            st.session_state["fleet_sync"] = fan_out(sync_hotspots, targets, timeout=timeout)
+
+    metrics = st.session_state.get("fleet_metrics")
+    if metrics:
+        st.markdown("### Metrics")
+        _show_status(metrics)
+        df = pd.DataFrame(merge_tagged(metrics))
+        if not df.empty:
+            totals = df.drop(columns=["connection"]).sum(numeric_only=True)
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Total Queries (Today)", int(totals["total_queries"]))
+            c2.metric("Estimated Cost ($)", f"${totals['estimated_cost']:,.2f}")
+            c3.metric("Active Warehouses", int(totals["active_warehouses"]))
+            st.dataframe(df, use_container_width=True, hide_index=True)
+
+    stale = st.session_state.get("fleet_stale")
+    if stale:
+        st.markdown("### Stale Tables")
+        _show_status(stale)
+        df = pd.DataFrame(merge_tagged(stale))
+        if df.empty:
+            st.success("🎉 No stale tables found on the accounts that answered.")
+        else:
+            st.dataframe(df.sort_values("Size (Bytes)", ascending=False), use_container_width=True, hide_index=True)
+            st.download_button("🗅️ Download Fleet Stale Tables as CSV", data=df.to_csv(index=False).encode("utf-8"),
+                               file_name="fleet_stale_tables.csv", mime="text/csv")
+
+    sync = st.session_state.get("fleet_sync")
+    if sync:
+        st.markdown("### History Sync")
+        _show_status(sync)
+        for row in merge_tagged(sync):
+            st.write(f"✅ {row['connection']}: merged {row['value']} query fingerprints")
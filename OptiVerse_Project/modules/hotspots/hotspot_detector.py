@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta, timezone
+from shared.snowflake_connector import connect_to_snowflake
+from shared.snowflake_costs import credits_per_hour_sql
+from shared.local_store import get_local_db, get_watermark, set_watermark
+
+INITIAL_LOOKBACK_DAYS = 7
+# ACCOUNT_USAGE.QUERY_HISTORY can lag up to 45 minutes; only ingest settled rows
+SETTLE_MINUTES = 60
+PRUNING_TARGET_RATIO = 0.1
+MIN_PARTITIONS_FOR_PRUNING = 100
+# Remote spill is far slower than local spill, so it is weighted more heavily
+REMOTE_SPILL_WEIGHT = 4
+SPILL_WASTE_SHARE = 0.5
+LOCAL_SPILL_FLAG_BYTES = 1e9
+
+def _init_db(db):
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS hotspots (
+            account TEXT,
+            fingerprint TEXT,
+            executions INTEGER,
+            execution_ms REAL,
+            credits REAL,
+            wasted_credits REAL,
+            spill_local REAL,
+            spill_remote REAL,
+            bytes_scanned REAL,
+            partitions_scanned REAL,
+            partitions_total REAL,
+            sample_query TEXT,
+            last_seen TEXT,
+            PRIMARY KEY (account, fingerprint)
+        )
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_hotspots_waste ON hotspots (account, wasted_credits DESC)")
+
+def _watermark_name(conn_details: dict) -> str:
+    return f"hotspots:{conn_details['account']}"
+
+def sync_hotspots(conn_details: dict) -> int:
+    db = get_local_db()
+    _init_db(db)
+    default_start = (datetime.now(timezone.utc) - timedelta(days=INITIAL_LOOKBACK_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+    watermark = get_watermark(db, _watermark_name(conn_details), default_start)
+
+    conn = connect_to_snowflake(conn_details)
+    cursor = conn.cursor()
+    try:
+        # Aggregate per fingerprint in Snowflake so only one row per query shape comes back
+        cursor.execute(f"""
+            WITH q AS (
+                SELECT QUERY_PARAMETERIZED_HASH AS fingerprint, QUERY_TEXT, END_TIME, EXECUTION_TIME,
+                       COALESCE(BYTES_SPILLED_TO_LOCAL_STORAGE, 0) AS spill_local,
+                       COALESCE(BYTES_SPILLED_TO_REMOTE_STORAGE, 0) AS spill_remote,
+                       COALESCE(BYTES_SCANNED, 0) AS bytes_scanned,
+                       COALESCE(PARTITIONS_SCANNED, 0) AS partitions_scanned,
+                       COALESCE(PARTITIONS_TOTAL, 0) AS partitions_total,
+                       EXECUTION_TIME / 3600000 * {credits_per_hour_sql()} AS credits
+                FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
+                WHERE END_TIME > '{watermark} +0000'::TIMESTAMP_TZ
+                  AND END_TIME <= DATEADD(minute, -{SETTLE_MINUTES}, CURRENT_TIMESTAMP())
+                  AND WAREHOUSE_NAME IS NOT NULL AND EXECUTION_STATUS = 'SUCCESS'
+                  AND QUERY_TYPE = 'SELECT' AND QUERY_PARAMETERIZED_HASH IS NOT NULL
+            )
+            SELECT fingerprint, COUNT(*), SUM(EXECUTION_TIME), SUM(credits),
+                   SUM(credits * LEAST(1,
+                       IFF(partitions_total >= {MIN_PARTITIONS_FOR_PRUNING},
+                           GREATEST(0, partitions_scanned / partitions_total - {PRUNING_TARGET_RATIO}), 0)
+                       + {SPILL_WASTE_SHARE} * LEAST(1, (spill_local + {REMOTE_SPILL_WEIGHT} * spill_remote) / NULLIF(bytes_scanned, 0))
+                   )),
+                   SUM(spill_local), SUM(spill_remote), SUM(bytes_scanned), SUM(partitions_scanned), SUM(partitions_total),
+                   MAX_BY(QUERY_TEXT, EXECUTION_TIME),
+                   TO_VARCHAR(CONVERT_TIMEZONE('UTC', MAX(END_TIME)), 'YYYY-MM-DD HH24:MI:SS.FF3')
+            FROM q
+            GROUP BY fingerprint
+        """)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+    with db:
+        for row in rows:
+            fingerprint, executions, execution_ms, credits, wasted, spill_local, spill_remote, bytes_scanned, p_scanned, p_total, sample, last_seen = row
+            db.execute("""
+                INSERT INTO hotspots VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(account, fingerprint) DO UPDATE SET
+                    executions = executions + excluded.executions,
+                    execution_ms = execution_ms + excluded.execution_ms,
+                    credits = credits + excluded.credits,
+                    wasted_credits = wasted_credits + excluded.wasted_credits,
+                    spill_local = spill_local + excluded.spill_local,
+                    spill_remote = spill_remote + excluded.spill_remote,
+                    bytes_scanned = bytes_scanned + excluded.bytes_scanned,
+                    partitions_scanned = partitions_scanned + excluded.partitions_scanned,
+                    partitions_total = partitions_total + excluded.partitions_total,
+                    sample_query = excluded.sample_query,
+                    last_seen = excluded.last_seen
+            """, (conn_details["account"], fingerprint, executions, float(execution_ms or 0), float(credits or 0), float(wasted or 0),
+                  float(spill_local), float(spill_remote), float(bytes_scanned), float(p_scanned), float(p_total), sample, last_seen))
+        if rows:
+            set_watermark(db, _watermark_name(conn_details), max(r[-1] for r in rows))
+    db.close()
+    return len(rows)
+
+def top_hotspots(conn_details: dict, limit: int = 25) -> list:
+    db = get_local_db()
+    _init_db(db)
+    rows = db.execute(f"""
+        SELECT fingerprint, executions, execution_ms, credits, wasted_credits, spill_local, spill_remote,
+               bytes_scanned, partitions_scanned, partitions_total, sample_query, last_seen
+        FROM hotspots
+        WHERE account = ?
+          AND (spill_remote > 0 OR spill_local > ? OR (partitions_total >= ? AND partitions_scanned > ? * partitions_total))
+        ORDER BY wasted_credits DESC
+        LIMIT ?
+    """, (conn_details["account"], LOCAL_SPILL_FLAG_BYTES, MIN_PARTITIONS_FOR_PRUNING, 2 * PRUNING_TARGET_RATIO, limit)).fetchall()
+    db.close()
+    columns = ["fingerprint", "executions", "execution_ms", "credits", "wasted_credits", "spill_local", "spill_remote",
+               "bytes_scanned", "partitions_scanned", "partitions_total", "sample_query", "last_seen"]
+    return [dict(zip(columns, row)) for row in rows]
+
+def format_hotspot_hint(hotspot: dict) -> str:
+    lines = [f"Workload statistics for this query shape ({hotspot['executions']} executions):"]
+    lines.append(f"- Estimated credits: {hotspot['credits']:.2f}, of which ~{hotspot['wasted_credits']:.2f} wasted")
+    if hotspot["partitions_total"]:
+        ratio = hotspot["partitions_scanned"] / hotspot["partitions_total"]
+        lines.append(f"- Partitions scanned: {ratio:.0%} of total, so pruning is {'poor' if ratio > 2 * PRUNING_TARGET_RATIO else 'fine'}")
+    if hotspot["spill_local"] or hotspot["spill_remote"]:
+        lines.append(f"- Spilled {hotspot['spill_local'] / 1e9:.1f} GB to local and {hotspot['spill_remote'] / 1e9:.1f} GB to remote storage")
+    lines.append("Prioritize rewrites that improve partition pruning and reduce memory pressure (spilling).")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,46 @@
+import streamlit as st
+import pandas as pd
+from modules.hotspots.hotspot_detector import sync_hotspots, top_hotspots, format_hotspot_hint
+
+def send_to_optimizer(hotspot: dict):
+    st.session_state["user_query"] = hotspot["sample_query"]
+    st.session_state["hotspot_context"] = {"query": hotspot["sample_query"], "hint": format_hotspot_hint(hotspot)}
+    for key in ["original_plan", "optimized_query", "optimized_plan", "comparison_summary", "raw_llm_output"]:
+        st.session_state.pop(key, None)
+    st.session_state["selected_tab"] = "Query Optimizer"
+
+def render(conn_dict):
+    st.header("🔥 Spill & Pruning Hotspots")
+    st.caption("Query shapes from QUERY_HISTORY that spill heavily or scan most of their partitions, ranked by wasted credits.")
+
+    if st.button("🔄 Sync New History"):
+        with st.spinner("Aggregating new QUERY_HISTORY rows..."):
+            try:
+                count = sync_hotspots(conn_dict)
+                st.success(f"✅ Merged {count} query fingerprints.")
+            except Exception as e:
+                st.error(f"❌ Sync failed: {e}")
+
+    hotspots = top_hotspots(conn_dict)
+    if not hotspots:
+        st.info("No hotspots recorded yet. Sync history to populate this list.")
+        return
+
+    df = pd.DataFrame(hotspots)
+    df["scan_ratio"] = (df["partitions_scanned"] / df["partitions_total"].where(df["partitions_total"] > 0)).round(2)
+    df["spill_remote_gb"] = (df["spill_remote"] / 1e9).round(2)
+    df["spill_local_gb"] = (df["spill_local"] / 1e9).round(2)
+    st.dataframe(df[["fingerprint", "executions", "credits", "wasted_credits", "scan_ratio", "spill_local_gb", "spill_remote_gb", "last_seen"]].round(3),
+                 use_container_width=True, hide_index=True)
+
+    st.markdown("### Send to Optimizer")
+    queue = st.session_state.setdefault("optimizer_queue", [])
+    for rank, hotspot in enumerate(hotspots[:10], start=1):
+        with st.expander(f"#{rank} · {hotspot['wasted_credits']:.2f} wasted credits · {hotspot['executions']} runs"):
+            st.code(hotspot["sample_query"][:2000], language="sql")
+            col1, col2 = st.columns(2)
+            col1.button("🧠 Optimize now", key=f"hotspot_opt_{hotspot['fingerprint']}", on_click=send_to_optimizer, args=(hotspot,))
+            if col2.button("➕ Add to optimizer queue", key=f"hotspot_queue_{hotspot['fingerprint']}"):
+                if hotspot["fingerprint"] not in [h["fingerprint"] for h in queue]:
+                    queue.append(hotspot)
+                st.success("Queued.")
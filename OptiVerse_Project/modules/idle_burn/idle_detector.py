@@ -0,0 +1,165 @@
+import numpy as np
+from shared.snowflake_connector import connect_to_snowflake
+from shared.snowflake_costs import credits_per_hour, MIN_BILLED_SECONDS
+
+FETCH_BATCH = 100000
+# Each warehouse's timeline is shifted by this many seconds so one sorted array holds all of them without overlap
+WAREHOUSE_OFFSET = 1e10
+AUTO_SUSPEND_CANDIDATES = [60, 120, 300, 600, 900, 1800]
+# Prefer the longest timeout within this share of the cheapest; longer timeouts keep the local disk cache warm
+SUSPEND_COST_TOLERANCE = 0.02
+
+def load_query_intervals(conn_details: dict, days: int = 7) -> dict:
+    conn = connect_to_snowflake(conn_details)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT WAREHOUSE_NAME, DATE_PART(EPOCH_MILLISECOND, START_TIME) / 1000, DATE_PART(EPOCH_MILLISECOND, END_TIME) / 1000
+            FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
+            WHERE START_TIME >= DATEADD(day, -{days}, DATE_TRUNC(hour, CURRENT_TIMESTAMP()))
+              AND WAREHOUSE_SIZE IS NOT NULL AND EXECUTION_TIME > 0
+        """)
+        names, starts, ends = [], [], []
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH)
+            if not rows:
+                break
+            batch_names, batch_starts, batch_ends = zip(*rows)
+            names.extend(batch_names)
+            starts.append(np.asarray(batch_starts, dtype=float))
+            ends.append(np.asarray(batch_ends, dtype=float))
+    finally:
+        cursor.close()
+        conn.close()
+    return {
+        "warehouse": np.asarray(names, dtype=object),
+        "start": np.concatenate(starts) if starts else np.empty(0),
+        "end": np.concatenate(ends) if ends else np.empty(0),
+    }
+
+def load_metering(conn_details: dict, days: int = 7) -> list:
+    conn = connect_to_snowflake(conn_details)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT WAREHOUSE_NAME, DATE_PART(EPOCH_SECOND, START_TIME), CREDITS_USED_COMPUTE
+            FROM SNOWFLAKE.ACCOUNT_USAGE.WAREHOUSE_METERING_HISTORY
+            WHERE START_TIME >= DATEADD(day, -{days}, DATE_TRUNC(hour, CURRENT_TIMESTAMP()))
+              AND CREDITS_USED_COMPUTE > 0
+        """)
+        return [{"warehouse": w, "hour": float(h), "credits": float(c)} for w, h, c in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_warehouse_settings(conn_details: dict) -> dict:
+    conn = connect_to_snowflake(conn_details)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SHOW WAREHOUSES")
+        columns = [c[0].lower() for c in cursor.description]
+        return {
+            row[columns.index("name")]: {"size": row[columns.index("size")], "auto_suspend": row[columns.index("auto_suspend")]}
+            for row in cursor.fetchall()
+        }
+    finally:
+        cursor.close()
+        conn.close()
+
+def merge_intervals(warehouses: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> dict:
+    # Vectorized union of overlapping query intervals, per warehouse
+    if len(starts) == 0:
+        return {}
+    names, codes = np.unique(warehouses, return_inverse=True)
+    offset = codes * WAREHOUSE_OFFSET
+    s, e = starts + offset, np.maximum(ends, starts) + offset
+    order = np.argsort(s, kind="stable")
+    s, e = s[order], e[order]
+    running_end = np.maximum.accumulate(e)
+    new_block = np.empty(len(s), dtype=bool)
+    new_block[0] = True
+    new_block[1:] = s[1:] > running_end[:-1]
+    merged_starts = s[new_block]
+    merged_ends = np.maximum.reduceat(e, np.flatnonzero(new_block))
+
+    merged = {}
+    merged_codes = np.floor(merged_starts / WAREHOUSE_OFFSET).astype(int)
+    for code, name in enumerate(names):
+        mask = merged_codes == code
+        merged[name] = (merged_starts[mask] - code * WAREHOUSE_OFFSET, merged_ends[mask] - code * WAREHOUSE_OFFSET)
+    return merged
+
+def busy_seconds_between(starts: np.ndarray, ends: np.ndarray, window_starts: np.ndarray, window_ends: np.ndarray) -> np.ndarray:
+    # Busy time in each window from the cumulative busy function of disjoint sorted intervals
+    lengths = ends - starts
+    cumulative = np.concatenate([[0.0], np.cumsum(lengths)])
+
+    def busy_until(t):
+        k = np.searchsorted(ends, t, side="right")
+        partial = np.zeros(len(t))
+        inside = k < len(starts)
+        partial[inside] = np.clip(t[inside] - starts[k[inside]], 0, lengths[k[inside]])
+        return cumulative[k] + partial
+
+    if len(starts) == 0:
+        return np.zeros(len(window_starts))
+    return busy_until(window_ends) - busy_until(window_starts)
+
+def idle_by_hour(merged: dict, metering: list, settings: dict) -> list:
+    rows = []
+    by_warehouse = {}
+    for record in metering:
+        by_warehouse.setdefault(record["warehouse"], []).append(record)
+    for warehouse, records in by_warehouse.items():
+        rate = credits_per_hour(settings.get(warehouse, {}).get("size"))
+        hours = np.array([r["hour"] for r in records])
+        credits = np.array([r["credits"] for r in records])
+        starts, ends = merged.get(warehouse, (np.empty(0), np.empty(0)))
+        busy = busy_seconds_between(starts, ends, hours, hours + 3600)
+        billed = credits / rate * 3600
+        idle = np.clip(billed - busy, 0, None)
+        for hour, hour_credits, hour_busy, hour_idle in zip(hours, credits, busy, idle):
+            rows.append({
+                "warehouse": warehouse,
+                "hour": hour,
+                "credits": hour_credits,
+                "busy_seconds": hour_busy,
+                "idle_seconds": hour_idle,
+                "idle_credits": hour_idle / 3600 * rate,
+            })
+    return rows
+
+def simulate_auto_suspend(starts: np.ndarray, ends: np.ndarray, auto_suspend_s: float) -> dict:
+    # The warehouse stays up across gaps no longer than the timeout; every other gap is a suspend and a resume
+    if len(starts) == 0:
+        return {"billed_seconds": 0.0, "resumes": 0}
+    gaps = starts[1:] - ends[:-1]
+    breaks = np.flatnonzero(gaps > auto_suspend_s)
+    segment_starts = np.concatenate([[starts[0]], starts[breaks + 1]])
+    segment_ends = np.concatenate([ends[breaks], [ends[-1]]]) + auto_suspend_s
+    billed = np.maximum(segment_ends - segment_starts, MIN_BILLED_SECONDS)
+    return {"billed_seconds": float(billed.sum()), "resumes": len(segment_starts)}
+
+def recommend_auto_suspend(merged: dict, settings: dict, candidates: list = None) -> list:
+    candidates = candidates or AUTO_SUSPEND_CANDIDATES
+    recommendations = []
+    for warehouse, (starts, ends) in merged.items():
+        setting = settings.get(warehouse, {})
+        rate = credits_per_hour(setting.get("size"))
+        current = int(setting.get("auto_suspend") or 0)
+        options = sorted(set(candidates) | ({current} if current else set()))
+        results = {s: simulate_auto_suspend(starts, ends, s) for s in options}
+        cheapest = min(r["billed_seconds"] for r in results.values())
+        best = max(s for s, r in results.items() if r["billed_seconds"] <= cheapest * (1 + SUSPEND_COST_TOLERANCE))
+        baseline = results.get(current) if current else None
+        recommendations.append({
+            "warehouse": warehouse,
+            "current_auto_suspend": current or None,
+            "recommended_auto_suspend": best,
+            "current_credits": round(baseline["billed_seconds"] / 3600 * rate, 2) if baseline else None,
+            "recommended_credits": round(results[best]["billed_seconds"] / 3600 * rate, 2),
+            "credits_saved": round((baseline["billed_seconds"] - results[best]["billed_seconds"]) / 3600 * rate, 2) if baseline else None,
+            "resumes_current": baseline["resumes"] if baseline else None,
+            "resumes_recommended": results[best]["resumes"],
+        })
+    return sorted(recommendations, key=lambda r: r["credits_saved"] or 0, reverse=True)
@@ -0,0 +1,54 @@
+import streamlit as st
+import pandas as pd
+from modules.idle_burn.idle_detector import (
+    load_query_intervals, load_metering, get_warehouse_settings, merge_intervals, idle_by_hour, recommend_auto_suspend,
+)
+from shared.session_store import put_artifact, get_artifact
+
+def render(conn_dict):
+    st.header("💤 Idle Warehouse Burn")
+    st.caption("Credits billed while a warehouse was resumed but no query was running, and the AUTO_SUSPEND that would have avoided them.")
+
+    days = st.slider("Look back (days)", min_value=1, max_value=30, value=7)
+    if st.button("🔍 Analyze Idle Time"):
+        with st.spinner("Merging query intervals against metering history..."):
+            try:
+                intervals = load_query_intervals(conn_dict, days)
+                metering = load_metering(conn_dict, days)
+                settings = get_warehouse_settings(conn_dict)
+                merged = merge_intervals(intervals["warehouse"], intervals["start"], intervals["end"])
+                put_artifact("idle_burn_report", {
+                    "hours": idle_by_hour(merged, metering, settings),
+                    "recommendations": recommend_auto_suspend(merged, settings),
+                    "query_count": len(intervals["start"]),
+                })
+            except Exception as e:
+                st.error(f"❌ Analysis failed: {e}")
+                return
+
+    report = get_artifact("idle_burn_report")
+    if report is None:
+        return
+    if not report["hours"]:
+        st.info("No metered warehouse hours in this window.")
+        return
+
+    hours = pd.DataFrame(report["hours"])
+    hours["hour"] = pd.to_datetime(hours["hour"], unit="s", utc=True)
+    per_warehouse = hours.groupby("warehouse")[["credits", "idle_credits"]].sum()
+    per_warehouse["idle_share"] = per_warehouse["idle_credits"] / per_warehouse["credits"]
+
+    col1, col2 = st.columns(2)
+    col1.metric("Idle credits", f"{per_warehouse['idle_credits'].sum():,.2f}")
+    col2.metric("Queries analyzed", f"{report['query_count']:,}")
+    st.dataframe(per_warehouse.sort_values("idle_credits", ascending=False).round(3), use_container_width=True)
+
+    st.markdown("### Idle Credits by Hour")
+    st.bar_chart(hours.pivot_table(index="hour", columns="warehouse", values="idle_credits", aggfunc="sum").fillna(0))
+
+    st.markdown("### AUTO_SUSPEND Recommendations")
+    st.caption("Simulated from the merged busy intervals; billing rounds each resume up to 60 seconds. Shorter timeouts mean more resumes and a colder local cache.")
+    st.dataframe(pd.DataFrame(report["recommendations"]), use_container_width=True, hide_index=True)
+    for rec in report["recommendations"]:
+        if rec["credits_saved"] and rec["credits_saved"] > 0:
+            st.code(f"ALTER WAREHOUSE {rec['warehouse']} SET AUTO_SUSPEND = {rec['recommended_auto_suspend']};", language="sql")
@@ -0,0 +1,345 @@
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+from shared.snowflake_connector import connect_to_snowflake
+from shared.snowflake_costs import credits_per_hour_sql
+from shared.local_store import get_local_db, get_watermark, set_watermark
+from shared.sql_analysis import fingerprint_sql, referenced_tables
+from modules.query_optimizer.explain_utils import parse_plan_stats, cost_margin, is_plan_error
+
+# Executions of the original shape before an entry was recorded form its baseline
+BASELINE_DAYS = 14
+# ACCOUNT_USAGE.QUERY_HISTORY can lag up to 45 minutes; only read settled rows
+SETTLE_MINUTES = 60
+FETCH_BATCH = 10000
+SYNC_INTERVAL_SECONDS = 3600
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _init_db(db):
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS optimization_ledger (
+            entry_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created TEXT,
+            account TEXT,
+            team TEXT,
+            rewrite_kind TEXT,
+            provider TEXT,
+            model TEXT,
+            original_sql TEXT,
+            optimized_sql TEXT,
+            original_fingerprint TEXT,
+            optimized_fingerprint TEXT,
+            original_hash TEXT,
+            optimized_hash TEXT,
+            original_plan TEXT,
+            optimized_plan TEXT,
+            predicted_gain REAL,
+            adopted_at TEXT,
+            baseline_scanned INTEGER DEFAULT 0,
+            UNIQUE (account, original_fingerprint, optimized_fingerprint)
+        )
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_ledger_original ON optimization_ledger (account, original_fingerprint)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_ledger_optimized ON optimization_ledger (account, optimized_fingerprint)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_ledger_created ON optimization_ledger (account, created)")
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS ledger_usage (
+            entry_id INTEGER,
+            role TEXT,
+            phase TEXT,
+            executions INTEGER,
+            elapsed_ms REAL,
+            credits REAL,
+            PRIMARY KEY (entry_id, role, phase)
+        )
+    """)
+
+def _hash_watermark_name(conn_details: dict) -> str:
+    return f"ledger_hashes:{conn_details['account']}"
+
+# --- Recording ---
+
+def record_optimization(conn_details: dict, original_sql: str, optimized_sql: str, original_plan: str, optimized_plan: str,
+                        rewrite_kind: str, provider: str = "", model: str = "") -> int:
+    """Adds a rewrite to the ledger; predicted gain is the plan-cost margin of the rewrite.
+
+    Repeats of the same original/rewrite shapes update the existing entry, so each pair's runs are
+    counted once. Returns None without recording when the rewrite has the same shape as the original.
+    """
+    original_fingerprint, optimized_fingerprint = fingerprint_sql(original_sql), fingerprint_sql(optimized_sql)
+    if original_fingerprint == optimized_fingerprint:
+        return None
+    if is_plan_error(original_plan) or is_plan_error(optimized_plan):
+        predicted_gain = None
+    else:
+        predicted_gain = cost_margin(parse_plan_stats(original_plan), parse_plan_stats(optimized_plan))
+    db = get_local_db()
+    _init_db(db)
+    with db:
+        # The first recording fixes created (and so the baseline window); later ones refresh the plans
+        db.execute("""
+            INSERT INTO optimization_ledger (created, account, team, rewrite_kind, provider, model, original_sql, optimized_sql,
+                                             original_fingerprint, optimized_fingerprint, original_plan, optimized_plan, predicted_gain)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (account, original_fingerprint, optimized_fingerprint) DO UPDATE SET
+                original_plan = excluded.original_plan, optimized_plan = excluded.optimized_plan,
+                predicted_gain = excluded.predicted_gain
+        """, (_now().strftime(TIME_FORMAT), conn_details["account"], conn_details.get("team") or conn_details.get("role") or "",
+              rewrite_kind, provider, model, original_sql, optimized_sql, original_fingerprint, optimized_fingerprint,
+              original_plan, optimized_plan, predicted_gain))
+        entry_id = db.execute("""
+            SELECT entry_id FROM optimization_ledger WHERE account = ? AND original_fingerprint = ? AND optimized_fingerprint = ?
+        """, (conn_details["account"], original_fingerprint, optimized_fingerprint)).fetchone()[0]
+    db.close()
+    return entry_id
+
+# --- Matching Against QUERY_HISTORY ---
+
+def _load_entries(db, account: str) -> list:
+    cursor = db.execute("SELECT * FROM optimization_ledger WHERE account = ? ORDER BY entry_id", (account,))
+    columns = [c[0] for c in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def _resolve_hashes(conn, db, conn_details: dict, entries: list, cutoff: str):
+    # Snowflake's QUERY_PARAMETERIZED_HASH cannot be computed locally, so it is learned once per entry
+    # by fingerprinting the sample text of each hash seen in QUERY_HISTORY
+    unresolved = [e for e in entries if not e["original_hash"] or not e["optimized_hash"]]
+    if not unresolved:
+        return
+    watermark = get_watermark(db, _hash_watermark_name(conn_details), cutoff)
+    new_entries = [e for e in unresolved if not e["baseline_scanned"]]
+    baseline_starts = [(datetime.strptime(e["created"], TIME_FORMAT) - timedelta(days=BASELINE_DAYS)).strftime(TIME_FORMAT) for e in new_entries]
+    start = min([watermark] + baseline_starts)
+
+    wanted = {}
+    for e in unresolved:
+        if not e["original_hash"]:
+            wanted.setdefault(e["original_fingerprint"], []).append((e, "original"))
+        if not e["optimized_hash"]:
+            wanted.setdefault(e["optimized_fingerprint"], []).append((e, "optimized"))
+    # Only texts naming one of the ledger's tables are worth parsing
+    table_names = {t.split(".")[-1] for e in unresolved for sql in (e["original_sql"], e["optimized_sql"]) for t in referenced_tables(sql)}
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT QUERY_PARAMETERIZED_HASH, ANY_VALUE(QUERY_TEXT), TO_VARCHAR(MIN(START_TIME), 'YYYY-MM-DD HH24:MI:SS')
+            FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
+            WHERE START_TIME > '{start} +0000'::TIMESTAMP_TZ
+              AND START_TIME <= '{cutoff} +0000'::TIMESTAMP_TZ
+              AND QUERY_TYPE = 'SELECT' AND EXECUTION_STATUS = 'SUCCESS' AND QUERY_PARAMETERIZED_HASH IS NOT NULL
+            GROUP BY 1
+        """)
+        matches = []
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH)
+            if not rows:
+                break
+            for query_hash, text, first_seen in rows:
+                if table_names and not any(name in (text or "").upper() for name in table_names):
+                    continue
+                for entry, side in wanted.get(fingerprint_sql(text or ""), []):
+                    matches.append((entry, side, query_hash, first_seen))
+    finally:
+        cursor.close()
+
+    with db:
+        for entry, side, query_hash, first_seen in matches:
+            db.execute(f"UPDATE optimization_ledger SET {side}_hash = ? WHERE entry_id = ? AND {side}_hash IS NULL", (query_hash, entry["entry_id"]))
+            if side == "optimized":
+                # A rewrite counts as adopted from its first run after it was recorded
+                db.execute("UPDATE optimization_ledger SET adopted_at = ? WHERE entry_id = ? AND adopted_at IS NULL",
+                           (max(first_seen, entry["created"]), entry["entry_id"]))
+        db.executemany("UPDATE optimization_ledger SET baseline_scanned = 1 WHERE entry_id = ?", [(e["entry_id"],) for e in new_entries])
+        set_watermark(db, _hash_watermark_name(conn_details), cutoff)
+
+def _measure_usage(conn, db, entries: list, cutoff: str):
+    # Before = original shape until adoption; after = the rewrite's shape since adoption, both per role
+    resolved = [e for e in entries if e["original_hash"]]
+    if not resolved:
+        return
+
+    def literal(value: str) -> str:
+        return f"'{value}'" if value else "NULL"
+
+    def timestamp(value: str) -> str:
+        return f"'{value} +0000'::TIMESTAMP_TZ" if value else "NULL"
+
+    values = ", ".join(
+        f"({e['entry_id']}, {literal(e['original_hash'])}, {literal(e['optimized_hash'])}, "
+        f"{timestamp((datetime.strptime(e['created'], TIME_FORMAT) - timedelta(days=BASELINE_DAYS)).strftime(TIME_FORMAT))}, "
+        f"{timestamp(e['adopted_at'])})"
+        for e in resolved
+    )
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            WITH ledger (entry_id, original_hash, optimized_hash, baseline_start, adopted_at) AS (
+                SELECT * FROM VALUES {values}
+            )
+            SELECT l.entry_id, COALESCE(q.ROLE_NAME, ''),
+                   IFF(q.QUERY_PARAMETERIZED_HASH = l.optimized_hash, 'after', 'before'),
+                   COUNT(*), SUM(q.TOTAL_ELAPSED_TIME),
+                   SUM(IFF(q.WAREHOUSE_SIZE IS NULL, 0, q.EXECUTION_TIME / 3600000 * {credits_per_hour_sql('q.WAREHOUSE_SIZE')}))
+            FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY q
+            JOIN ledger l ON q.QUERY_PARAMETERIZED_HASH IN (l.original_hash, l.optimized_hash)
+            WHERE q.START_TIME >= l.baseline_start
+              AND q.START_TIME <= '{cutoff} +0000'::TIMESTAMP_TZ
+              AND q.EXECUTION_STATUS = 'SUCCESS'
+              AND IFF(q.QUERY_PARAMETERIZED_HASH = l.optimized_hash,
+                      q.START_TIME >= l.adopted_at,
+                      q.START_TIME < COALESCE(l.adopted_at, '{cutoff} +0000'::TIMESTAMP_TZ))
+            GROUP BY 1, 2, 3
+        """)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    with db:
+        db.executemany("DELETE FROM ledger_usage WHERE entry_id = ?", [(e["entry_id"],) for e in resolved])
+        db.executemany("INSERT INTO ledger_usage VALUES (?, ?, ?, ?, ?, ?)",
+                       [(entry_id, role, phase, executions, float(elapsed or 0), float(credits or 0))
+                        for entry_id, role, phase, executions, elapsed, credits in rows])
+
+def sync_realized_savings(conn_details: dict) -> int:
+    """Matches ledger entries to QUERY_HISTORY and recomputes their before/after usage; returns entries measured."""
+    db = get_local_db()
+    _init_db(db)
+    entries = _load_entries(db, conn_details["account"])
+    if not entries:
+        db.close()
+        return 0
+    cutoff = (_now() - timedelta(minutes=SETTLE_MINUTES)).strftime(TIME_FORMAT)
+    conn = connect_to_snowflake(conn_details)
+    try:
+        _resolve_hashes(conn, db, conn_details, entries, cutoff)
+        entries = _load_entries(db, conn_details["account"])
+        _measure_usage(conn, db, entries, cutoff)
+    finally:
+        conn.close()
+        db.close()
+    return sum(1 for e in entries if e["original_hash"])
+
+# --- Reporting ---
+
+def _usage_by_entry(db) -> dict:
+    usage = {}
+    for entry_id, role, phase, executions, elapsed_ms, credits in db.execute("SELECT * FROM ledger_usage").fetchall():
+        usage.setdefault(entry_id, []).append({"role": role, "phase": phase, "executions": executions,
+                                               "elapsed_ms": elapsed_ms, "credits": credits})
+    return usage
+
+def _phase_totals(rows: list, phase: str) -> tuple:
+    selected = [r for r in rows if r["phase"] == phase]
+    return (sum(r["executions"] for r in selected), sum(r["elapsed_ms"] for r in selected), sum(r["credits"] for r in selected))
+
+def realized_savings(conn_details: dict) -> list:
+    """Per rewrite: baseline and post-adoption averages, and what the adopted runs saved against the baseline."""
+    db = get_local_db()
+    _init_db(db)
+    entries = _load_entries(db, conn_details["account"])
+    usage = _usage_by_entry(db)
+    db.close()
+
+    report = []
+    for e in entries:
+        rows = usage.get(e["entry_id"], [])
+        before_n, before_ms, before_credits = _phase_totals(rows, "before")
+        after_n, after_ms, after_credits = _phase_totals(rows, "after")
+        saved_ms = saved_credits = None
+        if before_n and after_n:
+            # Savings only count runs that actually used the rewrite, priced at the baseline average
+            saved_ms = (before_ms / before_n - after_ms / after_n) * after_n
+            saved_credits = (before_credits / before_n - after_credits / after_n) * after_n
+        report.append({
+            "entry_id": e["entry_id"],
+            "created": e["created"],
+            "team": e["team"],
+            "rewrite_kind": e["rewrite_kind"],
+            "predicted_gain": e["predicted_gain"],
+            "adopted_at": e["adopted_at"],
+            "baseline_runs": before_n,
+            "adopted_runs": after_n,
+            "baseline_avg_ms": before_ms / before_n if before_n else None,
+            "adopted_avg_ms": after_ms / after_n if after_n else None,
+            "realized_gain": 1 - (after_ms / after_n) / (before_ms / before_n) if before_n and after_n and before_ms else None,
+            "elapsed_saved_s": saved_ms / 1000 if saved_ms is not None else None,
+            "credits_saved": saved_credits,
+            "original_sql": e["original_sql"],
+            "optimized_sql": e["optimized_sql"],
+        })
+    return report
+
+def savings_by_team(conn_details: dict) -> list:
+    # A team is the Snowflake role that ran the adopted query; baselines are shared across roles
+    db = get_local_db()
+    _init_db(db)
+    usage = _usage_by_entry(db)
+    entry_ids = {e["entry_id"] for e in _load_entries(db, conn_details["account"])}
+    db.close()
+
+    teams = {}
+    for entry_id, rows in usage.items():
+        before_n, before_ms, before_credits = _phase_totals(rows, "before")
+        if entry_id not in entry_ids or not before_n:
+            continue
+        for r in rows:
+            if r["phase"] != "after" or not r["executions"]:
+                continue
+            team = teams.setdefault(r["role"] or "(unknown)", {"team": r["role"] or "(unknown)", "rewrites": set(), "adopted_runs": 0,
+                                                               "elapsed_saved_s": 0.0, "credits_saved": 0.0})
+            team["rewrites"].add(entry_id)
+            team["adopted_runs"] += r["executions"]
+            team["elapsed_saved_s"] += (before_ms / before_n * r["executions"] - r["elapsed_ms"]) / 1000
+            team["credits_saved"] += before_credits / before_n * r["executions"] - r["credits"]
+    return sorted(({**t, "rewrites": len(t["rewrites"])} for t in teams.values()), key=lambda t: t["credits_saved"], reverse=True)
+
+def savings_by_kind(report: list) -> list:
+    """Which kinds of rewrite pay off: adoption rate and realized against predicted gain per kind."""
+    kinds = {}
+    for r in report:
+        kind = kinds.setdefault(r["rewrite_kind"] or "llm", {"rewrite_kind": r["rewrite_kind"] or "llm", "rewrites": 0, "adopted": 0,
+                                                             "predicted": [], "realized": [], "credits_saved": 0.0})
+        kind["rewrites"] += 1
+        if r["adopted_runs"]:
+            kind["adopted"] += 1
+        if r["realized_gain"] is not None:
+            kind["realized"].append(r["realized_gain"])
+            if r["predicted_gain"] is not None:
+                kind["predicted"].append(r["predicted_gain"])
+        kind["credits_saved"] += r["credits_saved"] or 0
+    return [{
+        "rewrite_kind": k["rewrite_kind"],
+        "rewrites": k["rewrites"],
+        "adoption_rate": k["adopted"] / k["rewrites"],
+        "avg_predicted_gain": sum(k["predicted"]) / len(k["predicted"]) if k["predicted"] else None,
+        "avg_realized_gain": sum(k["realized"]) / len(k["realized"]) if k["realized"] else None,
+        "credits_saved": k["credits_saved"],
+    } for k in sorted(kinds.values(), key=lambda k: k["credits_saved"], reverse=True)]
+
+# --- Periodic Sync ---
+
+_sync_started = False
+_sync_lock = threading.Lock()
+
+def start_periodic_sync(load_connections, interval: float = SYNC_INTERVAL_SECONDS):
+    """Runs sync_realized_savings for every saved connection on a daemon thread; only the first call starts it."""
+    global _sync_started
+    with _sync_lock:
+        if _sync_started:
+            return
+        _sync_started = True
+
+    def loop():
+        from shared.fanout import fan_out
+        while True:
+            try:
+                fan_out(sync_realized_savings, load_connections(), timeout=interval)
+            except Exception as e:
+                print(f"Ledger sync failed: {e}")
+            time.sleep(interval)
+
+    threading.Thread(target=loop, name="optiverse-ledger-sync", daemon=True).start()
@@ -0,0 +1,47 @@
+import streamlit as st
+import pandas as pd
+from modules.ledger.ledger import sync_realized_savings, realized_savings, savings_by_team, savings_by_kind, BASELINE_DAYS
+
+def render(conn_dict):
+    st.header("📒 Optimization Ledger")
+    st.caption(f"Every optimizer run, matched against QUERY_HISTORY by query fingerprint. Baselines are the original query's runs "
+               f"in the {BASELINE_DAYS} days before the rewrite was recorded; savings count only runs that used the rewrite.")
+
+    if st.button("🔄 Sync with QUERY_HISTORY"):
+        with st.spinner("Matching fingerprints and measuring before/after usage..."):
+            try:
+                measured = sync_realized_savings(conn_dict)
+                st.success(f"✅ {measured} rewrites matched to executed queries.")
+            except Exception as e:
+                st.error(f"❌ Sync failed: {e}")
+
+    report = realized_savings(conn_dict)
+    if not report:
+        st.info("No optimizations recorded for this account yet. Runs from the Query Optimizer are added automatically.")
+        return
+
+    adopted = [r for r in report if r["adopted_runs"]]
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Rewrites recorded", len(report))
+    col2.metric("Adopted", len(adopted))
+    col3.metric("Credits saved (est.)", f"{sum(r['credits_saved'] or 0 for r in report):,.3f}")
+
+    st.markdown("### By Rewrite")
+    df = pd.DataFrame(report)
+    st.dataframe(df.drop(columns=["original_sql", "optimized_sql"]), use_container_width=True, hide_index=True)
+    entry_id = st.selectbox("Show SQL for entry", df["entry_id"].tolist())
+    entry = next(r for r in report if r["entry_id"] == entry_id)
+    col_o, col_n = st.columns(2)
+    col_o.code(entry["original_sql"], language="sql")
+    col_n.code(entry["optimized_sql"], language="sql")
+
+    st.markdown("### By Team (Snowflake role)")
+    teams = savings_by_team(conn_dict)
+    if teams:
+        st.dataframe(pd.DataFrame(teams), use_container_width=True, hide_index=True)
+    else:
+        st.caption("No adopted rewrites yet.")
+
+    st.markdown("### What Pays Off")
+    st.caption("Adoption rate and average realized gain in elapsed time per kind of rewrite, against the plan-cost gain predicted at the time.")
+    st.dataframe(pd.DataFrame(savings_by_kind(report)), use_container_width=True, hide_index=True)
@@ -0,0 +1,40 @@
+import streamlit as st
+import pandas as pd
+from modules.mv_advisor.workload_miner import load_workload, mine_blocks, recommend_materializations, DEFAULT_TARGET_LAG_MINUTES
+from shared.session_store import put_artifact, get_artifact
+
+def render(conn_dict):
+    st.header("🧱 Materialized View & Dynamic Table Advisor")
+    st.caption("Finds join and aggregate blocks that many queries recompute and proposes materializing them once.")
+
+    col1, col2, col3 = st.columns(3)
+    days = col1.slider("Look back (days)", min_value=1, max_value=30, value=30)
+    target_lag = col2.number_input("Dynamic table target lag (minutes)", min_value=1, max_value=1440, value=DEFAULT_TARGET_LAG_MINUTES)
+    min_executions = col3.number_input("Minimum reuse (executions)", min_value=1, value=50)
+
+    if st.button("⛏️ Mine Workload"):
+        with st.spinner("Parsing distinct statements from QUERY_HISTORY..."):
+            try:
+                workload = load_workload(conn_dict, days)
+                put_artifact("mv_blocks", mine_blocks(workload))
+                st.session_state["mv_text_count"] = len(workload)
+            except Exception as e:
+                st.error(f"❌ Mining failed: {e}")
+                return
+
+    blocks = get_artifact("mv_blocks")
+    if blocks is None:
+        return
+    recommendations = recommend_materializations(blocks, days, conn_dict["warehouse"], int(target_lag), int(min_executions))
+    st.write(f"Parsed {st.session_state.get('mv_text_count', 0)} distinct statements into {len(blocks)} reusable blocks.")
+    if not recommendations:
+        st.info("No repeated block saves more than it would cost to maintain.")
+        return
+
+    df = pd.DataFrame(recommendations)
+    st.dataframe(df.drop(columns=["ddl"]), use_container_width=True, hide_index=True)
+    st.caption("Savings assume queries read the materialization instead of recomputing; maintenance assumes incremental refreshes at the target lag.")
+
+    for rec in recommendations:
+        with st.expander(f"{rec['kind']} · {rec['executions']:,} executions · {rec['net_credits']:.2f} net credits"):
+            st.code(rec["ddl"], language="sql")
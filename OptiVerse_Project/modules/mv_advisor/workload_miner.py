@@ -0,0 +1,162 @@
+import hashlib
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from sqlglot import exp
+from shared.snowflake_connector import connect_to_snowflake
+from shared.snowflake_costs import credits_per_hour_sql
+from shared.sql_analysis import parse_sql, nondeterministic_functions
+
+MAX_DISTINCT_TEXTS = 50000
+FETCH_BATCH = 5000
+PARALLEL_MIN_TEXTS = 500
+PARSE_CHUNKSIZE = 64
+MIN_BLOCK_EXECUTIONS = 50
+# Share of a query's time attributed to a block: all of it when the block is the query, part of it when nested
+NESTED_BLOCK_SHARE = 0.5
+# Reading a precomputed result still costs a scan of the (much smaller) materialization
+MATERIALIZED_SPEEDUP = 0.9
+# Incremental refreshes touch only changed partitions; this is a planning figure, not a measurement
+INCREMENTAL_REFRESH_RATIO = 0.2
+DEFAULT_TARGET_LAG_MINUTES = 60
+
+def load_workload(conn_details: dict, days: int = 30) -> list:
+    # Identical texts are collapsed server-side so only distinct statements cross the wire and get parsed
+    conn = connect_to_snowflake(conn_details)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT ANY_VALUE(QUERY_TEXT), ANY_VALUE(DATABASE_NAME), ANY_VALUE(SCHEMA_NAME), COUNT(*),
+                   SUM(TOTAL_ELAPSED_TIME), SUM(EXECUTION_TIME / 3600000 * {credits_per_hour_sql()})
+            FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
+            WHERE START_TIME >= DATEADD(day, -{days}, CURRENT_TIMESTAMP())
+              AND QUERY_TYPE = 'SELECT' AND EXECUTION_STATUS = 'SUCCESS' AND WAREHOUSE_NAME IS NOT NULL
+            GROUP BY QUERY_HASH
+            ORDER BY SUM(TOTAL_ELAPSED_TIME) DESC
+            LIMIT {MAX_DISTINCT_TEXTS}
+        """)
+        columns = ["query_text", "database", "schema", "executions", "elapsed_ms", "credits"]
+        workload = []
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH)
+            if not rows:
+                break
+            workload.extend(dict(zip(columns, row)) for row in rows)
+        return workload
+    finally:
+        cursor.close()
+        conn.close()
+
+def _block_sources(select: exp.Select) -> list:
+    sources = [select.args.get("from_") or select.args.get("from")] + list(select.args.get("joins") or [])
+    return [s.this for s in sources if s is not None]
+
+def _is_candidate(select: exp.Select, cte_names: set) -> bool:
+    sources = _block_sources(select)
+    if not sources or not all(isinstance(s, exp.Table) and s.name.lower() not in cte_names for s in sources):
+        return False
+    if not (select.args.get("group") or select.args.get("joins")):
+        return False
+    # Subquery predicates and nondeterministic functions cannot be materialized as-is
+    if any(s is not select for s in select.find_all(exp.Select)):
+        return False
+    return not nondeterministic_functions(select)
+
+def canonicalize_block(select: exp.Select, database: str, schema: str) -> str:
+    block = select.copy()
+    block.set("order", None)
+    block.set("limit", None)
+
+    # Fully qualify tables and rename aliases by position so t.x and s.x on the same table hash the same
+    aliases = {}
+    for position, table in enumerate(_block_sources(block)):
+        old_alias = table.alias_or_name.lower()
+        if not table.catalog and database:
+            table.set("catalog", exp.to_identifier(database))
+        if not table.db and schema:
+            table.set("db", exp.to_identifier(schema))
+        new_alias = f"t{position}"
+        table.set("alias", exp.TableAlias(this=exp.to_identifier(new_alias)))
+        aliases[old_alias] = new_alias
+    single_table = len(aliases) == 1
+    for column in block.find_all(exp.Column):
+        if column.table:
+            column.set("table", exp.to_identifier(aliases.get(column.table.lower(), column.table)))
+        elif single_table:
+            column.set("table", exp.to_identifier("t0"))
+
+    where = block.args.get("where")
+    if where is not None:
+        conjuncts = sorted((c.sql(dialect="snowflake") for c in where.this.flatten()) if isinstance(where.this, exp.And)
+                           else [where.this.sql(dialect="snowflake")])
+        block.set("where", exp.Where(this=exp.and_(*conjuncts, dialect="snowflake")))
+    return block.sql(dialect="snowflake", normalize=True)
+
+def extract_blocks(sql: str, database: str = "", schema: str = "") -> list:
+    # Returns (hash, canonical_sql, table_count, share) for each join/aggregate block in the statement
+    tree = parse_sql(sql)
+    if tree is None:
+        return []
+    cte_names = {cte.alias.lower() for cte in tree.find_all(exp.CTE)}
+    blocks = []
+    for select in tree.find_all(exp.Select):
+        if not _is_candidate(select, cte_names):
+            continue
+        canonical = canonicalize_block(select, database, schema)
+        digest = hashlib.md5(canonical.encode()).hexdigest()[:16]
+        outermost = select.find_ancestor(exp.Select) is None and select.find_ancestor(exp.CTE) is None
+        blocks.append((digest, canonical, len(_block_sources(select)), 1.0 if outermost else NESTED_BLOCK_SHARE))
+    return blocks
+
+def _extract_row(row: tuple) -> list:
+    return extract_blocks(*row)
+
+def mine_blocks(workload: list) -> dict:
+    rows = [(q["query_text"], q["database"] or "", q["schema"] or "") for q in workload]
+    if len(rows) >= PARALLEL_MIN_TEXTS:
+        with ProcessPoolExecutor() as pool:
+            parsed = list(pool.map(_extract_row, rows, chunksize=PARSE_CHUNKSIZE))
+    else:
+        parsed = [_extract_row(row) for row in rows]
+
+    blocks = defaultdict(lambda: {"executions": 0, "distinct_texts": 0, "elapsed_ms": 0.0, "credits": 0.0})
+    for query, query_blocks in zip(workload, parsed):
+        for digest, canonical, table_count, share in query_blocks:
+            block = blocks[digest]
+            block["sql"], block["table_count"] = canonical, table_count
+            block["executions"] += query["executions"]
+            block["distinct_texts"] += 1
+            block["elapsed_ms"] += float(query["elapsed_ms"] or 0) * share
+            block["credits"] += float(query["credits"] or 0) * share
+    return blocks
+
+def recommend_materializations(blocks: dict, days: int, warehouse: str, target_lag_minutes: int = DEFAULT_TARGET_LAG_MINUTES,
+                               min_executions: int = MIN_BLOCK_EXECUTIONS, limit: int = 20) -> list:
+    refreshes = days * 24 * 60 / target_lag_minutes
+    recommendations = []
+    for digest, block in blocks.items():
+        if block["executions"] < min_executions:
+            continue
+        # Snowflake materialized views cannot contain joins; dynamic tables can
+        if block["table_count"] == 1:
+            kind = "materialized view"
+            ddl = f"CREATE MATERIALIZED VIEW MV_{digest.upper()} AS\n{block['sql']}"
+        else:
+            kind = "dynamic table"
+            ddl = (f"CREATE DYNAMIC TABLE DT_{digest.upper()}\n  TARGET_LAG = '{target_lag_minutes} minutes'\n"
+                   f"  WAREHOUSE = {warehouse}\nAS\n{block['sql']}")
+        per_run_credits = block["credits"] / block["executions"]
+        saved = block["credits"] * MATERIALIZED_SPEEDUP
+        maintenance = per_run_credits * INCREMENTAL_REFRESH_RATIO * refreshes
+        recommendations.append({
+            "block": digest,
+            "kind": kind,
+            "executions": block["executions"],
+            "distinct_texts": block["distinct_texts"],
+            "elapsed_hours": round(block["elapsed_ms"] / 3600000, 2),
+            "credits_saved": round(saved, 2),
+            "maintenance_credits": round(maintenance, 2),
+            "net_credits": round(saved - maintenance, 2),
+            "ddl": ddl,
+        })
+    recommendations.sort(key=lambda r: r["net_credits"], reverse=True)
+    return [r for r in recommendations if r["net_credits"] > 0][:limit]
@@ -0,0 +1,43 @@
+from shared.snowflake_connector import connect_to_snowflake
+from shared.snowflake_costs import credits_per_hour_sql
+from shared.query_tag import QUERY_TAG_PREFIX
+
+OVERHEAD_COLUMNS = [
+    "day", "module", "action", "queries", "sessions", "elapsed_s", "execution_s", "compilation_s",
+    "cloud_services_credits", "compute_credits_est", "bytes_scanned",
+]
+
+def load_overhead(conn_details: dict, days: int = 7) -> list:
+    """OptiVerse's own statements from QUERY_HISTORY, found by QUERY_TAG and grouped by day, module and action.
+
+    Compute credits are estimated from execution time at the warehouse's hourly rate, which ignores
+    concurrency on a shared warehouse and so overstates the share of a busy one.
+    """
+    conn = connect_to_snowflake(conn_details)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT TO_VARCHAR(DATE_TRUNC(day, START_TIME), 'YYYY-MM-DD'),
+                   TRY_PARSE_JSON(QUERY_TAG):"module"::STRING,
+                   TRY_PARSE_JSON(QUERY_TAG):"action"::STRING,
+                   COUNT(*),
+                   COUNT(DISTINCT TRY_PARSE_JSON(QUERY_TAG):"session"::STRING),
+                   SUM(TOTAL_ELAPSED_TIME) / 1000,
+                   SUM(EXECUTION_TIME) / 1000,
+                   SUM(COMPILATION_TIME) / 1000,
+                   SUM(CREDITS_USED_CLOUD_SERVICES),
+                   SUM(IFF(WAREHOUSE_SIZE IS NULL, 0, EXECUTION_TIME / 3600000 * {credits_per_hour_sql()})),
+                   SUM(BYTES_SCANNED)
+            FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
+            WHERE START_TIME >= DATEADD(day, -{days}, CURRENT_TIMESTAMP())
+              AND STARTSWITH(QUERY_TAG, '{QUERY_TAG_PREFIX}')
+            GROUP BY 1, 2, 3
+        """)
+        rows = [dict(zip(OVERHEAD_COLUMNS, row)) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+    for row in rows:
+        for key in OVERHEAD_COLUMNS[3:]:
+            row[key] = float(row[key] or 0)
+    return rows
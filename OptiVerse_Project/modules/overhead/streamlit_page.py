@@ -0,0 +1,47 @@
+import streamlit as st
+import pandas as pd
+from modules.overhead.overhead_report import load_overhead
+from shared.session_store import put_artifact, get_artifact
+
+def render(conn_dict):
+    st.header("🧾 OptiVerse Overhead")
+    st.caption("What OptiVerse itself costs: every statement it runs carries a QUERY_TAG naming the page, action and session. "
+               "Statements on pooled connections (EXPLAIN, DESC TABLE, home metrics) are tagged with the action 'pooled'. "
+               "ACCOUNT_USAGE lags by up to 45 minutes.")
+
+    days = st.slider("Look back (days)", min_value=1, max_value=30, value=7)
+    if st.button("📥 Load Overhead"):
+        with st.spinner("Reading tagged queries from QUERY_HISTORY..."):
+            try:
+                put_artifact("overhead_rows", load_overhead(conn_dict, days))
+            except Exception as e:
+                st.error(f"❌ Failed to load overhead: {e}")
+                return
+
+    rows = get_artifact("overhead_rows")
+    if rows is None:
+        return
+    if not rows:
+        st.info("No tagged OptiVerse queries in this window yet.")
+        return
+
+    df = pd.DataFrame(rows)
+    df["total_credits"] = df["cloud_services_credits"] + df["compute_credits_est"]
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Queries", f"{int(df['queries'].sum()):,}")
+    col2.metric("Cloud services credits", f"{df['cloud_services_credits'].sum():,.3f}")
+    col3.metric("Compute credits (est.)", f"{df['compute_credits_est'].sum():,.3f}")
+    col4.metric("Elapsed (min)", f"{df['elapsed_s'].sum() / 60:,.1f}")
+
+    st.markdown("### By Page")
+    metrics = ["queries", "elapsed_s", "compilation_s", "cloud_services_credits", "compute_credits_est", "total_credits"]
+    by_module = df.groupby("module")[metrics].sum().sort_values("total_credits", ascending=False)
+    st.dataframe(by_module.round(4), use_container_width=True)
+
+    st.markdown("### By Action")
+    by_action = df.groupby(["module", "action"])[metrics + ["bytes_scanned"]].sum().sort_values("total_credits", ascending=False)
+    st.dataframe(by_action.round(4), use_container_width=True)
+
+    st.markdown("### Credits by Day")
+    st.bar_chart(df.pivot_table(index="day", columns="module", values="total_credits", aggfunc="sum").fillna(0))
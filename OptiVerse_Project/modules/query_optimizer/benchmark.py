@@ -0,0 +1,107 @@
+import random
+import statistics
+from shared.snowflake_connector import connect_to_snowflake
+
+BOOTSTRAP_SAMPLES = 2000
+# A bootstrap over one sample per side always returns the point estimate; no interval is reported below this
+MIN_RUNS_FOR_CI = 2
+
+def _strip_sql(sql: str) -> str:
+    return sql.strip().rstrip(";").strip()
+
+def fetch_query_metrics(cursor, query_ids: list) -> dict:
+    id_list = ", ".join(f"'{qid}'" for qid in query_ids)
+    # Session-scoped history is available immediately, unlike ACCOUNT_USAGE.QUERY_HISTORY
+    cursor.execute(f"""
+        SELECT QUERY_ID, TOTAL_ELAPSED_TIME, EXECUTION_TIME, BYTES_SCANNED,
+               BYTES_SPILLED_TO_LOCAL_STORAGE, BYTES_SPILLED_TO_REMOTE_STORAGE
+        FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY_BY_SESSION(RESULT_LIMIT => 10000))
+        WHERE QUERY_ID IN ({id_list})
+    """)
+    return {
+        row[0]: {
+            "elapsed_ms": row[1] or 0,
+            "execution_ms": row[2] or 0,
+            "bytes_scanned": row[3] or 0,
+            "spill_local": row[4] or 0,
+            "spill_remote": row[5] or 0,
+        }
+        for row in cursor.fetchall()
+    }
+
+def result_fingerprint(cursor, sql: str) -> tuple:
+    """Row count and order-insensitive hash of a result; None when the query cannot be wrapped in a subquery.
+
+    A SELECT with two columns of the same name (SELECT a.id, b.id ...) runs on its own but is rejected as a
+    subquery, so its result cannot be fingerprinted this way.
+    """
+    # HASH_AGG is order-insensitive, so only two numbers leave the warehouse
+    try:
+        cursor.execute(f"SELECT COUNT(*), HASH_AGG(*) FROM ({_strip_sql(sql)})")
+    except Exception as e:
+        if "duplicate column name" in str(e).lower():
+            return None
+        raise
+    return tuple(cursor.fetchone())
+
+def speedup_interval(original_ms: list, optimized_ms: list, confidence: float = 0.95) -> tuple:
+    point = statistics.mean(original_ms) / max(statistics.mean(optimized_ms), 1)
+    rng = random.Random(0)
+    samples = []
+    for _ in range(BOOTSTRAP_SAMPLES):
+        orig = [rng.choice(original_ms) for _ in original_ms]
+        opt = [rng.choice(optimized_ms) for _ in optimized_ms]
+        samples.append(statistics.mean(orig) / max(statistics.mean(opt), 1))
+    samples.sort()
+    tail = (1 - confidence) / 2
+    low = samples[int(tail * len(samples))]
+    high = samples[min(int((1 - tail) * len(samples)), len(samples) - 1)]
+    return point, low, high
+
+def run_benchmark(original_sql: str, optimized_sql: str, conn_details: dict, runs: int = 3) -> dict:
+    conn = connect_to_snowflake(conn_details)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("ALTER SESSION SET USE_CACHED_RESULT = FALSE")
+
+        queries = [("original", _strip_sql(original_sql)), ("optimized", _strip_sql(optimized_sql))]
+        query_ids = {"original": [], "optimized": []}
+        for i in range(runs):
+            # Alternate the order every round so warehouse cache warm-up does not favour one side
+            for label, sql in (queries if i % 2 == 0 else queries[::-1]):
+                cursor.execute(sql)
+                query_ids[label].append(cursor.sfqid)
+
+        metrics = fetch_query_metrics(cursor, query_ids["original"] + query_ids["optimized"])
+        original_fp = result_fingerprint(cursor, original_sql)
+        optimized_fp = result_fingerprint(cursor, optimized_sql)
+    finally:
+        cursor.close()
+        conn.close()
+
+    report = {"runs": runs, "query_ids": query_ids}
+    for label in ["original", "optimized"]:
+        rows = [metrics[qid] for qid in query_ids[label] if qid in metrics]
+        report[label] = {
+            "elapsed_ms": [r["elapsed_ms"] for r in rows],
+            "median_elapsed_ms": statistics.median([r["elapsed_ms"] for r in rows]) if rows else None,
+            "bytes_scanned": max((r["bytes_scanned"] for r in rows), default=0),
+            "spill_local": max((r["spill_local"] for r in rows), default=0),
+            "spill_remote": max((r["spill_remote"] for r in rows), default=0),
+        }
+
+    original_ms, optimized_ms = report["original"]["elapsed_ms"], report["optimized"]["elapsed_ms"]
+    if len(original_ms) >= MIN_RUNS_FOR_CI and len(optimized_ms) >= MIN_RUNS_FOR_CI:
+        speedup, low, high = speedup_interval(original_ms, optimized_ms)
+    elif original_ms and optimized_ms:
+        speedup, low, high = statistics.mean(original_ms) / max(statistics.mean(optimized_ms), 1), None, None
+    else:
+        speedup, low, high = None, None, None
+
+    report["speedup"] = speedup
+    report["speedup_ci"] = (low, high)
+    report["row_count"] = (original_fp[0] if original_fp else None, optimized_fp[0] if optimized_fp else None)
+    # None means the results could not be compared, which is not the same as differing
+    report["equivalent"] = original_fp == optimized_fp if original_fp and optimized_fp else None
+    report["safe_to_ship"] = report["equivalent"] is True and low is not None and low >= 1.0
+    return report
@@ -0,0 +1,81 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import cycle
+from llm.ollama_helpers import call_llm
+from modules.query_optimizer.explain_utils import run_explain, parse_plan_stats, plan_cost, cost_margin, is_plan_error
+from modules.query_optimizer.prompt_utils import build_optimization_prompt, extract_sql_only, clean_optimized_query
+from modules.query_optimizer.prompt_budget import prompt_budget
+from modules.query_optimizer.repair_loop import validate_rewrite
+
+# Each strategy nudges the model towards a different family of rewrites
+PROMPT_STRATEGIES = {
+    "general": "",
+    "pruning": "Focus: maximize partition pruning. Push selective filters as close to the table scans as possible and avoid wrapping filtered columns in functions.",
+    "joins": "Focus: reduce join cost. Filter and pre-aggregate each input before joining and remove joins whose columns are never used.",
+    "projection": "Focus: reduce bytes scanned. Select only the columns that are needed and avoid SELECT * in CTEs and subqueries.",
+}
+CANDIDATE_TEMPERATURES = [0.0, 0.4, 0.8]
+
+def build_candidate_specs(n_candidates: int, providers: list) -> list:
+    strategies = list(PROMPT_STRATEGIES.keys())
+    specs = []
+    provider_cycle = cycle(providers)
+    for i in range(n_candidates):
+        provider, model = next(provider_cycle)
+        specs.append({
+            "strategy": strategies[i % len(strategies)],
+            "temperature": CANDIDATE_TEMPERATURES[(i // len(strategies)) % len(CANDIDATE_TEMPERATURES)],
+            "provider": provider,
+            "model": model,
+        })
+    return specs
+
+def _generate_and_validate(query: str, schema_hint: str, workload_hint: str, candidate_hint: str, spec: dict, conn_details: dict,
+                           stop: threading.Event) -> dict:
+    strategy_hint = PROMPT_STRATEGIES[spec["strategy"]]
+    prompt = build_optimization_prompt(query, schema_hint, strategy_hint, workload_hint, candidate_hint, prompt_budget(spec["model"]))
+    raw = call_llm(prompt, model=spec["model"], provider=spec["provider"], temperature=spec["temperature"])
+    checked = validate_rewrite(query, clean_optimized_query(extract_sql_only(raw)), raw, conn_details, spec["provider"],
+                               spec["model"], spec["temperature"], schema_hint, stop=stop)
+    return {**spec, **checked, "stats": parse_plan_stats(checked["plan"]) if checked["valid"] else None, "stopped": False}
+
+def _stopped_candidate(spec: dict) -> dict:
+    return {**spec, "raw": "", "query": "", "plan": "", "stats": None, "valid": False, "repairs": 0, "errors": [], "margin": None, "stopped": True}
+
+def search_rewrites(query: str, conn_details: dict, providers: list, n_candidates: int = 4, schema_hint: str = "",
+                    workload_hint: str = "", candidate_hint: str = "", early_stop: bool = True) -> dict:
+    specs = build_candidate_specs(n_candidates, providers)
+    stop = threading.Event()
+    finished = {}
+
+    # Original EXPLAIN runs alongside the candidates so it adds no wall-clock time
+    pool = ThreadPoolExecutor(max_workers=n_candidates + 1)
+    try:
+        original_future = pool.submit(run_explain, query, conn_details)
+        futures = {pool.submit(_generate_and_validate, query, schema_hint, workload_hint, candidate_hint, spec, conn_details, stop): i
+                   for i, spec in enumerate(specs)}
+        original_plan = original_future.result()
+        original_stats = parse_plan_stats(original_plan)
+        for future in as_completed(futures):
+            candidate = future.result()
+            candidate["margin"] = cost_margin(original_stats, candidate["stats"]) if candidate["valid"] else None
+            finished[futures[future]] = candidate
+            # Without a plan for the original there is nothing to improve on, so every candidate runs
+            if early_stop and candidate["valid"] and candidate["margin"] > 0 and not is_plan_error(original_plan):
+                break
+    finally:
+        # Candidates still generating finish in the background and skip their remaining repair rounds
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    candidates = [finished.get(i) or _stopped_candidate(spec) for i, spec in enumerate(specs)]
+    valid = [c for c in candidates if c["valid"]]
+    best = min(valid, key=lambda c: plan_cost(c["stats"])) if valid else None
+
+    return {
+        "original_plan": original_plan,
+        "original_stats": original_stats,
+        "best": best,
+        "margin": best["margin"] if best else None,
+        "candidates": candidates,
+    }
@@ -0,0 +1,77 @@
+import re
+from llm.ollama_helpers import call_llm
+from shared.connection_pool import pooled_connection
+from shared.shared_cache import shared_cached, connection_identity
+from modules.query_optimizer.explain_utils import run_explain
+from modules.query_optimizer.prompt_utils import clean_optimized_query, extract_sql_only, build_optimization_prompt
+from modules.query_optimizer.prompt_budget import prompt_budget, relevant_columns
+from modules.query_optimizer.repair_loop import validate_rewrite
+from modules.query_optimizer.template_cache import reuse_rewrite, remember_rewrite
+
+DEFAULT_PROVIDER = "together"
+DEFAULT_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+
+# Session-free versions of the optimizer steps, shared by the Streamlit page and the HTTP service
+
+def describe_table(table_name: str, conn_details: dict) -> list:
+    desc_target = table_name if table_name.count(".") == 2 else f"{conn_details['database']}.{conn_details['schema']}.{table_name}"
+
+    def load():
+        try:
+            with pooled_connection(conn_details) as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(f"DESC TABLE {desc_target}")
+                    return [row[0] for row in cursor.fetchall()]
+                finally:
+                    cursor.close()
+        except Exception as e:
+            print(f"Error during DESC TABLE: {e}")
+            return []
+
+    # An empty column list means DESC failed; other sessions should retry rather than share it
+    return shared_cached("catalog", connection_identity(conn_details) + [desc_target.upper()], load, keep=bool)
+
+def get_table_columns(query: str, conn_details: dict) -> list:
+    match = re.search(r"from\s+([a-zA-Z0-9_\.]+)", query, re.IGNORECASE)
+    table_name = match.group(1) if match else None
+    if not table_name:
+        return []
+    return describe_table(table_name, conn_details)
+
+def get_column_hints(query: str, conn_details: dict) -> tuple:
+    # Only the columns the query uses go in the prompt, plus unused key/date columns as join and filter candidates
+    if query.strip().lower().startswith("with"):
+        return "", ""
+    columns = get_table_columns(query, conn_details)
+    referenced, candidates = relevant_columns(query, columns)
+    schema_hint = f"Available columns: {', '.join(referenced)}\n" if referenced else ""
+    candidate_hint = f"Other join/filter candidate columns: {', '.join(candidates)}\n" if candidates else ""
+    return schema_hint, candidate_hint
+
+def get_schema_hint(query: str, conn_details: dict) -> str:
+    return "".join(get_column_hints(query, conn_details))
+
+def optimize_query(query: str, conn_details: dict, provider: str = DEFAULT_PROVIDER, model: str = DEFAULT_MODEL,
+                   workload_hint: str = "") -> dict:
+    schema_hint, candidate_hint = get_column_hints(query, conn_details)
+    prompt = build_optimization_prompt(query, schema_hint, workload_hint=workload_hint, candidate_hint=candidate_hint,
+                                       budget_tokens=prompt_budget(model))
+    raw = call_llm(prompt, model=model, provider=provider)
+    return {"optimized_query": clean_optimized_query(extract_sql_only(raw)), "raw": raw}
+
+def optimize_and_explain(query: str, conn_details: dict, provider: str = DEFAULT_PROVIDER, model: str = DEFAULT_MODEL,
+                         workload_hint: str = "") -> dict:
+    # optimized_plan is an EXPLAIN plan only when valid; after failed repairs it holds Snowflake's last error
+    reused = reuse_rewrite(query, conn_details)
+    if reused:
+        return reused
+    result = optimize_query(query, conn_details, provider, model, workload_hint)
+    result["original_plan"] = run_explain(query, conn_details)
+    checked = validate_rewrite(query, result["optimized_query"], result["raw"], conn_details, provider, model)
+    result.update(optimized_query=checked["query"], raw=checked["raw"], optimized_plan=checked["plan"],
+                  valid=checked["valid"], repairs=checked["repairs"], compile_errors=checked["errors"], template_reused=False)
+    if result["valid"]:
+        remember_rewrite(conn_details, query, result["optimized_query"], result["original_plan"], result["optimized_plan"],
+                         "llm", provider, model)
+    return result
@@ -1,2 +1,64 @@
+import re
+from shared.connection_pool import pooled_connection
+from shared.shared_cache import shared_cached, connection_identity
+
 def parse_explain_output(cursor_result):
     return "\n".join([row[0] for row in cursor_result])
+
+def explain_statement(query: str) -> str:
+    return f"EXPLAIN USING TEXT {query}"
+
+def run_explain(query: str, conn_details: dict) -> str:
+    def load():
+        try:
+            with pooled_connection(conn_details) as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(explain_statement(query))
+                    return parse_explain_output(cursor.fetchall())
+                finally:
+                    cursor.close()
+        except Exception as e:
+            return f"Error: {e}"
+
+    key = connection_identity(conn_details) + [" ".join(query.split())]
+    return shared_cached("explain", key, load, keep=lambda plan: not is_plan_error(plan))
+
+# --- Plan Cost Signals ---
+
+JOIN_OPERATOR_PATTERN = re.compile(r"->\s*\w*Join\b", re.IGNORECASE)
+SCAN_OPERATOR_PATTERN = re.compile(r"->\s*TableScan\b", re.IGNORECASE)
+
+def is_plan_error(plan: str) -> bool:
+    return not plan or plan.startswith("Error:")
+
+def is_compile_error(plan: str) -> bool:
+    # Only errors in the SQL itself are worth sending back to the model; login or network failures are not
+    return is_plan_error(plan) and "compilation error" in (plan or "").lower()
+
+def parse_plan_stats(plan: str) -> dict:
+    stats = {"partitions_total": 0, "partitions_assigned": 0, "bytes_assigned": 0, "join_count": 0, "scan_count": 0}
+    if is_plan_error(plan):
+        return stats
+
+    # GlobalStats block comes first in EXPLAIN USING TEXT output
+    for key, name in [("partitionsTotal", "partitions_total"),
+                      ("partitionsAssigned", "partitions_assigned"),
+                      ("bytesAssigned", "bytes_assigned")]:
+        match = re.search(rf"\b{key}\s*=\s*(\d+)", plan)
+        if match:
+            stats[name] = int(match.group(1))
+
+    stats["join_count"] = len(JOIN_OPERATOR_PATTERN.findall(plan))
+    stats["scan_count"] = len(SCAN_OPERATOR_PATTERN.findall(plan))
+    return stats
+
+def plan_cost(stats: dict) -> tuple:
+    # Bytes dominate warehouse time; partitions and joins break ties
+    return (stats["bytes_assigned"], stats["partitions_assigned"], stats["join_count"])
+
+def cost_margin(original: dict, candidate: dict) -> float:
+    for key in ["bytes_assigned", "partitions_assigned", "join_count"]:
+        if original[key]:
+            return (original[key] - candidate[key]) / original[key]
+    return 0.0
@@ -0,0 +1,85 @@
+import json
+from shared.snowflake_connector import connect_to_snowflake
+
+EXPLODING_JOIN_FACTOR = 10
+EXPLODING_JOIN_MIN_ROWS = 100000
+# Share of an operator's time spent waiting on other threads; high values mean skewed work
+SKEW_SYNC_SHARE = 0.3
+SKEW_MIN_OVERALL = 0.05
+REMOTE_SPILL_FLAG_BYTES = 1e8
+MAX_PROMPT_FINDINGS = 5
+
+def _variant(value) -> dict:
+    if value is None:
+        return {}
+    return json.loads(value) if isinstance(value, str) else value
+
+def get_operator_stats(query_id: str, conn_details: dict) -> list:
+    conn = connect_to_snowflake(conn_details)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT OPERATOR_ID, OPERATOR_TYPE, PARENT_OPERATORS, OPERATOR_STATISTICS,
+                   EXECUTION_TIME_BREAKDOWN, OPERATOR_ATTRIBUTES
+            FROM TABLE(GET_QUERY_OPERATOR_STATS('{query_id}'))
+            ORDER BY OPERATOR_ID
+        """)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    return parse_operator_stats(rows)
+
+def parse_operator_stats(rows: list) -> list:
+    operators = []
+    for operator_id, operator_type, parents, statistics, breakdown, attributes in rows:
+        statistics, breakdown, attributes = _variant(statistics), _variant(breakdown), _variant(attributes)
+        spilling = statistics.get("spilling", {})
+        pruning = statistics.get("pruning", {})
+        operators.append({
+            "operator_id": operator_id,
+            "operator_type": operator_type,
+            "parents": _variant(parents) or [],
+            "input_rows": statistics.get("input_rows"),
+            "output_rows": statistics.get("output_rows", 0),
+            "overall_pct": breakdown.get("overall_percentage", 0.0),
+            "sync_pct": breakdown.get("synchronization", 0.0),
+            "spill_local": spilling.get("bytes_spilled_local_storage", 0),
+            "spill_remote": spilling.get("bytes_spilled_remote_storage", 0),
+            "partitions_scanned": pruning.get("partitions_scanned"),
+            "partitions_total": pruning.get("partitions_total"),
+            "detail": attributes.get("equality_join_condition") or attributes.get("table_name") or attributes.get("filter_condition") or "",
+        })
+
+    # Joins do not always report input_rows; fall back to the sum of their children's output
+    for op in operators:
+        if op["input_rows"] is None:
+            children = [c for c in operators if op["operator_id"] in c["parents"]]
+            op["input_rows"] = sum(c["output_rows"] or 0 for c in children)
+    return operators
+
+def detect_findings(operators: list) -> list:
+    findings = []
+    for op in operators:
+        label = f"{op['operator_type']} #{op['operator_id']}"
+        if "Join" in op["operator_type"] and op["output_rows"] >= EXPLODING_JOIN_MIN_ROWS \
+                and op["output_rows"] > EXPLODING_JOIN_FACTOR * max(op["input_rows"], 1):
+            findings.append({**op, "finding": "exploding join",
+                             "summary": f"{label}: exploding join, {op['input_rows']:,} rows in -> {op['output_rows']:,} rows out"})
+        if op["overall_pct"] >= SKEW_MIN_OVERALL and op["sync_pct"] >= SKEW_SYNC_SHARE * op["overall_pct"]:
+            findings.append({**op, "finding": "skew",
+                             "summary": f"{label}: skewed, {op['sync_pct'] / op['overall_pct']:.0%} of its time spent synchronizing"})
+        if op["spill_remote"] >= REMOTE_SPILL_FLAG_BYTES:
+            findings.append({**op, "finding": "remote spill",
+                             "summary": f"{label}: spilled {op['spill_remote'] / 1e9:.1f} GB to remote storage"})
+    return sorted(findings, key=lambda f: f["overall_pct"], reverse=True)
+
+def summarize_findings(findings: list, limit: int = MAX_PROMPT_FINDINGS) -> str:
+    if not findings:
+        return ""
+    lines = ["Runtime profile of an executed run (top operator problems):"]
+    for finding in findings[:limit]:
+        detail = f" [{finding['detail']}]" if finding["detail"] else ""
+        lines.append(f"- {finding['overall_pct']:.0%} of time · {finding['summary']}{detail}")
+    lines.append("Target these operators first.")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,116 @@
+import re
+from sqlglot import exp
+from llm.gateway import estimate_tokens, CHARS_PER_TOKEN
+from modules.api_config.config_manager import load_all_config
+from shared.sql_analysis import parse_sql
+
+# Context windows of the models we configure; anything unknown gets the conservative default
+MODEL_CONTEXT_TOKENS = {
+    "llama-4-8b": 8192,
+    "meta-llama/llama-4-scout-17b-16e-instruct": 32768,
+    "mistral": 8192,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+# Room left for the completion; a rewritten query is rarely longer than this
+OUTPUT_RESERVE_TOKENS = 2048
+# Even large-context models answer faster from a short prompt
+MAX_PROMPT_TOKENS = 6000
+
+CANDIDATE_COLUMN_PATTERN = re.compile(r"(^ID$|_ID$|_KEY$|_SK$|DATE|_TS$|TIMESTAMP|_AT$)", re.IGNORECASE)
+MAX_CANDIDATE_COLUMNS = 20
+PLAN_DETAIL_CHARS = 80
+MIN_PARTIAL_LINE_CHARS = 40
+
+def prompt_budget(model: str) -> int:
+    override = load_all_config().get("prompt_budgets", {}).get(model)
+    if override:
+        return int(override)
+    context = MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+    return min(context - OUTPUT_RESERVE_TOKENS, MAX_PROMPT_TOKENS)
+
+# --- Relevant Columns ---
+
+def relevant_columns(query: str, columns: list) -> tuple:
+    # Returns (referenced, candidates): columns the query names, then likely join/filter keys it does not
+    tree = parse_sql(query)
+    # SELECT * needs every column to be expanded, so nothing can be left out
+    if tree is None or any(isinstance(e, exp.Star) or (isinstance(e, exp.Column) and isinstance(e.this, exp.Star))
+                           for select in tree.find_all(exp.Select) for e in select.expressions):
+        return list(columns), []
+    named = {c.name.upper() for c in tree.find_all(exp.Column)}
+    referenced = [c for c in columns if c.upper() in named]
+    candidates = [c for c in columns if c.upper() not in named and CANDIDATE_COLUMN_PATTERN.search(c)]
+    return referenced, candidates[:MAX_CANDIDATE_COLUMNS]
+
+# --- Compact Plan Encoding ---
+
+OPERATOR_LINE = re.compile(r"^(?P<id>\d+:\d+)(?P<indent>\s+)->(?P<op>\w+)\s*(?P<detail>.*)$")
+PLAN_STAT = re.compile(r"(partitionsTotal|partitionsAssigned|bytesAssigned)\s*=\s*(\d+)")
+STAT_ABBREVIATIONS = {"partitionsTotal": "pt", "partitionsAssigned": "pa", "bytesAssigned": "b"}
+
+def _format_stats(text: str) -> str:
+    stats = PLAN_STAT.findall(text)
+    return " ".join(f"{STAT_ABBREVIATIONS[k]}={v}" for k, v in stats)
+
+def compact_plan(plan: str) -> str:
+    """Encodes EXPLAIN USING TEXT output as one short line per operator.
+
+    Stats become pt/pa/b (partitions total/assigned, bytes); indentation is kept as one space per level.
+    """
+    if not plan or plan.startswith("Error:"):
+        return plan
+    operators = []
+    for raw in plan.splitlines():
+        match = OPERATOR_LINE.match(raw.rstrip())
+        if not match:
+            continue
+        detail = PLAN_STAT.sub("", match.group("detail")).replace("{", "").replace("}", "").strip(" ,")
+        if len(detail) > PLAN_DETAIL_CHARS:
+            detail = detail[:PLAN_DETAIL_CHARS] + "…"
+        stats = _format_stats(match.group("detail"))
+        operators.append((len(match.group("id") + match.group("indent")), f"{match.group('op')} {detail}{' [' + stats + ']' if stats else ''}".rstrip()))
+    if not operators:
+        return plan
+
+    # Operators nest five columns deeper per level in the text output
+    base = min(column for column, _ in operators)
+    lines = []
+    global_stats = _format_stats(plan.split("Operations:")[0])
+    if global_stats:
+        lines.append(f"GlobalStats {global_stats}")
+    lines += [f"{' ' * ((column - base) // 5)}{line}" for column, line in operators]
+    return "\n".join(lines)
+
+# --- Priority Dropping ---
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    # Keeps whole lines from the top; the first line that does not fit is cut short rather than dropped
+    kept = []
+    for line in text.splitlines():
+        if estimate_tokens("\n".join(kept + [line])) <= budget:
+            kept.append(line)
+            continue
+        room = (budget - estimate_tokens("\n".join(kept))) * CHARS_PER_TOKEN
+        if room > MIN_PARTIAL_LINE_CHARS:
+            kept.append(line[:room - 1] + "…")
+        break
+    return "\n".join(kept)
+
+def fit_sections(required: str, sections: list, budget: int) -> dict:
+    """Keeps optional prompt sections within the token budget.
+
+    sections is a list of (name, text, priority); the lowest priority is dropped first, and the last
+    section that does not fit whole is cut line by line so some of it survives.
+    """
+    kept = {name: text for name, text, _ in sections}
+    used = estimate_tokens(required) + sum(estimate_tokens(t) for t in kept.values() if t)
+    for name, text, _ in sorted(sections, key=lambda s: s[2]):
+        if used <= budget:
+            break
+        if not text:
+            continue
+        used -= estimate_tokens(text)
+        trimmed = truncate_to_tokens(text, budget - used)
+        kept[name] = trimmed + "\n" if trimmed else ""
+        used += estimate_tokens(kept[name]) if kept[name] else 0
+    return kept
@@ -0,0 +1,66 @@
+import re
+from modules.query_optimizer.prompt_budget import fit_sections
+
+def clean_optimized_query(sql: str) -> str:
+    sql = sql.strip()
+    if "TOP" in sql.upper() or "LIMIT" in sql.upper():
+        sql = re.sub(r"\bTOP\s+\d+\b", "", sql, flags=re.IGNORECASE)
+        sql = re.sub(r"\bLIMIT\s+\d+\b", "", sql, flags=re.IGNORECASE)
+    return sql.replace(";;", ";").strip()
+
+def extract_sql_only(text: str) -> str:
+    text = re.sub(r"```(?:sql)?", "", text, flags=re.IGNORECASE).replace("```", "").strip()
+    match = re.search(r"(?is)\b(select|with)\b[\s\S]+", text)
+    return match.group(0).strip() if match else text
+
+def build_optimization_prompt(query: str, schema_hint: str = "", strategy_hint: str = "", workload_hint: str = "",
+                              candidate_hint: str = "", budget_tokens: int = None) -> str:
+    if budget_tokens:
+        # Lowest priority goes first: spare join/filter columns, then workload notes, the strategy, the referenced columns
+        kept = fit_sections(_render_prompt(query), [("candidate", candidate_hint, 0), ("workload", workload_hint, 1),
+                                                    ("strategy", strategy_hint, 2), ("schema", schema_hint, 3)], budget_tokens)
+        schema_hint, strategy_hint, workload_hint, candidate_hint = kept["schema"], kept["strategy"], kept["workload"], kept["candidate"]
+    return _render_prompt(query, schema_hint + candidate_hint, strategy_hint, workload_hint)
+
+def _render_prompt(query: str, schema_hint: str = "", strategy_hint: str = "", workload_hint: str = "") -> str:
+    return f"""
+You are an expert Snowflake SQL performance engineer.
+
+Your task is to optimize the following SQL query for performance using only **valid and executable Snowflake SQL syntax**. Ensure correctness, improve execution speed, and follow all Snowflake best practices.
+
+Output:
+- Must return only a complete, executable SQL query (including any WITH/CTE clauses if needed)
+- Must not include explanations, comments, markdown, or surrounding text
+
+Rules:
+1. ❌ DO NOT use `TOP N` — Snowflake does not support this syntax. Never include `TOP` in any part of the query.
+2. ❌ DO NOT use `LIMIT N` at the end or inside subqueries — instead use `ROW_NUMBER()`, `QUALIFY`, or `FILTERS` to reduce result size.
+3. ✅ Prefer using `QUALIFY ROW_NUMBER() OVER (...) <= N` to limit rows efficiently.
+4. ✅ Ensure deterministic ordering by including a unique key (e.g., `UNIQUE_SURROGATE_KEY`) in `ORDER BY` or `ROW_NUMBER()` functions.
+{strategy_hint}
+{workload_hint}{schema_hint}
+Original SQL Query:
+{query.strip()}
+""".strip()
+
+def build_repair_prompt(query: str, failed_sql: str, error: str, schema_hint: str = "") -> str:
+    return f"""
+You are an expert Snowflake SQL performance engineer.
+
+Your previous rewrite of the original query failed to compile in Snowflake. Fix the rewrite so that it compiles and returns exactly the same result as the original query, keeping its optimizations where possible.
+
+Output:
+- Must return only a complete, executable SQL query (including any WITH/CTE clauses if needed)
+- Must not include explanations, comments, markdown, or surrounding text
+- ❌ DO NOT use `TOP N` or `LIMIT N`
+
+{schema_hint}
+Snowflake error:
+{error.strip()}
+
+Failed rewrite:
+{failed_sql.strip()}
+
+Original SQL Query:
+{query.strip()}
+""".strip()
@@ -0,0 +1,43 @@
+from llm.ollama_helpers import call_llm
+from modules.query_optimizer.explain_utils import run_explain, is_plan_error, is_compile_error
+from modules.query_optimizer.prompt_utils import build_repair_prompt, extract_sql_only, clean_optimized_query
+
+# Each round costs one LLM call and one EXPLAIN; models that cannot fix a rewrite in two rarely do in three
+MAX_REPAIR_ROUNDS = 2
+NOT_A_QUERY_ERROR = "SQL compilation error: the output is not a single SELECT or WITH query."
+
+def is_select_query(sql: str) -> bool:
+    return sql.lower().startswith(("select", "with"))
+
+def validate_rewrite(query: str, sql: str, raw: str, conn_details: dict, provider: str, model: str,
+                     temperature: float = None, schema_hint: str = "", max_rounds: int = MAX_REPAIR_ROUNDS,
+                     stop=None) -> dict:
+    """Compiles a rewrite with EXPLAIN and, while Snowflake rejects it, asks the model to fix it.
+
+    plan is only ever a real EXPLAIN plan when valid is True; otherwise it holds the last error.
+    A set stop event ends the loop before the next repair round.
+    """
+    if raw.startswith("❌"):
+        return {"query": sql, "raw": raw, "plan": f"Error: {raw}", "valid": False, "repairs": 0, "errors": [f"Error: {raw}"]}
+
+    errors = []
+    for round_number in range(max_rounds + 1):
+        if round_number:
+            if not is_compile_error(errors[-1]) or (stop is not None and stop.is_set()):
+                break
+            raw = call_llm(build_repair_prompt(query, sql, errors[-1], schema_hint), model=model, provider=provider,
+                           temperature=temperature)
+            if raw.startswith("❌"):
+                errors.append(f"Error: {raw}")
+                break
+            sql = clean_optimized_query(extract_sql_only(raw))
+
+        if not is_select_query(sql):
+            errors.append(f"Error: {NOT_A_QUERY_ERROR}")
+            continue
+        plan = run_explain(sql, conn_details)
+        if not is_plan_error(plan):
+            return {"query": sql, "raw": raw, "plan": plan, "valid": True, "repairs": round_number, "errors": errors}
+        errors.append(plan)
+
+    return {"query": sql, "raw": raw, "plan": errors[-1], "valid": False, "repairs": len(errors) - 1, "errors": errors}
@@ -0,0 +1,360 @@
+import sqlglot
+from decimal import Decimal, InvalidOperation
+from sqlglot import exp
+from shared.sql_analysis import nondeterministic_functions
+
+# Deterministic, semantics-preserving rewrites that run before (or instead of) the LLM.
+# Every rule takes the parsed tree and returns (tree, changed); rules bail out whenever
+# they cannot prove the rewrite is safe.
+
+def _key(node, name):
+    # sqlglot renamed reserved-word args (from -> from_, with -> with_) in newer releases
+    return f"{name}_" if f"{name}_" in node.arg_types else name
+
+def _arg(node, name):
+    return node.args.get(_key(node, name))
+
+def _is_subquery_scope(select, root) -> bool:
+    if select is root:
+        return False
+    if isinstance(root, exp.SetOperation) and select.parent is root:
+        return False
+    return True
+
+def _selects(tree):
+    return list(tree.find_all(exp.Select))
+
+def _same_scope_columns(select):
+    return [c for c in select.find_all(exp.Column) if c.find_ancestor(exp.Select) is select]
+
+# --- Rules ---
+
+def remove_redundant_order_by(tree, column_lookup=None):
+    changed = False
+    for select in _selects(tree):
+        if not _is_subquery_scope(select, tree) or not select.args.get("order"):
+            continue
+        if select.args.get("limit") or select.args.get("offset") or select.args.get("fetch"):
+            continue
+        # Row order of a subquery or CTE without a row limit is never observable
+        select.set("order", None)
+        changed = True
+    return tree, changed
+
+def remove_redundant_distinct(tree, column_lookup=None):
+    changed = False
+    for select in _selects(tree):
+        distinct = select.args.get("distinct")
+        if not distinct or distinct.args.get("on"):
+            continue
+
+        in_membership_test = isinstance(select.parent, exp.Exists) or (
+            isinstance(select.parent, exp.Subquery) and isinstance(select.parent.parent, exp.In))
+
+        group = select.args.get("group")
+        projected = {p.unalias().sql() for p in select.expressions}
+        groups_fully_projected = bool(group) and all(g.sql() in projected for g in group.expressions)
+
+        if in_membership_test or groups_fully_projected:
+            select.set("distinct", None)
+            changed = True
+    return tree, changed
+
+def _row_number_filter(where, alias_names):
+    condition = where.this
+    if not isinstance(condition, (exp.EQ, exp.LT, exp.LTE)):
+        return None
+    column, literal = condition.this, condition.expression
+    if not isinstance(column, exp.Column) or not isinstance(literal, exp.Literal) or literal.is_string:
+        return None
+    if column.name.lower() not in alias_names:
+        return None
+    return condition
+
+def _inner_order(order, outer, inner_outputs, subquery_alias, rn_alias):
+    """The outer ORDER BY rewritten to run in the inner SELECT; None when a reference cannot be mapped.
+
+    Names of the outer projection stay as they are, since the rewritten SELECT projects them under the same
+    alias. Any other column is a subquery output and becomes the inner expression behind it, because inside
+    the inner SELECT the bare name would resolve to a base table column, or to nothing.
+    """
+    outer_aliases = {p.alias.lower() for p in outer.expressions if isinstance(p, exp.Alias)}
+    for column in list(order.find_all(exp.Column)):
+        name, table = column.name.lower(), column.table.lower()
+        if name == rn_alias or table not in ("", subquery_alias):
+            return None
+        if not table and name in outer_aliases:
+            continue
+        if name not in inner_outputs:
+            return None
+        column.replace(inner_outputs[name].unalias().copy())
+    return order
+
+def row_number_to_qualify(tree, column_lookup=None):
+    changed = False
+    for outer in _selects(tree):
+        source = _arg(outer, "from")
+        if not source or not isinstance(source.this, exp.Subquery) or not isinstance(source.this.this, exp.Select):
+            continue
+        if any(outer.args.get(k) for k in ["joins", "group", "having", "distinct", "qualify"]) or not outer.args.get("where"):
+            continue
+
+        inner = source.this.this
+        # QUALIFY is evaluated before DISTINCT, so it would filter rows DISTINCT had not yet collapsed
+        if any(inner.args.get(k) for k in ["qualify", "limit", "offset", "fetch", "distinct"]) or _arg(inner, "with"):
+            continue
+
+        windows = {
+            p.alias.lower(): p for p in inner.expressions
+            if isinstance(p, exp.Alias) and isinstance(p.this, exp.Window) and isinstance(p.this.this, exp.RowNumber)
+        }
+        condition = _row_number_filter(outer.args["where"], windows)
+        if condition is None:
+            continue
+        rn_alias = condition.this.name.lower()
+        subquery_alias = source.this.alias_or_name.lower()
+
+        inner_outputs = {p.alias_or_name.lower(): p for p in inner.expressions}
+        projections = []
+        for p in outer.expressions:
+            if isinstance(p, exp.Star):
+                # SELECT * also returned the row number column; keep it so the result schema is unchanged
+                projections.extend(q.copy() for q in inner.expressions)
+                continue
+            column = p.unalias()
+            if not isinstance(column, exp.Column) or column.table.lower() not in ("", subquery_alias):
+                projections = None
+                break
+            name = column.name.lower()
+            if name == rn_alias or name not in inner_outputs:
+                projections = None
+                break
+            projection = inner_outputs[name].copy()
+            if isinstance(p, exp.Alias):
+                projection = exp.alias_(projection.unalias(), p.alias)
+            projections.append(projection)
+        if not projections:
+            continue
+
+        order = outer.args.get("order")
+        if order:
+            order = _inner_order(order.copy(), outer, inner_outputs, subquery_alias, rn_alias)
+            if order is None:
+                continue
+
+        rewritten = inner.copy()
+        rewritten.set("expressions", projections)
+        qualify_condition = condition.copy()
+        qualify_condition.set("this", windows[rn_alias].this.copy())
+        rewritten.set("qualify", exp.Qualify(this=qualify_condition))
+        if order:
+            rewritten.set("order", order)
+        for key in ["limit", "offset", "fetch"]:
+            if outer.args.get(key):
+                rewritten.set(key, outer.args[key].copy())
+        if _arg(outer, "with"):
+            rewritten.set(_key(rewritten, "with"), _arg(outer, "with").copy())
+
+        if outer is tree:
+            tree = rewritten
+        else:
+            outer.replace(rewritten)
+        changed = True
+    return tree, changed
+
+def _duplicate_free(select) -> bool:
+    if not isinstance(select, exp.Select):
+        return False
+    distinct = select.args.get("distinct")
+    if distinct and not distinct.args.get("on"):
+        return True
+    group = select.args.get("group")
+    projected = {p.unalias().sql() for p in select.expressions}
+    return bool(group) and all(g.sql() in projected for g in group.expressions)
+
+def _literal_value(literal):
+    # 1, 1.0 and 1e0 are the same number; a string and a number are never compared
+    if literal.is_string:
+        return ("string", literal.this)
+    try:
+        return ("number", Decimal(literal.this))
+    except InvalidOperation:
+        return None
+
+def _disjoint_branches(left, right) -> bool:
+    if len(left.expressions) != len(right.expressions):
+        return False
+    for l, r in zip(left.expressions, right.expressions):
+        l, r = l.unalias(), r.unalias()
+        if not isinstance(l, exp.Literal) or not isinstance(r, exp.Literal):
+            continue
+        l_value, r_value = _literal_value(l), _literal_value(r)
+        if l_value and r_value and l_value[0] == r_value[0] and l_value[1] != r_value[1]:
+            return True
+    return False
+
+def union_to_union_all(tree, column_lookup=None):
+    changed = False
+    for union in list(tree.find_all(exp.Union)):
+        if not union.args.get("distinct"):
+            continue
+        left, right = union.this, union.expression
+        # Branches tagged with different constants can never produce the same row,
+        # so UNION only pays for a global sort/dedup that has nothing to remove
+        if _duplicate_free(left) and _duplicate_free(right) and _disjoint_branches(left, right):
+            union.set("distinct", False)
+            changed = True
+    return tree, changed
+
+def _pushable_cte(select) -> bool:
+    if not isinstance(select, exp.Select):
+        return False
+    if any(select.args.get(k) for k in ["group", "having", "distinct", "qualify", "limit", "offset", "fetch", "joins"]):
+        return False
+    return not any(p.find(exp.Window, exp.AggFunc) for p in select.expressions)
+
+def push_filters_into_ctes(tree, column_lookup=None):
+    with_ = _arg(tree, "with")
+    where = tree.args.get("where") if isinstance(tree, exp.Select) else None
+    if not with_ or not where:
+        return tree, False
+
+    source = _arg(tree, "from")
+    if not source or not isinstance(source.this, exp.Table):
+        return tree, False
+    if any(j.side in ("RIGHT", "FULL") for j in tree.args.get("joins") or []):
+        return tree, False
+
+    changed = False
+    for cte in with_.expressions:
+        name = cte.alias.lower()
+        if source.this.name.lower() != name:
+            continue
+        references = [t for t in tree.find_all(exp.Table) if t.name.lower() == name]
+        if len(references) != 1 or not _pushable_cte(cte.this):
+            continue
+
+        reference_alias = source.this.alias_or_name.lower()
+        has_joins = bool(tree.args.get("joins"))
+        outputs = {p.alias_or_name.lower(): p.unalias() for p in cte.this.expressions if not isinstance(p, exp.Star)}
+        star = any(isinstance(p, exp.Star) for p in cte.this.expressions)
+
+        for predicate in where.this.flatten() if isinstance(where.this, exp.And) else [where.this]:
+            if predicate.find(exp.Subquery, exp.Select, exp.AggFunc, exp.Window):
+                continue
+            columns = list(predicate.find_all(exp.Column))
+            if not columns:
+                continue
+            if any(c.table.lower() != reference_alias and (c.table or has_joins) for c in columns):
+                continue
+            if any(c.name.lower() not in outputs and not star for c in columns):
+                continue
+
+            pushed = predicate.copy()
+            for column in list(pushed.find_all(exp.Column)):
+                target = outputs.get(column.name.lower())
+                replacement = target.copy() if target is not None else exp.column(column.name)
+                if column is pushed:
+                    pushed = replacement
+                else:
+                    column.replace(replacement)
+            # A copy of RANDOM() or CURRENT_TIMESTAMP in the CTE, from the predicate itself or from a CTE column
+            # it refers to, would draw a second, different value
+            if nondeterministic_functions(pushed):
+                continue
+
+            existing = cte.this.args.get("where")
+            if existing and any(pushed.sql() == p.sql() for p in existing.find_all(type(pushed))):
+                continue
+            cte.this.where(pushed, copy=False)
+            changed = True
+    return tree, changed
+
+def expand_select_star(tree, column_lookup=None):
+    with_ = _arg(tree, "with")
+    if not with_ or column_lookup is None:
+        return tree, False
+
+    changed = False
+    for cte in with_.expressions:
+        select = cte.this
+        if not isinstance(select, exp.Select) or len(select.expressions) != 1 or not isinstance(select.expressions[0], exp.Star):
+            continue
+        source = _arg(select, "from")
+        if not source or not isinstance(source.this, exp.Table) or select.args.get("joins"):
+            continue
+
+        name = cte.alias.lower()
+        needed = set()
+        for reference in [t for t in tree.find_all(exp.Table) if t.name.lower() == name]:
+            scope = reference.find_ancestor(exp.Select)
+            joins = scope.args.get("joins") or []
+            sources = [_arg(scope, "from").this] + [j.this for j in joins]
+            # USING and NATURAL joins match on columns that never appear as references
+            if any(j.args.get("using") or str(j.args.get("method") or "").upper() == "NATURAL" for j in joins):
+                needed = None
+                break
+            alias = reference.alias_or_name.lower()
+            projection_aliases = {p.alias.lower() for p in scope.expressions if isinstance(p, exp.Alias)}
+
+            # Columns used by nested subqueries or star projections cannot be attributed safely
+            own_with = _arg(scope, "with")
+            nested = [s for s in scope.find_all(exp.Select)
+                      if s is not scope and not (own_with and s.find_ancestor(exp.With) is own_with)]
+            if nested or any(
+                    isinstance(p, exp.Star) or (isinstance(p, exp.Column) and isinstance(p.this, exp.Star)) for p in scope.expressions):
+                needed = None
+                break
+
+            for column in _same_scope_columns(scope):
+                if column.table.lower() == alias:
+                    needed.add(column.name.lower())
+                elif not column.table:
+                    if len(sources) > 1:
+                        needed = None
+                        break
+                    if column.name.lower() not in projection_aliases:
+                        needed.add(column.name.lower())
+            if needed is None:
+                break
+        if not needed:
+            continue
+
+        table_columns = column_lookup(exp.table_name(source.this))
+        by_name = {c.lower(): c for c in table_columns}
+        if not by_name or not needed.issubset(by_name) or len(needed) == len(by_name):
+            continue
+
+        select.set("expressions", [exp.column(c) for c in table_columns if c.lower() in needed])
+        changed = True
+    return tree, changed
+
+RULES = [
+    ("Expand SELECT * to referenced columns", expand_select_star),
+    ("Convert ROW_NUMBER() subquery to QUALIFY", row_number_to_qualify),
+    ("Use UNION ALL for disjoint branches", union_to_union_all),
+    ("Push filters into CTEs", push_filters_into_ctes),
+    ("Remove redundant DISTINCT", remove_redundant_distinct),
+    ("Remove redundant ORDER BY", remove_redundant_order_by),
+]
+
+def apply_rules(sql: str, column_lookup=None) -> tuple:
+    try:
+        tree = sqlglot.parse_one(sql.strip().rstrip(";"), read="snowflake")
+    except sqlglot.errors.ParseError:
+        return sql, []
+
+    applied = []
+    for name, rule in RULES:
+        try:
+            candidate, changed = rule(tree.copy(), column_lookup)
+        except Exception as e:
+            print(f"Rule '{name}' skipped: {e}")
+            continue
+        if changed:
+            tree = candidate
+            applied.append(name)
+
+    if not applied:
+        return sql, []
+    return tree.sql(dialect="snowflake", pretty=True), applied
@@ -2,92 +2,90 @@ import streamlit as st
 import re
 import html
 from shared.snowflake_connector import connect_to_snowflake
-from llm.ollama_helpers import call_llm
 from shared.llm_client import compare_explain_plans
 from modules.api_config.config_manager import get_api_credentials
+from modules.query_optimizer import core
+from shared.api_client import api_enabled, call_api, ApiError
+from modules.query_optimizer.explain_utils import run_explain, explain_statement, is_plan_error, parse_plan_stats, cost_margin
+from shared.jobs import submit_job, get_job, cancel_job, FINISHED_STATES
+from shared.session_store import put_artifact, get_artifact, pop_artifact
+from modules.ledger.ledger import record_optimization
+from modules.query_optimizer.candidate_search import search_rewrites
+from modules.query_optimizer.template_cache import reuse_rewrite, remember_rewrite
+from modules.query_optimizer.benchmark import run_benchmark, MIN_RUNS_FOR_CI
+from modules.query_optimizer.rule_engine import apply_rules
+from modules.hotspots.hotspot_detector import format_hotspot_hint
+from modules.query_optimizer.operator_stats import get_operator_stats, detect_findings, summarize_findings
 
 # --- Helper Functions ---
 
-def get_explain_plan(query):
-    conn = connect_to_snowflake(st.session_state.get("_active_conn"))
-    cursor = conn.cursor()
-    try:
-        cursor.execute(f"EXPLAIN USING TEXT {query}")
-        result = cursor.fetchall()
-        return "\n".join([row[0] for row in result])
-    except Exception as e:
-        return f"Error: {e}"
-    finally:
-        cursor.close()
-        conn.close()
+def get_explain_plan(query, conn_details=None):
+    if api_enabled() and conn_details is None:
+        try:
+            return call_api("POST", "/explain", {"connection": st.session_state.get("active_connection_name"), "query": query})["plan"]
+        except ApiError as e:
+            return f"Error: {e}"
+    return run_explain(query, conn_details or st.session_state.get("_active_conn"))
 
-def get_table_columns(query: str):
-    conn = connect_to_snowflake(st.session_state.get("_active_conn"))
-    cursor = conn.cursor()
-    try:
-        match = re.search(r"from\s+([a-zA-Z0-9_\.]+)", query, re.IGNORECASE)
-        table_name = match.group(1) if match else None
-        if not table_name:
-            return []
-        conn_details = st.session_state.get("_active_conn")
-        desc_target = table_name if table_name.count(".") == 2 else f"{conn_details['database']}.{conn_details['schema']}.{table_name}"
-        cursor.execute(f"DESC TABLE {desc_target}")
-        return [row[0] for row in cursor.fetchall()]
-    except Exception as e:
-        print(f"Error during DESC TABLE: {e}")
-        return []
-    finally:
-        cursor.close()
-        conn.close()
-
-def clean_optimized_query(sql: str) -> str:
-    sql = sql.strip()
-    if "TOP" in sql.upper() or "LIMIT" in sql.upper():
-        sql = re.sub(r"\bTOP\s+\d+\b", "", sql, flags=re.IGNORECASE)
-        sql = re.sub(r"\bLIMIT\s+\d+\b", "", sql, flags=re.IGNORECASE)
-    return sql.replace(";;", ";").strip()
-
-def extract_sql_only(text: str) -> str:
-    text = re.sub(r"```(?:sql)?", "", text, flags=re.IGNORECASE).replace("```", "").strip()
-    match = re.search(r"(?is)\b(select|with)\b[\s\S]+", text)
-    return match.group(0).strip() if match else text
-
-def build_optimization_prompt(query: str, schema_hint: str = "") -> str:
-    return f"""
-You are an expert Snowflake SQL performance engineer.
-
-Your task is to optimize the following SQL query for performance using only **valid and executable Snowflake SQL syntax**. Ensure correctness, improve execution speed, and follow all Snowflake best practices.
-
-Output:
-- Must return only a complete, executable SQL query (including any WITH/CTE clauses if needed)
-- Must not include explanations, comments, markdown, or surrounding text
-
-Rules:
-1. ❌ DO NOT use `TOP N` — Snowflake does not support this syntax. Never include `TOP` in any part of the query.
-2. ❌ DO NOT use `LIMIT N` at the end or inside subqueries — instead use `ROW_NUMBER()`, `QUALIFY`, or `FILTERS` to reduce result size.
-3. ✅ Prefer using `QUALIFY ROW_NUMBER() OVER (...) <= N` to limit rows efficiently.
-4. ✅ Ensure deterministic ordering by including a unique key (e.g., `UNIQUE_SURROGATE_KEY`) in `ORDER BY` or `ROW_NUMBER()` functions.
-
-{schema_hint}
-Original SQL Query:
-{query.strip()}
-""".strip()
-
-def optimize_sql_with_ollama(query: str, _) -> str:
-    schema_hint = ""
-    if not query.strip().lower().startswith("with"):
-        columns = get_table_columns(query)
-        schema_hint = f"Available columns: {', '.join(columns)}\n" if columns else ""
+def describe_table(table_name: str, conn_details=None):
+    return core.describe_table(table_name, conn_details or st.session_state.get("_active_conn"))
 
+def get_table_columns(query: str):
+    return core.get_table_columns(query, st.session_state.get("_active_conn"))
+
+def get_schema_hint(query: str) -> str:
+    return core.get_schema_hint(query, st.session_state.get("_active_conn"))
+
+def get_workload_hint(query: str) -> str:
+    hint = ""
+    context = st.session_state.get("hotspot_context")
+    if context and context["query"].strip() == query.strip():
+        hint += context["hint"]
+    profile = get_artifact("operator_profile")
+    if profile and profile["query"].strip() == query.strip():
+        hint += summarize_findings(profile["findings"])
+    return hint
+
+def optimize_and_validate(query: str) -> dict:
+    # The rewrite comes back compiled: plans are real EXPLAIN output only when valid is True
+    provider = st.session_state.get("llm_provider", core.DEFAULT_PROVIDER)
+    model = st.session_state.get("llm_model", core.DEFAULT_MODEL)
+    if api_enabled():
+        try:
+            result = call_api("POST", "/optimize", {"connection": st.session_state.get("active_connection_name"), "query": query,
+                                                    "provider": provider, "model": model, "workload_hint": get_workload_hint(query),
+                                                    "explain": True})
+        except ApiError as e:
+            result = {"optimized_query": "", "raw": f"❌ {e}", "original_plan": f"Error: {e}", "optimized_plan": f"Error: {e}",
+                      "valid": False, "repairs": 0, "compile_errors": [], "template_reused": False}
+    else:
+        result = core.optimize_and_explain(query, st.session_state.get("_active_conn"), provider, model, get_workload_hint(query))
+
+    put_artifact("raw_llm_output", result["raw"])
+    print("\n🔍 Raw LLM Response:\n", result["raw"], "\n")
+    return result
+
+def search_optimizations(query: str, n_candidates: int, all_providers: bool = False, early_stop: bool = True) -> dict:
     provider = st.session_state.get("llm_provider", "together")
     model = st.session_state.get("llm_model", "meta-llama/llama-4-scout-17b-16e-instruct")
-    prompt = build_optimization_prompt(query, schema_hint)
-
-    raw = call_llm(prompt, model=model, provider=provider)
-    st.session_state["raw_llm_output"] = raw
-    print("\n🔍 Raw LLM Response:\n", raw, "\n")
-
-    return clean_optimized_query(extract_sql_only(raw))
+    providers = [(provider, model)]
+    if all_providers:
+        providers += [(name, creds["model"]) for name, creds in get_api_credentials().items()
+                      if name != provider and creds.get("api_key")]
+
+    if api_enabled():
+        try:
+            search = call_api("POST", "/search", {"connection": st.session_state.get("active_connection_name"), "query": query,
+                                                  "providers": [list(p) for p in providers], "n_candidates": n_candidates,
+                                                  "workload_hint": get_workload_hint(query), "early_stop": early_stop})
+        except ApiError as e:
+            search = {"original_plan": f"Error: {e}", "original_stats": {}, "best": None, "margin": None, "candidates": []}
+    else:
+        schema_hint, candidate_hint = core.get_column_hints(query, st.session_state.get("_active_conn"))
+        search = search_rewrites(query, st.session_state.get("_active_conn"), providers, n_candidates,
+                                 schema_hint, get_workload_hint(query), candidate_hint, early_stop)
+    put_artifact("raw_llm_output", search["best"]["raw"] if search["best"] else "\n\n".join(c["raw"] for c in search["candidates"]))
+    return search
 
 # --- UI Helper for Wide SQL Blocks ---
 
@@ -149,34 +147,147 @@ def render(connection):
 
     st.header("🧠 Query Optimizer")
 
+    queue = st.session_state.get("optimizer_queue", [])
+    if queue:
+        col_q, col_b = st.columns([4, 1])
+        labels = [f"{h['wasted_credits']:.2f} wasted credits · {h['sample_query'][:80]}" for h in queue]
+        picked = col_q.selectbox(f"Hotspot queue ({len(queue)})", range(len(queue)), format_func=lambda i: labels[i])
+        if col_b.button("Load"):
+            hotspot = queue.pop(picked)
+            st.session_state["user_query"] = hotspot["sample_query"]
+            st.session_state["hotspot_context"] = {"query": hotspot["sample_query"], "hint": format_hotspot_hint(hotspot)}
+            st.rerun()
+
+    hotspot_context = st.session_state.get("hotspot_context")
+    if hotspot_context and hotspot_context["query"].strip() == st.session_state.get("user_query", "").strip():
+        st.info("🔥 " + hotspot_context["hint"].replace("\n", "  \n"))
+
     user_query = st.text_area("SQL Query", height=200, value=st.session_state.get("user_query", ""))
     table_name = st.text_input("Target Table Name", value=st.session_state.get("table_name", "DEMO_SALES"))
 
+    col_n, col_p = st.columns(2)
+    n_candidates = col_n.number_input("Candidate rewrites", min_value=1, max_value=8, value=1,
+                                      help="Generate several rewrites in parallel and keep the one with the cheapest EXPLAIN plan.")
+    all_providers = col_p.checkbox("Spread candidates across all configured providers", disabled=n_candidates == 1)
+    early_stop = col_p.checkbox("Stop at the first rewrite that compiles and beats the original", value=True, disabled=n_candidates == 1,
+                                help="Rewrites that fail to compile are sent back to the model with Snowflake's error before they count as failed.")
+
     if st.button("Clear"):
-        for key in ["user_query", "table_name", "original_plan", "optimized_query", "optimized_plan", "comparison_summary", "raw_llm_output"]:
-            st.session_state.pop(key, None)
+        for key in ["user_query", "table_name", "original_plan", "optimized_query", "optimized_plan", "comparison_summary", "raw_llm_output", "candidate_search", "benchmark_report", "applied_rules", "hotspot_context", "operator_profile", "explain_job"]:
+            pop_artifact(key)
         st.success("Reset complete.")
         st.stop()
 
+    with st.expander("🔬 Runtime Profile (GET_QUERY_OPERATOR_STATS)"):
+        last_run = get_artifact("benchmark_report", {}).get("query_ids", {}).get("original", [""])[-1:]
+        query_id = st.text_input("Query ID of an executed run of this query", value=last_run[0] if last_run else "")
+        if st.button("Profile") and query_id:
+            try:
+                operators = get_operator_stats(query_id.strip(), connection)
+                put_artifact("operator_profile", {"query": user_query, "operators": operators, "findings": detect_findings(operators)})
+            except Exception as e:
+                st.error(f"❌ Could not load operator stats: {e}")
+
+        profile = get_artifact("operator_profile")
+        if profile:
+            for finding in profile["findings"][:5]:
+                st.warning(f"{finding['overall_pct']:.0%} of time · {finding['summary']}")
+            if not profile["findings"]:
+                st.success("No exploding joins, skew or remote spills detected.")
+            st.dataframe([{k: v for k, v in op.items() if k != "parents"} for op in profile["operators"]],
+                         use_container_width=True, hide_index=True)
+            st.caption("Findings are added to the optimization prompt for this query.")
+
+    with st.expander("⏳ Background EXPLAIN"):
+        st.caption("Compiles the plan of a very large query without blocking this page; the result is kept if you navigate away.")
+        if st.button("Queue EXPLAIN") and user_query.strip():
+            st.session_state["explain_job"] = submit_job(connection, [explain_statement(user_query)], "explain", "EXPLAIN (optimizer)")
+        explain_job = get_job(st.session_state["explain_job"]) if st.session_state.get("explain_job") else None
+        if explain_job:
+            if explain_job["status"] not in FINISHED_STATES:
+                st.info(f"EXPLAIN {explain_job['status']} · query ID {explain_job['query_ids'][0] or 'pending'}")
+                col_r, col_c = st.columns(2)
+                col_r.button("🔄 Refresh", key="explain_job_refresh")
+                col_c.button("Cancel", key="explain_job_cancel", on_click=cancel_job, args=(explain_job["job_id"],))
+            elif explain_job["status"] == "succeeded":
+                st.code("\n".join(row[0] for row in explain_job["result"][0]["rows"]))
+            else:
+                st.warning(f"EXPLAIN {explain_job['status']}: {explain_job['error'] or ''}")
+
     if st.button("Analyze and Optimize"):
         st.session_state["user_query"] = user_query
         st.session_state["table_name"] = table_name
 
-        if re.match(r"^(select|with)\s", user_query.strip().lower()):
-            original_plan = get_explain_plan(user_query)
-            st.session_state["original_plan"] = original_plan
-
-            optimized_query = optimize_sql_with_ollama(user_query, table_name)
-            st.session_state["optimized_query"] = optimized_query
+        is_query = re.match(r"^(select|with)\s", user_query.strip().lower())
+        if is_query:
+            for key in ["candidate_search", "optimized_plan", "comparison_summary"]:
+                pop_artifact(key)
+            # Deterministic rules run in milliseconds; the LLM is only consulted when none apply
+            rule_query, applied_rules = apply_rules(user_query, column_lookup=describe_table)
+            st.session_state["applied_rules"] = applied_rules
+
+        # Literal variants of an earlier verified rewrite skip the candidate search; the single path checks in core
+        reused = reuse_rewrite(user_query, connection) if is_query and n_candidates > 1 and not applied_rules else None
+
+        if is_query and n_candidates > 1 and not applied_rules and not reused:
+            search = search_optimizations(user_query, n_candidates, all_providers, early_stop)
+            put_artifact("original_plan", search["original_plan"])
+            put_artifact("candidate_search", search)
+
+            if is_plan_error(search["original_plan"]):
+                st.warning(f"Could not EXPLAIN the original query: {search['original_plan']}")
+            elif search["best"]:
+                st.session_state["optimized_query"] = search["best"]["query"]
+                put_artifact("optimized_plan", search["best"]["plan"])
+                put_artifact("comparison_summary", compare_explain_plans(search["original_plan"], search["best"]["plan"]))
+                # The service records the ledger entry and the template itself, as it does for a single rewrite
+                if not api_enabled():
+                    record_optimization(connection, user_query, search["best"]["query"], search["original_plan"], search["best"]["plan"],
+                                        f"llm:{search['best']['strategy']}", search["best"]["provider"], search["best"].get("model", ""))
+                    remember_rewrite(connection, user_query, search["best"]["query"], search["original_plan"], search["best"]["plan"],
+                                     f"llm:{search['best']['strategy']}", search["best"]["provider"], search["best"].get("model", ""))
+            else:
+                st.warning("None of the candidate rewrites compiled, even after repair rounds.")
 
-            if optimized_query.lower().startswith(("select", "with")):
+        elif is_query:
+            if applied_rules:
+                original_plan, optimized_query = get_explain_plan(user_query), rule_query
                 optimized_plan = get_explain_plan(optimized_query)
-                st.session_state["optimized_plan"] = optimized_plan
+                result = {"valid": not is_plan_error(optimized_plan), "repairs": 0}
+                put_artifact("raw_llm_output", "Rule-based rewrite, no LLM call: " + ", ".join(applied_rules))
+            else:
+                result = reused or optimize_and_validate(user_query)
+                if result is reused:
+                    put_artifact("raw_llm_output", reused["raw"])
+                original_plan, optimized_query, optimized_plan = result["original_plan"], result["optimized_query"], result["optimized_plan"]
+            put_artifact("original_plan", original_plan)
+            st.session_state["optimized_query"] = optimized_query
 
-                comparison_summary = compare_explain_plans(original_plan, optimized_plan)
-                st.session_state["comparison_summary"] = comparison_summary
+            if is_plan_error(original_plan):
+                st.warning(f"Could not EXPLAIN the original query: {original_plan}")
+            elif not result["valid"]:
+                st.warning(f"The rewrite did not compile after {result['repairs']} repair round(s): {optimized_plan}")
             else:
-                st.warning("Optimized output is not a valid SELECT/WITH query.")
+                if result.get("template_reused"):
+                    st.info("♻️ " + result["raw"])
+                elif result["repairs"]:
+                    st.info(f"🔧 The first rewrite failed to compile; the model fixed it in {result['repairs']} repair round(s).")
+                put_artifact("optimized_plan", optimized_plan)
+
+                if result.get("template_reused"):
+                    margin = cost_margin(parse_plan_stats(original_plan), parse_plan_stats(optimized_plan))
+                    comparison_summary = f"Plan cost of the reused rewrite: {margin:.1%} {'cheaper' if margin >= 0 else 'costlier'} than the original."
+                else:
+                    comparison_summary = compare_explain_plans(original_plan, optimized_plan)
+                put_artifact("comparison_summary", comparison_summary)
+                if applied_rules:
+                    record_optimization(connection, user_query, optimized_query, original_plan, optimized_plan,
+                                        "rule:" + ",".join(applied_rules))
+                elif not api_enabled() and not result.get("template_reused"):
+                    # The service records its own ledger entry when it explains a rewrite, and a reused template
+                    # shares its shape with the entry that produced it, whose realized savings already count
+                    record_optimization(connection, user_query, optimized_query, original_plan, optimized_plan, "llm",
+                                        st.session_state.get("llm_provider", core.DEFAULT_PROVIDER), st.session_state.get("llm_model", core.DEFAULT_MODEL))
         else:
             st.error("Only SELECT or WITH queries are supported.")
 
@@ -185,15 +296,75 @@ def render(connection):
 
         with col1:
             render_sql_block("Original Query", st.session_state["user_query"])
-            render_sql_block("EXPLAIN Plan (Original)", st.session_state["original_plan"])
+            render_sql_block("EXPLAIN Plan (Original)", get_artifact("original_plan"))
 
         with col2:
             render_sql_block("Optimized Query", st.session_state["optimized_query"])
-            render_sql_block("EXPLAIN Plan (Optimized)", st.session_state["optimized_plan"])
+            render_sql_block("EXPLAIN Plan (Optimized)", get_artifact("optimized_plan"))
+
+    if st.session_state.get("applied_rules"):
+        st.info("⚡ Rewritten by deterministic rules (no LLM call): " + "; ".join(st.session_state["applied_rules"]))
+
+    if "candidate_search" in st.session_state:
+        search = get_artifact("candidate_search")
+        st.markdown("### 🧪 Candidate Rewrites")
+        if search["margin"] is not None:
+            st.metric("Best candidate vs original (plan cost)", f"{search['margin']:.1%} cheaper" if search["margin"] >= 0 else f"{-search['margin']:.1%} costlier")
+        st.dataframe([{
+            "Strategy": c["strategy"],
+            "Temperature": c["temperature"],
+            "Provider": c["provider"],
+            "Valid": c["valid"],
+            "Repairs": c["repairs"],
+            "Status": "stopped early" if c["stopped"] else ("compiled" if c["valid"] else c["plan"][:120]),
+            "Bytes Assigned": c["stats"]["bytes_assigned"] if c["valid"] else None,
+            "Partitions Assigned": c["stats"]["partitions_assigned"] if c["valid"] else None,
+            "Joins": c["stats"]["join_count"] if c["valid"] else None,
+            "Margin": f"{c['margin']:.1%}" if c["valid"] else "",
+        } for c in search["candidates"]], use_container_width=True)
 
     if "comparison_summary" in st.session_state:
         st.markdown("### 🤖 LLM-Based Summary")
-        st.markdown(st.session_state["comparison_summary"])
+        st.markdown(get_artifact("comparison_summary"))
+
+    if "optimized_plan" in st.session_state:
+        st.markdown("### ⏱️ Benchmark")
+        st.caption("Executes both queries on your warehouse with the result cache disabled. This consumes credits.")
+        runs = st.number_input("Runs per query", min_value=MIN_RUNS_FOR_CI, max_value=10, value=3)
+        if st.button("Run Benchmark"):
+            with st.spinner("Running original and optimized queries..."):
+                try:
+                    put_artifact("benchmark_report", run_benchmark(
+                        st.session_state["user_query"], st.session_state["optimized_query"], connection, runs))
+                except Exception as e:
+                    st.error(f"❌ Benchmark failed: {e}")
+
+    if "benchmark_report" in st.session_state:
+        report = get_artifact("benchmark_report")
+        col1, col2, col3 = st.columns(3)
+        if report["speedup"] is not None:
+            low, high = report["speedup_ci"]
+            interval = f"95% CI: {low:.2f}x – {high:.2f}x" if low is not None else "Too few runs for a confidence interval"
+            col1.metric("Measured Speedup", f"{report['speedup']:.2f}x", help=interval)
+        col2.metric("Median Elapsed (ms)", report["optimized"]["median_elapsed_ms"],
+                    delta=(report["optimized"]["median_elapsed_ms"] or 0) - (report["original"]["median_elapsed_ms"] or 0),
+                    delta_color="inverse")
+        col3.metric("Rows (original / optimized)", f"{report['row_count'][0]} / {report['row_count'][1]}")
+
+        st.dataframe([
+            {"Query": label.title(), **{k: report[label][k] for k in ["median_elapsed_ms", "bytes_scanned", "spill_local", "spill_remote"]}}
+            for label in ["original", "optimized"]
+        ], use_container_width=True)
+
+        if report["equivalent"] is None:
+            st.warning("⚠️ Results could not be compared: a query returns two columns with the same name. "
+                       "Check the results by hand before shipping this rewrite.")
+        elif not report["equivalent"]:
+            st.error("❌ Results differ between the original and optimized query. Do not ship this rewrite.")
+        elif report["safe_to_ship"]:
+            st.success("✅ Results are identical and the rewrite is measurably faster. Safe to ship.")
+        else:
+            st.warning("⚠️ Results are identical, but the speedup is not statistically significant.")
 
     if "raw_llm_output" in st.session_state and st.checkbox("Show Raw LLM Output"):
-        st.text_area("Raw LLM Output", value=st.session_state["raw_llm_output"], height=300, key="llm_raw")
+        st.text_area("Raw LLM Output", value=get_artifact("raw_llm_output"), height=300, key="llm_raw")
@@ -0,0 +1,131 @@
+import json
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from shared.local_store import get_local_db
+from shared.sql_analysis import parameterize_sql
+from modules.query_optimizer.explain_utils import run_explain, is_plan_error, parse_plan_stats, cost_margin
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def _init_db(db):
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS rewrite_templates (
+            account TEXT,
+            database_name TEXT,
+            schema_name TEXT,
+            template_hash TEXT,
+            rewrite_sql TEXT,
+            bindings TEXT,
+            rewrite_kind TEXT,
+            provider TEXT,
+            model TEXT,
+            created TEXT,
+            last_used TEXT,
+            hits INTEGER DEFAULT 0,
+            PRIMARY KEY (account, database_name, schema_name, template_hash)
+        )
+    """)
+
+def _scope(conn_details: dict) -> list:
+    # Unqualified table names resolve against the connection's database and schema
+    return [str(conn_details.get(k) or "").upper() for k in ["account", "database", "schema"]]
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime(TIME_FORMAT)
+
+def template_bindings(original_sql: str, rewrite_sql: str) -> list:
+    """Maps each literal of the rewrite to the one original literal with the same text.
+
+    None unless the mapping is one-to-one: every literal text occurs exactly once in the original and
+    once in the rewrite. A constant the rewrite adds (QUALIFY RANK() ... = 1) can share its text with an
+    original value, and one derived from a value (BETWEEN 1 AND 10 -> < 11) has no counterpart; re-binding
+    either would change the result, so such rewrites are not cached.
+    """
+    original, rewrite = parameterize_sql(original_sql), parameterize_sql(rewrite_sql)
+    if original is None or rewrite is None:
+        return None
+    original_texts = [text for _, _, text in original[1]]
+    rewrite_texts = [text for _, _, text in rewrite[1]]
+    if len(set(original_texts)) != len(original_texts) or sorted(rewrite_texts) != sorted(original_texts):
+        return None
+    return [[start, end, [original_texts.index(text)]] for start, end, text in rewrite[1]]
+
+def bind_template(rewrite_sql: str, bindings: list, literals: list) -> str:
+    """Splices a statement's literals into a stored rewrite, following the bindings from template_bindings."""
+    pieces, cursor = [], 0
+    for start, end, indexes in bindings:
+        pieces += [rewrite_sql[cursor:start], literals[indexes[0]]]
+        cursor = end
+    return "".join(pieces) + rewrite_sql[cursor:]
+
+def remember_rewrite(conn_details: dict, original_sql: str, rewrite_sql: str, original_plan: str, rewrite_plan: str,
+                     rewrite_kind: str, provider: str = "", model: str = "") -> bool:
+    """Stores a compiled rewrite that is no costlier than the original under the original's template."""
+    if is_plan_error(original_plan) or is_plan_error(rewrite_plan):
+        return False
+    if cost_margin(parse_plan_stats(original_plan), parse_plan_stats(rewrite_plan)) < 0:
+        return False
+    bindings = template_bindings(original_sql, rewrite_sql)
+    if bindings is None:
+        return False
+    now = _now()
+    db = get_local_db()
+    _init_db(db)
+    with db:
+        db.execute("""
+            INSERT INTO rewrite_templates (account, database_name, schema_name, template_hash, rewrite_sql, bindings,
+                                           rewrite_kind, provider, model, created, last_used, hits)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+            ON CONFLICT (account, database_name, schema_name, template_hash) DO UPDATE SET
+                rewrite_sql = excluded.rewrite_sql, bindings = excluded.bindings, rewrite_kind = excluded.rewrite_kind,
+                provider = excluded.provider, model = excluded.model, created = excluded.created, hits = 0
+        """, (*_scope(conn_details), parameterize_sql(original_sql)[0], rewrite_sql, json.dumps(bindings),
+              rewrite_kind, provider, model, now, now))
+    db.close()
+    return True
+
+def reuse_rewrite(query: str, conn_details: dict) -> dict:
+    """Binds this query's literals into the stored rewrite of its template and EXPLAINs both, without an LLM call.
+
+    Returns None when no template matches or the bound rewrite no longer compiles; the caller then optimizes as usual.
+    """
+    parsed = parameterize_sql(query)
+    if parsed is None:
+        return None
+    template_hash, literals = parsed
+    db = get_local_db()
+    _init_db(db)
+    row = db.execute("""
+        SELECT rewrite_sql, bindings, rewrite_kind FROM rewrite_templates
+        WHERE account = ? AND database_name = ? AND schema_name = ? AND template_hash = ?
+    """, (*_scope(conn_details), template_hash)).fetchone()
+    db.close()
+    if row is None:
+        return None
+    rewrite_sql, bindings, rewrite_kind = row
+    optimized_query = bind_template(rewrite_sql, json.loads(bindings), [text for _, _, text in literals])
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        original_future = pool.submit(run_explain, query, conn_details)
+        optimized_plan = run_explain(optimized_query, conn_details)
+        original_plan = original_future.result()
+    if is_plan_error(optimized_plan):
+        return None
+    db = get_local_db()
+    with db:
+        db.execute("""
+            UPDATE rewrite_templates SET hits = hits + 1, last_used = ?
+            WHERE account = ? AND database_name = ? AND schema_name = ? AND template_hash = ?
+        """, (_now(), *_scope(conn_details), template_hash))
+    db.close()
+    return {
+        "optimized_query": optimized_query,
+        "raw": f"Reused the verified {rewrite_kind} rewrite of an earlier literal variant of this query; no LLM call.",
+        "original_plan": original_plan,
+        "optimized_plan": optimized_plan,
+        "valid": True,
+        "repairs": 0,
+        "compile_errors": [],
+        "template_reused": True,
+        "rewrite_kind": rewrite_kind,
+    }
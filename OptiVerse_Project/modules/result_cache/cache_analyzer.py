@@ -0,0 +1,152 @@
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from datetime import timedelta
+from shared.snowflake_connector import connect_to_snowflake
+from shared.snowflake_costs import credits_per_hour_sql
+from shared.sql_analysis import parse_sql, nondeterministic_functions, referenced_tables
+
+MAX_REPEATED_TEXTS = 500
+# Reused results are kept for 24 hours after their last use
+RESULT_CACHE_TTL = timedelta(hours=24)
+# A reused result does not run on the warehouse and scans nothing
+CACHE_HIT_SQL = "(WAREHOUSE_SIZE IS NULL OR (BYTES_SCANNED = 0 AND EXECUTION_TIME < 100))"
+
+CAUSE_FIXES = {
+    "nondeterministic function": "Replace the function with a literal computed by the client (e.g. a timestamp truncated to the minute or hour) so repeated runs send identical text.",
+    "table changed": "The data changed between runs; cache the result in the dashboard, batch the loads, or read from a materialized view or dynamic table.",
+    "role differs": "Run the report under one shared role so every viewer can reuse the same result.",
+    "expired": "Runs are more than 24h apart; schedule a warm-up run or persist the result in a table.",
+    "other": "Check USE_CACHED_RESULT, session parameters and functions that block reuse (external functions, UDFs, result size).",
+}
+
+def load_repeated_queries(conn_details: dict, days: int = 7) -> tuple:
+    conn = connect_to_snowflake(conn_details)
+    cursor = conn.cursor()
+    try:
+        window = f"START_TIME >= DATEADD(day, -{days}, CURRENT_TIMESTAMP()) AND QUERY_TYPE = 'SELECT' AND EXECUTION_STATUS = 'SUCCESS'"
+        cursor.execute(f"""
+            SELECT QUERY_HASH, ANY_VALUE(QUERY_TEXT), ANY_VALUE(DATABASE_NAME), ANY_VALUE(SCHEMA_NAME)
+            FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
+            WHERE {window}
+            GROUP BY QUERY_HASH
+            HAVING COUNT(*) > 1 AND COUNT_IF(NOT {CACHE_HIT_SQL}) > 1
+            ORDER BY SUM(EXECUTION_TIME) DESC
+            LIMIT {MAX_REPEATED_TEXTS}
+        """)
+        texts = {row[0]: {"query_text": row[1], "database": row[2] or "", "schema": row[3] or ""} for row in cursor.fetchall()}
+        if not texts:
+            return texts, []
+
+        hashes = ", ".join(f"'{h}'" for h in texts)
+        cursor.execute(f"""
+            SELECT QUERY_HASH, START_TIME, ROLE_NAME, {CACHE_HIT_SQL},
+                   EXECUTION_TIME / 3600000 * {credits_per_hour_sql()}
+            FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
+            WHERE {window} AND QUERY_HASH IN ({hashes})
+            ORDER BY QUERY_HASH, START_TIME
+        """)
+        columns = ["query_hash", "start_time", "role", "cache_hit", "credits"]
+        return texts, [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+def load_table_modifications(conn_details: dict, tables: set, days: int = 7) -> dict:
+    # ACCESS_HISTORY needs Enterprise edition; callers treat a failure as "changes unknown"
+    if not tables:
+        return {}
+    conn = connect_to_snowflake(conn_details)
+    cursor = conn.cursor()
+    try:
+        names = ", ".join(f"'{t}'" for t in sorted(tables))
+        cursor.execute(f"""
+            SELECT UPPER(f.value:"objectName"::STRING), ah.QUERY_START_TIME
+            FROM SNOWFLAKE.ACCOUNT_USAGE.ACCESS_HISTORY ah, LATERAL FLATTEN(ah.OBJECTS_MODIFIED) f
+            WHERE ah.QUERY_START_TIME >= DATEADD(day, -{days}, CURRENT_TIMESTAMP())
+              AND UPPER(f.value:"objectName"::STRING) IN ({names})
+        """)
+        modifications = defaultdict(list)
+        for table, modified_at in cursor.fetchall():
+            modifications[table].append(modified_at)
+        return {table: sorted(times) for table, times in modifications.items()}
+    finally:
+        cursor.close()
+        conn.close()
+
+def _modified_between(modifications: dict, tables: set, start, end) -> bool:
+    for table in tables:
+        times = modifications.get(table, [])
+        i = bisect_right(times, start)
+        if i < len(times) and times[i] <= end:
+            return True
+    return False
+
+def attribute_misses(texts: dict, executions: list, modifications: dict = None) -> list:
+    by_hash = defaultdict(list)
+    for execution in executions:
+        by_hash[execution["query_hash"]].append(execution)
+
+    groups = []
+    for query_hash, runs in by_hash.items():
+        text = texts[query_hash]
+        tree = parse_sql(text["query_text"])
+        volatile = nondeterministic_functions(tree) if tree is not None else set()
+        tables = referenced_tables(text["query_text"], text["database"], text["schema"])
+
+        causes, lost = Counter(), defaultdict(float)
+        hits = 0
+        previous = None
+        for run in runs:
+            if run["cache_hit"]:
+                hits += 1
+            elif previous is not None:
+                # Checked in the order that makes reuse impossible regardless of the other conditions
+                if volatile:
+                    cause = "nondeterministic function"
+                elif run["start_time"] - previous["start_time"] > RESULT_CACHE_TTL:
+                    cause = "expired"
+                elif run["role"] != previous["role"]:
+                    cause = "role differs"
+                elif modifications is not None and _modified_between(modifications, tables, previous["start_time"], run["start_time"]):
+                    cause = "table changed"
+                else:
+                    cause = "other"
+                causes[cause] += 1
+                lost[cause] += float(run["credits"] or 0)
+            previous = run
+
+        if not causes:
+            continue
+        top_cause = max(lost, key=lost.get)
+        groups.append({
+            "query_hash": query_hash,
+            "query_text": text["query_text"],
+            "executions": len(runs),
+            "cache_hits": hits,
+            "misses": sum(causes.values()),
+            "credits_lost": round(sum(lost.values()), 4),
+            "top_cause": top_cause,
+            "causes": dict(causes),
+            "credits_by_cause": dict(lost),
+            "volatile_functions": ", ".join(sorted(volatile)),
+            "fix": CAUSE_FIXES[top_cause],
+        })
+    return sorted(groups, key=lambda g: g["credits_lost"], reverse=True)
+
+def analyze_result_cache(conn_details: dict, days: int = 7) -> dict:
+    texts, executions = load_repeated_queries(conn_details, days)
+    tables = set()
+    for text in texts.values():
+        tables |= referenced_tables(text["query_text"], text["database"], text["schema"])
+    try:
+        modifications = load_table_modifications(conn_details, tables, days)
+    except Exception:
+        modifications = None
+
+    groups = attribute_misses(texts, executions, modifications)
+    by_cause = defaultdict(lambda: {"misses": 0, "credits_lost": 0.0})
+    for group in groups:
+        for cause, count in group["causes"].items():
+            by_cause[cause]["misses"] += count
+            by_cause[cause]["credits_lost"] += group["credits_by_cause"][cause]
+    return {"groups": groups, "by_cause": dict(by_cause), "table_changes_checked": modifications is not None}
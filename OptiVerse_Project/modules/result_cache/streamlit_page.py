@@ -0,0 +1,42 @@
+import streamlit as st
+import pandas as pd
+from modules.result_cache.cache_analyzer import analyze_result_cache, CAUSE_FIXES
+from shared.session_store import put_artifact, get_artifact
+
+def render(conn_dict):
+    st.header("♻️ Result Cache Miss Analyzer")
+    st.caption("Repeated statements that ran on a warehouse instead of reusing a cached result, with the likely reason for each miss.")
+
+    days = st.slider("Look back (days)", min_value=1, max_value=14, value=7)
+    if st.button("🔍 Analyze Cache Misses"):
+        with st.spinner("Replaying repeated statements from QUERY_HISTORY..."):
+            try:
+                put_artifact("result_cache_report", analyze_result_cache(conn_dict, days))
+            except Exception as e:
+                st.error(f"❌ Analysis failed: {e}")
+                return
+
+    report = get_artifact("result_cache_report")
+    if report is None:
+        return
+    if not report["groups"]:
+        st.success("✅ No repeated statement missed the result cache.")
+        return
+    if not report["table_changes_checked"]:
+        st.warning("ACCESS_HISTORY is not available to this role, so data changes between runs are reported as 'other'.")
+
+    total = sum(c["credits_lost"] for c in report["by_cause"].values())
+    st.metric("Credits spent re-running repeated statements", f"{total:,.2f}")
+
+    st.markdown("### By Cause")
+    causes = pd.DataFrame([{"cause": cause, **stats, "fix": CAUSE_FIXES[cause]} for cause, stats in report["by_cause"].items()])
+    st.dataframe(causes.sort_values("credits_lost", ascending=False).round(3), use_container_width=True, hide_index=True)
+
+    st.markdown("### Top Statements")
+    for group in report["groups"][:20]:
+        with st.expander(f"{group['credits_lost']:.3f} credits · {group['misses']} misses / {group['executions']} runs · {group['top_cause']}"):
+            st.code(group["query_text"][:2000], language="sql")
+            st.write(", ".join(f"{cause}: {count}" for cause, count in group["causes"].items()))
+            if group["volatile_functions"]:
+                st.write(f"Nondeterministic functions: {group['volatile_functions']}")
+            st.info(group["fix"])
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta, timezone
+from shared.snowflake_connector import connect_to_snowflake
+from shared.local_store import get_local_db, get_watermark, set_watermark
+
+INITIAL_LOOKBACK_DAYS = 90
+# ACCOUNT_USAGE.ACCESS_HISTORY can lag up to three hours; only ingest settled rows
+SETTLE_MINUTES = 180
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def _init_db(db):
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS table_last_reads (
+            account TEXT,
+            table_name TEXT,
+            last_read TEXT,
+            PRIMARY KEY (account, table_name)
+        )
+    """)
+
+def _watermark_name(conn_details: dict) -> str:
+    return f"access_history:{conn_details['account']}"
+
+def _coverage_name(conn_details: dict) -> str:
+    return f"access_history_start:{conn_details['account']}"
+
+def sync_last_reads(conn_details: dict) -> int:
+    db = get_local_db()
+    _init_db(db)
+    now = datetime.now(timezone.utc)
+    default_start = (now - timedelta(days=INITIAL_LOOKBACK_DAYS)).strftime(TIME_FORMAT)
+    watermark = get_watermark(db, _watermark_name(conn_details), default_start)
+    cutoff = (now - timedelta(minutes=SETTLE_MINUTES)).strftime(TIME_FORMAT)
+
+    conn = connect_to_snowflake(conn_details)
+    cursor = conn.cursor()
+    try:
+        # Reduce the flattened base objects to one max read time per table before anything leaves Snowflake
+        cursor.execute(f"""
+            SELECT UPPER(f.value:"objectName"::STRING), TO_VARCHAR(MAX(ah.QUERY_START_TIME), 'YYYY-MM-DD HH24:MI:SS')
+            FROM SNOWFLAKE.ACCOUNT_USAGE.ACCESS_HISTORY ah, LATERAL FLATTEN(ah.BASE_OBJECTS_ACCESSED) f
+            WHERE ah.QUERY_START_TIME > '{watermark} +0000'::TIMESTAMP_TZ
+              AND ah.QUERY_START_TIME <= '{cutoff} +0000'::TIMESTAMP_TZ
+              AND f.value:"objectDomain"::STRING = 'Table'
+            GROUP BY 1
+        """)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+    with db:
+        db.executemany("""
+            INSERT INTO table_last_reads VALUES (?, ?, ?)
+            ON CONFLICT(account, table_name) DO UPDATE SET last_read = MAX(last_read, excluded.last_read)
+        """, [(conn_details["account"], table, last_read) for table, last_read in rows])
+        if get_watermark(db, _coverage_name(conn_details)) is None:
+            set_watermark(db, _coverage_name(conn_details), watermark)
+        set_watermark(db, _watermark_name(conn_details), cutoff)
+    db.close()
+    return len(rows)
+
+def get_last_reads(conn_details: dict) -> tuple:
+    db = get_local_db()
+    _init_db(db)
+    rows = db.execute("SELECT table_name, last_read FROM table_last_reads WHERE account = ?", (conn_details["account"],)).fetchall()
+    coverage_start = get_watermark(db, _coverage_name(conn_details))
+    synced_until = get_watermark(db, _watermark_name(conn_details))
+    db.close()
+    return dict(rows), coverage_start, synced_until
+
+def load_table_storage(conn_details: dict) -> list:
+    conn = connect_to_snowflake(conn_details)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT TABLE_CATALOG, TABLE_SCHEMA, TABLE_NAME, TO_VARCHAR(TABLE_CREATED, 'YYYY-MM-DD HH24:MI:SS'),
+                   ACTIVE_BYTES, TIME_TRAVEL_BYTES, FAILSAFE_BYTES, RETAINED_FOR_CLONE_BYTES
+            FROM SNOWFLAKE.ACCOUNT_USAGE.TABLE_STORAGE_METRICS
+            WHERE TABLE_CATALOG = '{conn_details['database'].upper()}'
+              AND NOT DELETED AND TABLE_DROPPED IS NULL
+        """)
+        columns = ["database", "schema", "table", "created", "active_bytes", "time_travel_bytes", "failsafe_bytes", "clone_bytes"]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+def find_unread_tables(conn_details: dict, unread_days: int) -> list:
+    last_reads, coverage_start, _ = get_last_reads(conn_details)
+    if coverage_start is None:
+        return []
+    now = datetime.now(timezone.utc)
+    threshold = (now - timedelta(days=unread_days)).strftime(TIME_FORMAT)
+    # A table missing from the index has not been read since the index began; that only counts once it covers N days
+    if coverage_start > threshold:
+        return []
+
+    stale = []
+    for table in load_table_storage(conn_details):
+        name = f"{table['database']}.{table['schema']}.{table['table']}".upper()
+        last_read = last_reads.get(name)
+        if (last_read or coverage_start) > threshold or (table["created"] or "") > threshold:
+            continue
+        since = datetime.strptime(last_read or coverage_start, TIME_FORMAT).replace(tzinfo=timezone.utc)
+        total_bytes = sum(int(table[k] or 0) for k in ["active_bytes", "time_travel_bytes", "failsafe_bytes", "clone_bytes"])
+        stale.append({
+            "table": name,
+            "last_read": last_read,
+            "unread_days": (now - since).days,
+            "never_read": last_read is None,
+            "created": table["created"],
+            "storage_bytes": total_bytes,
+            "active_bytes": int(table["active_bytes"] or 0),
+        })
+    return sorted(stale, key=lambda t: (t["storage_bytes"], t["unread_days"]), reverse=True)
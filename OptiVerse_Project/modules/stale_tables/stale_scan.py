@@ -0,0 +1,79 @@
+import re
+from datetime import datetime, timedelta, timezone
+from shared.connection_pool import pooled_connection
+from shared.metadata import show_tables_sql, show_table_entries, has_columns, as_utc
+
+DEFAULT_KEYWORDS = ["temp", "test", "staging", "tmp"]
+# Keywords are spliced into an ILIKE pattern, and into job statements that take no bind parameters
+KEYWORD_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+STALE_COLUMNS = ["Schema", "Table", "Last Altered", "Created", "Size (Bytes)", "Last Altered By"]
+# What SHOW TABLES would need to answer the scan on its own
+SHOW_REQUIRED_COLUMNS = {"last_altered", "last_ddl_by"}
+# SHOW TABLES returns at most this many rows, so output of this size may be missing tables
+SHOW_ROW_LIMIT = 10000
+
+def valid_keyword(keyword) -> bool:
+    return isinstance(keyword, str) and KEYWORD_PATTERN.fullmatch(keyword) is not None
+
+def stale_scan_sql(keywords: list) -> str:
+    invalid = [kw for kw in keywords if not valid_keyword(kw)]
+    if invalid:
+        raise ValueError(f"Keywords may only contain letters, digits and underscores: {invalid}")
+    keyword_conditions = " OR ".join([f"LOWER(t.table_name) ILIKE '%{kw.lower()}%'" for kw in keywords])
+    return f"""
+        SELECT t.table_schema, t.table_name, t.last_altered, t.created, t.bytes AS size_bytes,
+               t.LAST_DDL_BY
+        FROM INFORMATION_SCHEMA.TABLES t
+        WHERE t.TABLE_TYPE = 'BASE TABLE'
+        AND ({keyword_conditions})
+        ORDER BY t.bytes DESC NULLS LAST
+    """
+
+def filter_stale(rows: list, inactivity_days: int) -> list:
+    threshold_date = datetime.now(timezone.utc) - timedelta(days=inactivity_days)
+    stale_tables = []
+    for schema, table, last_altered, created, size_bytes, last_altered_by in rows:
+        if last_altered is None or as_utc(last_altered) < threshold_date:
+            stale_tables.append((schema, table, last_altered, created, size_bytes, last_altered_by))
+    return stale_tables
+
+def stale_from_show(columns: list, rows: list, keywords: list, inactivity_days: int) -> list:
+    """Runs the stale scan on SHOW TABLES output, without a warehouse.
+
+    Returns None when INFORMATION_SCHEMA is still needed: SHOW TABLES has no LAST_ALTERED, so it can only
+    rule tables out (no keyword match, or created inside the window) and any table left needs the full scan.
+    Output that reaches SHOW_ROW_LIMIT may be truncated and always needs it too.
+    """
+    if len(rows) >= SHOW_ROW_LIMIT:
+        return None
+    entries = [e for e in show_table_entries(columns, rows) if any(kw.lower() in e["table_name"].lower() for kw in keywords)]
+    entries.sort(key=lambda e: e["bytes"] if e["bytes"] is not None else -1, reverse=True)
+    if has_columns(columns, SHOW_REQUIRED_COLUMNS):
+        return filter_stale([(e["table_schema"], e["table_name"], e["last_altered"], e["created"], e["bytes"], e["last_ddl_by"])
+                             for e in entries], inactivity_days)
+    # A table cannot have been altered before it was created
+    threshold_date = datetime.now(timezone.utc) - timedelta(days=inactivity_days)
+    if any(e["created"] is None or as_utc(e["created"]) < threshold_date for e in entries):
+        return None
+    return []
+
+def drop_statements(database: str, tables: list) -> list:
+    return [f"DROP TABLE IF EXISTS {database}.{schema}.{table}" for schema, table in tables]
+
+def run_stale_scan(conn_details: dict, keywords: list = None, inactivity_days: int = 30) -> list:
+    keywords = keywords or DEFAULT_KEYWORDS
+    with pooled_connection(conn_details) as conn:
+        cursor = conn.cursor()
+        try:
+            try:
+                cursor.execute(show_tables_sql(conn_details["database"]))
+                stale_tables = stale_from_show([c[0] for c in cursor.description], cursor.fetchall(), keywords, inactivity_days)
+            except Exception:
+                # A failed SHOW falls back to the INFORMATION_SCHEMA scan, as the page does for a failed SHOW job
+                stale_tables = None
+            if stale_tables is None:
+                cursor.execute(stale_scan_sql(keywords))
+                stale_tables = filter_stale(cursor.fetchall(), inactivity_days)
+        finally:
+            cursor.close()
+    return [dict(zip(STALE_COLUMNS, row)) for row in stale_tables]
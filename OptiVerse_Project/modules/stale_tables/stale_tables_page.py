@@ -1,10 +1,90 @@
 import streamlit as st
-from datetime import datetime, timedelta, timezone
-from shared.snowflake_connector import connect_to_snowflake
 import pytz
 import pandas as pd
 import io
 from shared.llm_client import call_llm  # Add LLM support
+from modules.stale_tables.access_index import sync_last_reads, get_last_reads, find_unread_tables
+from modules.stale_tables.stale_scan import stale_scan_sql, stale_from_show, filter_stale, drop_statements, DEFAULT_KEYWORDS, STALE_COLUMNS
+from shared.metadata import show_tables_sql
+from shared.jobs import submit_job, get_job, cancel_job, FINISHED_STATES
+
+
+def render_drop_job():
+    job_id = st.session_state.get("stale_drop_job")
+    job = get_job(job_id) if job_id else None
+    if not job:
+        return
+    if job["status"] in FINISHED_STATES:
+        icon = "✅" if job["status"] == "succeeded" else "❌"
+        st.write(f"{icon} {job['label']}: {job['status']} ({job['done']}/{job['total']} dropped) {job['error'] or ''}")
+        return
+    st.progress(job["done"] / max(job["total"], 1), text=f"{job['label']}: {job['done']}/{job['total']}")
+    col1, col2 = st.columns(2)
+    col1.button("🔄 Refresh", key="stale_drop_refresh")
+    col2.button("Cancel drops", on_click=cancel_job, args=(job["job_id"],))
+
+
+def render_scan_job(job_id: str) -> dict:
+    # None while the job is still running; the progress and cancel controls are shown instead
+    job = get_job(job_id)
+    if job is None or job["status"] not in FINISHED_STATES:
+        st.info("⏳ Scanning tables in the background; you can switch pages and come back.")
+        col1, col2 = st.columns(2)
+        col1.button("🔄 Refresh", key=f"stale_scan_refresh_{job_id}")
+        if job:
+            col2.button("Cancel scan", key=f"stale_scan_cancel_{job_id}", on_click=cancel_job, args=(job["job_id"],))
+        return None
+    return job
+
+
+def render_scan_error(job: dict):
+    st.error(f"❌ Error loading tables: {job['error'] or job['status']}")
+    if st.button("Retry scan"):
+        st.session_state.pop("stale_scan", None)
+        st.rerun()
+
+
+def render_access_based(conn_dict, inactivity_days, confirm_delete):
+    _, coverage_start, synced_until = get_last_reads(conn_dict)
+    st.caption(f"Last-read index covers {coverage_start or '—'} to {synced_until or '—'} (UTC).")
+
+    if st.button("🔄 Sync Access History"):
+        with st.spinner("Reducing new ACCESS_HISTORY rows to per-table last reads..."):
+            try:
+                count = sync_last_reads(conn_dict)
+                st.success(f"✅ Updated last-read times for {count} tables.")
+            except Exception as e:
+                st.error(f"❌ Sync failed: {e}")
+                return
+
+    try:
+        stale_tables = find_unread_tables(conn_dict, inactivity_days)
+    except Exception as e:
+        st.error(f"❌ Error loading table storage: {e}")
+        return
+
+    _, coverage_start, _ = get_last_reads(conn_dict)
+    if coverage_start is None:
+        st.info("Sync access history to build the last-read index.")
+        return
+    if not stale_tables:
+        st.success(f"🎉 Every table was read in the last {inactivity_days} days (or the index does not cover that long yet).")
+        return
+
+    df = pd.DataFrame(stale_tables)
+    df["storage_gb"] = (df["storage_bytes"] / 1e9).round(3)
+    st.warning(f"⚠️ {len(df)} tables unread for {inactivity_days}+ days, holding {df['storage_gb'].sum():,.2f} GB")
+    st.dataframe(df[["table", "unread_days", "last_read", "never_read", "created", "storage_gb"]], use_container_width=True, hide_index=True)
+
+    if confirm_delete:
+        to_delete = st.multiselect("Tables to drop", df["table"].tolist())
+        if to_delete and st.button("💣 Drop Selected Tables"):
+            st.session_state["stale_drop_job"] = submit_job(conn_dict, [f"DROP TABLE IF EXISTS {table}" for table in to_delete],
+                                                            "drop_tables", f"Drop {len(to_delete)} unread tables")
+        render_drop_job()
+
+    csv = df.to_csv(index=False).encode('utf-8')
+    st.download_button("🗅️ Download Unread Tables as CSV", data=csv, file_name="unread_tables.csv", mime="text/csv")
 
 
 def render(conn_dict):
@@ -14,10 +94,16 @@ def render(conn_dict):
         st.error("❌ No active Snowflake connection. Please connect from the 'Connections' tab.")
         return
 
+    mode = st.radio("Detect staleness by", ["Last read (ACCESS_HISTORY)", "Last altered + name keywords"], horizontal=True)
+    if mode.startswith("Last read"):
+        inactivity_days = st.slider("Mark tables as stale if not read in the last N days", min_value=1, max_value=365, value=30)
+        confirm_delete = st.checkbox("Enable deletion of selected stale tables")
+        render_access_based(conn_dict, inactivity_days, confirm_delete)
+        return
+
     inactivity_days = st.slider("Mark tables as stale if not altered in the last N days", min_value=1, max_value=365, value=30)
 
-    default_keywords = ["temp", "test", "staging", "tmp"]
-    all_keywords = list(set(default_keywords))
+    all_keywords = list(set(DEFAULT_KEYWORDS))
 
     keyword_filter = st.multiselect(
         "Detect stale tables using these keywords",
@@ -27,34 +113,43 @@ def render(conn_dict):
 
     confirm_delete = st.checkbox("Enable deletion of selected stale tables")
 
-    threshold_date = datetime.now(timezone.utc) - timedelta(days=inactivity_days)
+    # SHOW TABLES runs without a warehouse; INFORMATION_SCHEMA is only queried when SHOW cannot decide
+    show_sql = show_tables_sql(conn_dict["database"])
+    scan = st.session_state.get("stale_scan")
+    if not scan or scan["sql"] != show_sql or scan["keywords"] != keyword_filter or scan["account"] != conn_dict["account"]:
+        try:
+            scan = {"sql": show_sql, "keywords": keyword_filter, "account": conn_dict["account"], "fallback_job_id": None,
+                    "job_id": submit_job(conn_dict, [show_sql], "stale_scan", "Stale table scan (SHOW TABLES)")}
+            st.session_state["stale_scan"] = scan
+        except Exception as e:
+            st.error(f"❌ Error loading tables: {e}")
+            return
+
+    job = render_scan_job(scan["job_id"])
+    if job is None:
+        return
+    # A failed SHOW (e.g. a role without USAGE on every schema) still gets the INFORMATION_SCHEMA scan
+    stale_tables = None
+    if job["status"] == "succeeded":
+        stale_tables = stale_from_show(job["result"][0]["columns"], job["result"][0]["rows"], keyword_filter, inactivity_days)
+    elif job["status"] != "failed":
+        render_scan_error(job)
+        return
+    if stale_tables is None:
+        if not scan["fallback_job_id"]:
+            scan["fallback_job_id"] = submit_job(conn_dict, [stale_scan_sql(keyword_filter)], "stale_scan",
+                                                 "Stale table scan (INFORMATION_SCHEMA)")
+        job = render_scan_job(scan["fallback_job_id"])
+        if job is None:
+            return
+        if job["status"] != "succeeded":
+            render_scan_error(job)
+            return
+        stale_tables = filter_stale(job["result"][0]["rows"], inactivity_days)
+    else:
+        st.caption("Answered from SHOW TABLES; no warehouse was resumed.")
 
     try:
-        conn = connect_to_snowflake(conn_dict)
-        cursor = conn.cursor()
-
-        # Build WHERE clause for keywords
-        keyword_conditions = " OR ".join(
-            [f"LOWER(t.table_name) ILIKE '%{kw.lower()}%'" for kw in keyword_filter]
-        )
-
-        # Final SQL query with keyword filtering, user, and size info
-        sql_query = f"""
-            SELECT t.table_schema, t.table_name, t.last_altered, t.created, t.bytes AS size_bytes,
-                   t.LAST_DDL_BY
-            FROM INFORMATION_SCHEMA.TABLES t
-            WHERE t.TABLE_TYPE = 'BASE TABLE'
-            AND ({keyword_conditions})
-            ORDER BY t.bytes DESC NULLS LAST
-        """
-        cursor.execute(sql_query)
-        tables = cursor.fetchall()
-
-        stale_tables = []
-        for schema, table, last_altered, created, size_bytes, last_altered_by in tables:
-            if last_altered is None or last_altered.replace(tzinfo=timezone.utc) < threshold_date:
-                stale_tables.append((schema, table, last_altered, created, size_bytes, last_altered_by))
-
         if not stale_tables:
             st.success("🎉 No stale tables found based on current criteria.")
         else:
@@ -73,14 +168,12 @@ def render(conn_dict):
 
             if confirm_delete and to_delete:
                 if st.button("💣 Drop Selected Tables"):
-                    for schema, table in to_delete:
-                        drop_query = f"DROP TABLE IF EXISTS {conn_dict['database']}.{schema}.{table}"
-                        cursor.execute(drop_query)
-                        st.success(f"✅ Dropped table: {schema}.{table}")
+                    st.session_state["stale_drop_job"] = submit_job(conn_dict, drop_statements(conn_dict["database"], to_delete),
+                                                                    "drop_tables", f"Drop {len(to_delete)} stale tables")
+            render_drop_job()
 
             # Add download as CSV feature
-            df = pd.DataFrame(stale_tables, columns=[
-                "Schema", "Table", "Last Altered", "Created", "Size (Bytes)", "Last Altered By"])
+            df = pd.DataFrame(stale_tables, columns=STALE_COLUMNS)
             csv = df.to_csv(index=False).encode('utf-8')
             st.download_button("🗅️ Download Stale Tables as CSV", data=csv, file_name="stale_tables.csv", mime="text/csv")
 
@@ -105,8 +198,5 @@ def render(conn_dict):
                 st.markdown("### 🔍 LLM Insights")
                 st.info(insights)
 
-        cursor.close()
-        conn.close()
-
     except Exception as e:
         st.error(f"❌ Error loading tables: {e}")
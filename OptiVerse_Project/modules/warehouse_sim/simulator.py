@@ -0,0 +1,183 @@
+import heapq
+import itertools
+from collections import deque
+from shared.snowflake_connector import connect_to_snowflake
+from shared.snowflake_costs import credits_per_hour, MIN_BILLED_SECONDS
+
+MAX_CONCURRENCY_LEVEL = 8
+# Share of a query's execution that speeds up with more compute (Amdahl's law)
+PARALLEL_FRACTION = 0.9
+# Multi-cluster shutdown: standard waits 2-3 one-minute checks, economy 5-6
+SHUTDOWN_IDLE_SECONDS = {"STANDARD": 150, "ECONOMY": 330}
+# Economy only adds a cluster when queued work would keep it busy for 6 minutes
+ECONOMY_MIN_QUEUED_SECONDS = 360
+
+ARRIVAL, FINISH, IDLE_CHECK, SUSPEND_CHECK = range(4)
+
+def load_query_history(conn_details: dict, warehouse: str, start: str, end: str) -> list:
+    conn = connect_to_snowflake(conn_details)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT DATE_PART(EPOCH_MILLISECOND, START_TIME) / 1000, EXECUTION_TIME / 1000,
+                   WAREHOUSE_SIZE, QUERY_LOAD_PERCENT, QUEUED_OVERLOAD_TIME / 1000, TOTAL_ELAPSED_TIME / 1000
+            FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
+            WHERE WAREHOUSE_NAME = '{warehouse}'
+              AND START_TIME >= '{start}' AND START_TIME < '{end}'
+              AND EXECUTION_TIME > 0 AND WAREHOUSE_SIZE IS NOT NULL
+            ORDER BY START_TIME
+        """)
+        return [
+            {
+                "arrival": float(arrival),
+                "execution_s": float(execution_s),
+                "size": size,
+                "slots": min(MAX_CONCURRENCY_LEVEL, max(1, round((load_percent or 100) / 100 * MAX_CONCURRENCY_LEVEL))),
+                "observed_queue_s": float(queued_s or 0),
+                "observed_elapsed_s": float(elapsed_s or 0),
+            }
+            for arrival, execution_s, size, load_percent, queued_s, elapsed_s in cursor.fetchall()
+        ]
+    finally:
+        cursor.close()
+        conn.close()
+
+def scaled_execution(execution_s: float, from_size: str, to_size: str) -> float:
+    ratio = credits_per_hour(from_size) / credits_per_hour(to_size)
+    return execution_s * ((1 - PARALLEL_FRACTION) + PARALLEL_FRACTION * ratio)
+
+def _percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(pct * len(ordered)), len(ordered) - 1)]
+
+class Cluster:
+    def __init__(self, cluster_id: int, now: float):
+        self.id = cluster_id
+        self.started_at = now
+        self.free_slots = MAX_CONCURRENCY_LEVEL
+        self.running = 0
+        self.idle_since = now
+
+def simulate(queries: list, size: str, min_clusters: int = 1, max_clusters: int = 1,
+             policy: str = "STANDARD", auto_suspend_s: int = 600) -> dict:
+    if not queries:
+        return {"queries": 0, "credits": 0.0, "avg_queue_s": 0.0, "p95_queue_s": 0.0, "p95_latency_s": 0.0,
+                "queued_pct": 0.0, "peak_clusters": 0, "resumes": 0}
+
+    rate = credits_per_hour(size)
+    seq = itertools.count()
+    events = [(q["arrival"], next(seq), ARRIVAL, q) for q in queries]
+    heapq.heapify(events)
+
+    clusters = {}
+    cluster_ids = itertools.count()
+    queue = deque()
+    billed_seconds = 0.0
+    queue_times, latencies = [], []
+    peak_clusters, resumes = 0, 0
+    last_activity = 0.0
+
+    def start_cluster(now):
+        nonlocal peak_clusters
+        cluster = Cluster(next(cluster_ids), now)
+        clusters[cluster.id] = cluster
+        peak_clusters = max(peak_clusters, len(clusters))
+        return cluster
+
+    def stop_cluster(cluster, now):
+        nonlocal billed_seconds
+        billed_seconds += max(now - cluster.started_at, MIN_BILLED_SECONDS)
+        del clusters[cluster.id]
+
+    def queued_work():
+        return sum(q["run_s"] * q["slots"] for q in queue) / MAX_CONCURRENCY_LEVEL
+
+    def dispatch(now):
+        while True:
+            while queue:
+                query = queue[0]
+                cluster = next((c for c in clusters.values() if c.free_slots >= query["slots"]), None)
+                if cluster is None:
+                    break
+                queue.popleft()
+                cluster.free_slots -= query["slots"]
+                cluster.running += 1
+                queue_times.append(now - query["arrival"])
+                heapq.heappush(events, (now + query["run_s"], next(seq), FINISH, (cluster.id, query)))
+            if not queue or len(clusters) >= max_clusters:
+                return
+            if policy == "ECONOMY" and queued_work() < ECONOMY_MIN_QUEUED_SECONDS:
+                return
+            start_cluster(now)
+
+    while events:
+        now, _, kind, payload = heapq.heappop(events)
+
+        if kind == ARRIVAL:
+            query = dict(payload, run_s=scaled_execution(payload["execution_s"], payload["size"], size))
+            last_activity = now
+            if not clusters:
+                resumes += 1
+                for _ in range(min_clusters):
+                    start_cluster(now)
+            queue.append(query)
+            dispatch(now)
+
+        elif kind == FINISH:
+            cluster_id, query = payload
+            cluster = clusters[cluster_id]
+            cluster.free_slots += query["slots"]
+            cluster.running -= 1
+            latencies.append(now - query["arrival"])
+            last_activity = now
+            if cluster.running == 0:
+                cluster.idle_since = now
+                heapq.heappush(events, (now + SHUTDOWN_IDLE_SECONDS[policy], next(seq), IDLE_CHECK, (cluster.id, now)))
+            dispatch(now)
+            if auto_suspend_s and not queue and all(c.running == 0 for c in clusters.values()):
+                heapq.heappush(events, (now + auto_suspend_s, next(seq), SUSPEND_CHECK, now))
+
+        elif kind == IDLE_CHECK:
+            cluster_id, idle_since = payload
+            cluster = clusters.get(cluster_id)
+            if cluster and cluster.running == 0 and cluster.idle_since == idle_since and len(clusters) > min_clusters:
+                stop_cluster(cluster, now)
+
+        elif kind == SUSPEND_CHECK:
+            if payload == last_activity and all(c.running == 0 for c in clusters.values()):
+                for cluster in list(clusters.values()):
+                    stop_cluster(cluster, now)
+
+    # AUTO_SUSPEND = 0 never suspends; bill until the end of the replayed window
+    for cluster in list(clusters.values()):
+        stop_cluster(cluster, now)
+
+    return {
+        "queries": len(latencies),
+        "credits": billed_seconds / 3600 * rate,
+        "avg_queue_s": sum(queue_times) / len(queue_times),
+        "p95_queue_s": _percentile(queue_times, 0.95),
+        "p95_latency_s": _percentile(latencies, 0.95),
+        "queued_pct": sum(1 for t in queue_times if t > 0) / len(queue_times),
+        "peak_clusters": peak_clusters,
+        "resumes": resumes,
+    }
+
+def observed_summary(queries: list) -> dict:
+    queue_times = [q["observed_queue_s"] for q in queries]
+    return {
+        "queries": len(queries),
+        "avg_queue_s": sum(queue_times) / len(queue_times) if queue_times else 0.0,
+        "p95_queue_s": _percentile(queue_times, 0.95),
+        "p95_latency_s": _percentile([q["observed_elapsed_s"] for q in queries], 0.95),
+        "queued_pct": sum(1 for t in queue_times if t > 0) / len(queue_times) if queue_times else 0.0,
+    }
+
+def compare_scenarios(queries: list, scenarios: list) -> list:
+    results = []
+    for scenario in scenarios:
+        outcome = simulate(queries, **scenario)
+        results.append({**scenario, **outcome})
+    return sorted(results, key=lambda r: (r["p95_latency_s"], r["credits"]))
@@ -0,0 +1,86 @@
+import streamlit as st
+import pandas as pd
+from datetime import datetime, timedelta, timezone
+from shared.snowflake_connector import connect_to_snowflake
+from shared.snowflake_costs import WAREHOUSE_SIZES, normalize_size
+from modules.warehouse_sim.simulator import load_query_history, compare_scenarios, observed_summary
+from shared.session_store import put_artifact, get_artifact
+
+def get_warehouses(conn_dict):
+    conn = connect_to_snowflake(conn_dict)
+    cur = conn.cursor()
+    try:
+        cur.execute("SHOW WAREHOUSES")
+        columns = [c[0].lower() for c in cur.description]
+        return {row[columns.index("name")]: row[columns.index("size")] for row in cur.fetchall()}
+    finally:
+        cur.close()
+        conn.close()
+
+def render(conn_dict):
+    st.header("🏭 Warehouse Queueing Simulator")
+    st.caption("Replays a window of QUERY_HISTORY against alternative warehouse sizes and multi-cluster settings.")
+
+    try:
+        warehouses = get_warehouses(conn_dict)
+    except Exception as e:
+        st.error(f"❌ Could not list warehouses: {e}")
+        return
+    if not warehouses:
+        st.info("No warehouses visible to this role.")
+        return
+
+    warehouse = st.selectbox("Warehouse", list(warehouses.keys()))
+    yesterday = datetime.now(timezone.utc).date() - timedelta(days=1)
+    col1, col2 = st.columns(2)
+    start_date = col1.date_input("Replay from", value=yesterday)
+    end_date = col2.date_input("Replay until (exclusive)", value=yesterday + timedelta(days=1))
+
+    st.markdown("#### Scenarios")
+    col3, col4, col5, col6 = st.columns(4)
+    current_size = warehouses[warehouse]
+    default_sizes = [s for s in WAREHOUSE_SIZES if normalize_size(s) == normalize_size(current_size)]
+    sizes = col3.multiselect("Sizes", WAREHOUSE_SIZES, default=default_sizes or WAREHOUSE_SIZES[:3])
+    max_clusters = col4.multiselect("Max clusters", [1, 2, 3, 4, 6, 8, 10], default=[1, 2])
+    policies = col5.multiselect("Scaling policy", ["STANDARD", "ECONOMY"], default=["STANDARD"])
+    auto_suspend = col6.number_input("AUTO_SUSPEND (s)", min_value=0, value=600, step=60)
+    min_clusters = st.slider("Min clusters", min_value=1, max_value=10, value=1)
+
+    if st.button("Run Simulation"):
+        history_key = (warehouse, str(start_date), str(end_date))
+        if st.session_state.get("sim_history_key") != history_key:
+            with st.spinner("Loading query history..."):
+                try:
+                    put_artifact("sim_history", load_query_history(conn_dict, warehouse, str(start_date), str(end_date)))
+                    st.session_state["sim_history_key"] = history_key
+                except Exception as e:
+                    st.error(f"❌ Could not load query history: {e}")
+                    return
+
+        queries = get_artifact("sim_history")
+        scenarios = [
+            {"size": size, "min_clusters": min(min_clusters, mc), "max_clusters": mc, "policy": policy, "auto_suspend_s": auto_suspend}
+            for size in sizes for mc in max_clusters for policy in (policies if mc > 1 else ["STANDARD"])
+        ]
+        # Single-cluster scenarios ignore the policy, so collapse duplicates
+        scenarios = [dict(t) for t in dict.fromkeys(tuple(s.items()) for s in scenarios)]
+        with st.spinner(f"Simulating {len(queries):,} queries across {len(scenarios)} scenarios..."):
+            put_artifact("sim_results", compare_scenarios(queries, scenarios))
+            st.session_state["sim_observed"] = observed_summary(queries)
+
+    if "sim_results" in st.session_state:
+        observed = st.session_state["sim_observed"]
+        st.markdown("#### Observed")
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Queries", f"{observed['queries']:,}")
+        col2.metric("Avg Queue (s)", f"{observed['avg_queue_s']:.1f}")
+        col3.metric("p95 Latency (s)", f"{observed['p95_latency_s']:.1f}")
+
+        st.markdown("#### Simulated")
+        df = pd.DataFrame(get_artifact("sim_results"))
+        df = df.rename(columns={
+            "size": "Size", "min_clusters": "Min", "max_clusters": "Max", "policy": "Policy", "auto_suspend_s": "Auto Suspend (s)",
+            "credits": "Credits", "avg_queue_s": "Avg Queue (s)", "p95_queue_s": "p95 Queue (s)",
+            "p95_latency_s": "p95 Latency (s)", "queued_pct": "Queued %", "peak_clusters": "Peak Clusters", "resumes": "Resumes",
+            "queries": "Queries"})
+        st.dataframe(df.round(2), use_container_width=True, hide_index=True)
@@ -0,0 +1,24 @@
+import os
+import requests
+
+# When set, pages call the headless service instead of talking to Snowflake and the LLMs themselves
+API_URL = os.getenv("OPTIVERSE_API_URL", "").rstrip("/")
+API_TOKEN = os.getenv("OPTIVERSE_API_TOKEN", "")
+API_TIMEOUT_SECONDS = 300
+
+class ApiError(Exception):
+    pass
+
+def api_enabled() -> bool:
+    return bool(API_URL)
+
+def call_api(method: str, path: str, payload: dict = None, params: dict = None) -> dict:
+    headers = {"Authorization": f"Bearer {API_TOKEN}"} if API_TOKEN else {}
+    try:
+        response = requests.request(method, f"{API_URL}{path}", json=payload, params=params, headers=headers, timeout=API_TIMEOUT_SECONDS)
+    except requests.RequestException as e:
+        raise ApiError(f"OptiVerse service unreachable: {e}") from e
+    body = response.json() if response.content else {}
+    if response.status_code >= 400:
+        raise ApiError(body.get("error", f"HTTP {response.status_code}"))
+    return body
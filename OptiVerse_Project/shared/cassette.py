@@ -0,0 +1,369 @@
+import os
+import re
+import json
+import time
+import base64
+import hashlib
+import threading
+from decimal import Decimal
+from collections import deque
+from datetime import datetime, date, time as dt_time, timedelta
+
+# OPTIVERSE_CASSETTE_MODE is "record" or "replay"; anything else leaves Snowflake and the LLMs live
+CASSETTE_MODE_ENV = "OPTIVERSE_CASSETTE_MODE"
+CASSETTE_PATH_ENV = "OPTIVERSE_CASSETTE"
+# "original" sleeps for the recorded duration on replay, "zero" answers immediately
+CASSETTE_LATENCY_ENV = "OPTIVERSE_CASSETTE_LATENCY"
+DEFAULT_CASSETTE_PATH = "shared/session.cassette.jsonl"
+
+# Queries that embed "now" as a literal would never match on replay, so timestamps are masked in the key
+TIMESTAMP_LITERAL = re.compile(r"'\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?(?: [+-]\d{4})?'")
+
+class CassetteMiss(Exception):
+    pass
+
+# --- Typed JSON Encoding ---
+
+def _encode(value):
+    # Result sets carry Decimals, datetimes and binary; tag them so replay hands back the same types
+    if isinstance(value, Decimal):
+        return {"__type__": "decimal", "value": str(value)}
+    if isinstance(value, datetime):
+        return {"__type__": "datetime", "value": value.isoformat()}
+    if isinstance(value, date):
+        return {"__type__": "date", "value": value.isoformat()}
+    if isinstance(value, dt_time):
+        return {"__type__": "time", "value": value.isoformat()}
+    if isinstance(value, timedelta):
+        return {"__type__": "timedelta", "value": value.total_seconds()}
+    if isinstance(value, (bytes, bytearray)):
+        return {"__type__": "bytes", "value": base64.b64encode(value).decode()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _encode(v) for k, v in value.items()}
+    return value
+
+DECODERS = {
+    "decimal": Decimal,
+    "datetime": datetime.fromisoformat,
+    "date": date.fromisoformat,
+    "time": dt_time.fromisoformat,
+    "timedelta": lambda v: timedelta(seconds=v),
+    "bytes": base64.b64decode,
+}
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if isinstance(value, dict):
+        if "__type__" in value:
+            return DECODERS[value["__type__"]](value["value"])
+        return {k: _decode(v) for k, v in value.items()}
+    return value
+
+def snowflake_key(account: str, sql: str, params=None) -> str:
+    normalized = " ".join(TIMESTAMP_LITERAL.sub("'?'", sql).split())
+    # Bound statements differ only in their parameters; without them every binding would share one entry
+    if params is not None:
+        normalized += "\x00" + json.dumps(_encode(params), sort_keys=True, default=str)
+    return hashlib.sha256(f"{(account or '').upper()}\x00{normalized}".encode()).hexdigest()
+
+def _params(args: tuple, kwargs: dict):
+    # cursor.execute(sql, params) or cursor.execute(sql, params=...)
+    return args[0] if args else kwargs.get("params")
+
+def _error_response(e: Exception, status: str = None) -> dict:
+    error = {"error": getattr(e, "raw_msg", None) or str(e), "errno": getattr(e, "errno", None), "sqlstate": getattr(e, "sqlstate", None)}
+    return {**error, "status": status} if status else error
+
+# --- Cassette File ---
+
+class Cassette:
+    """Append-only JSON-lines log of Snowflake statements and LLM calls with their results and timings.
+
+    On replay, entries with the same key are served in recorded order, so a query that ran twice
+    returns both of its original results.
+    """
+
+    def __init__(self, path: str, mode: str, latency: str = "original"):
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.entries = {}
+        if mode == "replay":
+            with open(path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries.setdefault((entry["kind"], entry["key"]), deque()).append(entry)
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def record(self, kind: str, key: str, request: dict, response: dict, elapsed: float):
+        line = json.dumps({"kind": kind, "key": key, "request": _encode(request), "response": _encode(response),
+                           "elapsed": round(elapsed, 6), "recorded_at": time.time()})
+        with self.lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+    def take(self, kind: str, key: str, description: str) -> dict:
+        with self.lock:
+            queue = self.entries.get((kind, key))
+            if not queue:
+                raise CassetteMiss(f"No recorded {kind} interaction for: {description[:200]}")
+            entry = queue.popleft()
+        return {**entry, "response": _decode(entry["response"])}
+
+    def delay(self, elapsed: float) -> float:
+        return elapsed if self.latency == "original" else 0.0
+
+    def wait(self, entry: dict):
+        if self.delay(entry["elapsed"]) > 0:
+            time.sleep(entry["elapsed"])
+
+# --- Snowflake Recording ---
+
+def _fetch_all(cursor) -> dict:
+    description = [tuple(c[:7]) for c in cursor.description] if cursor.description else None
+    rows = [list(r) for r in cursor.fetchall()] if description else []
+    return {"description": description, "rows": rows, "rowcount": cursor.rowcount, "sfqid": cursor.sfqid}
+
+class _BufferedCursor:
+    # Serves fetches from a fully materialized result so recording and replay read the same rows
+    def __init__(self):
+        self.description = None
+        self.rowcount = None
+        self.sfqid = None
+        self._rows = deque()
+
+    def _load(self, response: dict):
+        self.description = [tuple(c) for c in response["description"]] if response["description"] else None
+        self.rowcount = response["rowcount"]
+        self.sfqid = response["sfqid"]
+        self._rows = deque(tuple(r) for r in response["rows"])
+
+    def fetchone(self):
+        return self._rows.popleft() if self._rows else None
+
+    def fetchmany(self, size: int = 1):
+        return [self._rows.popleft() for _ in range(min(size, len(self._rows)))]
+
+    def fetchall(self):
+        rows, self._rows = list(self._rows), deque()
+        return rows
+
+    def __iter__(self):
+        while self._rows:
+            yield self._rows.popleft()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class RecordingCursor(_BufferedCursor):
+    def __init__(self, connection, cursor):
+        super().__init__()
+        self.connection = connection
+        self.cursor = cursor
+
+    def execute(self, sql: str, *args, **kwargs):
+        params = _params(args, kwargs)
+        started = time.monotonic()
+        try:
+            self.cursor.execute(sql, *args, **kwargs)
+            response = _fetch_all(self.cursor)
+        except Exception as e:
+            self.connection.record(sql, params, _error_response(e), time.monotonic() - started)
+            raise
+        self.connection.record(sql, params, response, time.monotonic() - started)
+        self._load(response)
+        return self
+
+    def execute_async(self, sql: str, *args, **kwargs):
+        started = time.monotonic()
+        try:
+            self.cursor.execute_async(sql, *args, **kwargs)
+        except Exception as e:
+            self.connection.record(sql, _params(args, kwargs), _error_response(e), time.monotonic() - started)
+            raise
+        self.sfqid = self.cursor.sfqid
+        self.connection.submitted[self.sfqid] = (sql, _params(args, kwargs), time.monotonic())
+        return self
+
+    def get_results_from_sfqid(self, query_id: str):
+        try:
+            self.cursor.get_results_from_sfqid(query_id)
+            response = _fetch_all(self.cursor)
+        except Exception as e:
+            self.connection.record_async(query_id, _error_response(e, "FAILED_WITH_ERROR"))
+            raise
+        self.connection.record_async(query_id, response)
+        self._load(response)
+
+    def close(self):
+        self.cursor.close()
+
+class RecordingConnection:
+    def __init__(self, cassette: Cassette, conn, account: str):
+        self.cassette = cassette
+        self.conn = conn
+        self.account = account
+        self.submitted = {}
+
+    def record(self, sql: str, params, response: dict, elapsed: float):
+        request = {"account": self.account, "sql": sql, **({"params": params} if params is not None else {})}
+        self.cassette.record("snowflake", snowflake_key(self.account, sql, params), request, response, elapsed)
+
+    def record_async(self, query_id: str, response: dict):
+        # An async statement is recorded once its outcome is known: results fetched, or a terminal error status
+        if query_id in self.submitted:
+            sql, params, started = self.submitted.pop(query_id)
+            self.record(sql, params, response, time.monotonic() - started)
+
+    def cursor(self):
+        return RecordingCursor(self, self.conn.cursor())
+
+    def get_query_status(self, query_id: str):
+        status = self.conn.get_query_status(query_id)
+        if self.conn.is_an_error(status):
+            # Callers stop at the status and never fetch, so replay needs the failure recorded here
+            self.record_async(query_id, {"error": f"Query {query_id} ended with {status.name}", "errno": None,
+                                         "sqlstate": None, "status": status.name})
+        return status
+
+    def close(self):
+        # Statements still in flight were cancelled or abandoned; record them so replay can submit them too
+        for query_id in list(self.submitted):
+            self.record_async(query_id, {"error": f"Query {query_id} was abandoned while running", "errno": None,
+                                         "sqlstate": None, "status": "ABORTED"})
+        self.conn.close()
+
+    def __getattr__(self, name):
+        # get_query_status, is_closed, close and the rest pass straight through
+        return getattr(self.conn, name)
+
+# --- Snowflake Replay ---
+
+def _raise_recorded_error(response: dict):
+    if "error" in response:
+        from snowflake.connector.errors import ProgrammingError
+        raise ProgrammingError(msg=response["error"], errno=response.get("errno"), sqlstate=response.get("sqlstate"))
+
+class ReplayCursor(_BufferedCursor):
+    def __init__(self, connection):
+        super().__init__()
+        self.connection = connection
+
+    def _take(self, sql: str, params) -> dict:
+        return self.connection.cassette.take("snowflake", snowflake_key(self.connection.account, sql, params), sql)
+
+    def execute(self, sql: str, *args, **kwargs):
+        entry = self._take(sql, _params(args, kwargs))
+        self.connection.cassette.wait(entry)
+        _raise_recorded_error(entry["response"])
+        self._load(entry["response"])
+        return self
+
+    def execute_async(self, sql: str, *args, **kwargs):
+        entry = self._take(sql, _params(args, kwargs))
+        if "status" not in entry["response"]:
+            # Rejected at submission rather than failed while running
+            _raise_recorded_error(entry["response"])
+        # A failed async statement has no result and so no query id of its own
+        self.sfqid = entry["response"].get("sfqid") or f"replay-{id(entry)}"
+        ready_at = time.monotonic() + self.connection.cassette.delay(entry["elapsed"])
+        self.connection.submitted[self.sfqid] = (entry["response"], ready_at)
+        return self
+
+    def get_results_from_sfqid(self, query_id: str):
+        response, _ = self.connection.submitted.pop(query_id)
+        _raise_recorded_error(response)
+        self._load(response)
+
+    def close(self):
+        pass
+
+class ReplayConnection:
+    """Stands in for a SnowflakeConnection, answering every statement from the cassette."""
+
+    def __init__(self, cassette: Cassette, account: str):
+        self.cassette = cassette
+        self.account = account
+        self.submitted = {}
+        self.closed = False
+
+    def cursor(self):
+        return ReplayCursor(self)
+
+    def get_query_status(self, query_id: str):
+        from snowflake.connector.constants import QueryStatus
+        if query_id not in self.submitted:
+            return QueryStatus.SUCCESS
+        response, ready_at = self.submitted[query_id]
+        if time.monotonic() < ready_at:
+            return QueryStatus.RUNNING
+        # Recorded async failures carry their terminal status; a result fetch that raised replays as FAILED_WITH_ERROR
+        return QueryStatus[response["status"]] if "status" in response else QueryStatus.SUCCESS
+
+    def is_still_running(self, status) -> bool:
+        from snowflake.connector.constants import QueryStatus
+        return status in (QueryStatus.RUNNING, QueryStatus.QUEUED, QueryStatus.RESUMING_WAREHOUSE,
+                          QueryStatus.QUEUED_REPARING_WAREHOUSE, QueryStatus.BLOCKED, QueryStatus.NO_DATA)
+
+    def is_an_error(self, status) -> bool:
+        from snowflake.connector.constants import QueryStatus
+        # Same sets as SnowflakeConnection, so recorded terminal statuses are classified the same on replay
+        return status in (QueryStatus.ABORTING, QueryStatus.FAILED_WITH_ERROR, QueryStatus.ABORTED,
+                          QueryStatus.FAILED_WITH_INCIDENT, QueryStatus.DISCONNECTED)
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+# --- LLM Calls ---
+
+def llm_key(provider: str, model: str, temperature: float, prompt: str) -> str:
+    from llm.gateway import request_key
+    return request_key(provider.lower(), model, temperature, prompt)
+
+def record_llm(cassette: Cassette, call, prompt: str, model: str, provider: str, temperature: float = None) -> str:
+    started = time.monotonic()
+    result = call()
+    cassette.record("llm", llm_key(provider, model, temperature, prompt),
+                    {"provider": provider, "model": model, "temperature": temperature, "prompt": prompt},
+                    {"completion": result}, time.monotonic() - started)
+    return result
+
+def replay_llm(cassette: Cassette, prompt: str, model: str, provider: str, temperature: float = None) -> str:
+    entry = cassette.take("llm", llm_key(provider, model, temperature, prompt), prompt)
+    cassette.wait(entry)
+    return entry["response"]["completion"]
+
+# --- Active Cassette ---
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+def get_cassette() -> Cassette:
+    """The process-wide cassette selected by the environment, or None when running live."""
+    global _cassette
+    mode = os.getenv(CASSETTE_MODE_ENV, "").lower()
+    if mode not in ("record", "replay"):
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(os.getenv(CASSETTE_PATH_ENV, DEFAULT_CASSETTE_PATH), mode,
+                                 os.getenv(CASSETTE_LATENCY_ENV, "original").lower())
+        return _cassette
@@ -0,0 +1,70 @@
+import json
+import time
+import hashlib
+import threading
+from collections import deque
+from contextlib import contextmanager
+from shared.snowflake_connector import connect_to_snowflake
+from shared.query_tag import build_query_tag, set_query_tag, POOLED_ACTION
+
+MAX_IDLE_PER_ACCOUNT = 8
+# Idle sessions are dropped well before Snowflake expires their token
+MAX_IDLE_SECONDS = 600
+
+_idle = {}
+_lock = threading.Lock()
+
+def _pool_key(conn_details: dict) -> str:
+    return hashlib.sha256(json.dumps(conn_details, sort_keys=True, default=str).encode()).hexdigest()
+
+def _checkout(key: str, tag: str):
+    now = time.monotonic()
+    expired = []
+    with _lock:
+        idle = _idle.get(key) or deque()
+        for entry in list(idle):
+            if now - entry[1] > MAX_IDLE_SECONDS or entry[0].is_closed():
+                idle.remove(entry)
+                expired.append(entry[0])
+        # A connection that already carries the tag needs no ALTER SESSION; otherwise the most recently returned one
+        entry = next((e for e in reversed(idle) if getattr(e[0], "optiverse_query_tag", None) == tag), idle[-1] if idle else None)
+        if entry is not None:
+            idle.remove(entry)
+    for conn in expired:
+        conn.close()
+    return entry[0] if entry is not None else None
+
+def _checkin(key: str, conn):
+    with _lock:
+        idle = _idle.setdefault(key, deque())
+        if len(idle) < MAX_IDLE_PER_ACCOUNT:
+            idle.append((conn, time.monotonic()))
+            return
+    conn.close()
+
+@contextmanager
+def pooled_connection(conn_details: dict):
+    """Borrow a Snowflake connection for the given details, reusing an idle one when available.
+
+    A connection that raised is closed instead of returned, since its session state is unknown.
+    """
+    key = _pool_key(conn_details)
+    # Tagged per module and session rather than per calling function, so a borrower rarely has to re-tag
+    tag = build_query_tag(action=POOLED_ACTION)
+    conn = _checkout(key, tag) or connect_to_snowflake(conn_details, tag)
+    try:
+        set_query_tag(conn, tag)
+        yield conn
+    except Exception:
+        conn.close()
+        raise
+    else:
+        _checkin(key, conn)
+
+def close_all():
+    with _lock:
+        pools = list(_idle.values())
+        _idle.clear()
+    for idle in pools:
+        for conn, _ in idle:
+            conn.close()
@@ -0,0 +1,82 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+DEFAULT_TIMEOUT_SECONDS = 60
+WORKERS_PER_ACCOUNT = 2
+
+# One small pool per account, so a hung account only ever blocks its own workers
+_pools = {}
+# Calls per account that have been submitted and have not finished, including ones a caller gave up on
+_in_flight = {}
+_pools_lock = threading.Lock()
+
+def _account_pool(name: str) -> ThreadPoolExecutor:
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = ThreadPoolExecutor(max_workers=WORKERS_PER_ACCOUNT, thread_name_prefix=f"fanout-{name}")
+        return _pools[name]
+
+def _submit(name: str, fn, conn_details: dict, args: tuple):
+    """Queues the call on the account's pool; None when earlier calls that never returned hold every worker."""
+    with _pools_lock:
+        if _in_flight.get(name, 0) >= WORKERS_PER_ACCOUNT:
+            return None
+        _in_flight[name] = _in_flight.get(name, 0) + 1
+    future = _account_pool(name).submit(_timed, fn, conn_details, args)
+    future.add_done_callback(lambda _: _finished(name))
+    return future
+
+def _finished(name: str):
+    with _pools_lock:
+        _in_flight[name] -= 1
+
+def _timed(fn, conn_details: dict, args: tuple):
+    started = time.monotonic()
+    return fn(conn_details, *args), time.monotonic() - started
+
+def fan_out(fn, connections: dict, *args, timeout: float = DEFAULT_TIMEOUT_SECONDS) -> dict:
+    """Run fn(conn_details, *args) against every connection at once.
+
+    Returns {name: {"status", "result", "error", "elapsed_s"}}. The timeout is one deadline for the whole
+    fan-out. Accounts that miss it are reported as timed out and their late results are discarded, but a call
+    already running cannot be stopped and keeps its worker until it returns; an account whose workers are
+    all held that way is reported as busy and not called again.
+    """
+    started = time.monotonic()
+    futures = {name: _submit(name, fn, conn_details, args) for name, conn_details in connections.items()}
+    wait([f for f in futures.values() if f is not None], timeout=timeout)
+
+    results = {}
+    for name, future in futures.items():
+        if future is None:
+            results[name] = {"status": "busy", "result": None, "elapsed_s": 0.0,
+                             "error": "Earlier calls to this account are still running; skipped"}
+        elif not future.done():
+            # cancel() only stops a call that has not started yet
+            running = not future.cancel()
+            results[name] = {"status": "timeout", "result": None,
+                             "error": f"No answer within {timeout:.0f}s" + ("; the call is still running" if running else ""),
+                             "elapsed_s": round(time.monotonic() - started, 2)}
+        elif future.exception() is not None:
+            results[name] = {"status": "error", "result": None, "error": str(future.exception()),
+                             "elapsed_s": round(time.monotonic() - started, 2)}
+        else:
+            result, elapsed = future.result()
+            results[name] = {"status": "ok", "result": result, "error": None, "elapsed_s": round(elapsed, 2)}
+    return results
+
+def merge_tagged(results: dict, key: str = None) -> list:
+    # Flattens successful per-account results into one list of rows tagged with their connection name
+    rows = []
+    for name, outcome in results.items():
+        if outcome["status"] != "ok":
+            continue
+        result = outcome["result"][key] if key else outcome["result"]
+        for row in result if isinstance(result, list) else [result]:
+            rows.append({"connection": name, **(row if isinstance(row, dict) else {"value": row})})
+    return rows
+
+def fan_out_status(results: dict) -> list:
+    return [{"connection": name, "status": o["status"], "elapsed_s": o["elapsed_s"], "error": o["error"] or ""}
+            for name, o in results.items()]
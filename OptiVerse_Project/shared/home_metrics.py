@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+from shared.connection_pool import pooled_connection
+from shared.shared_cache import shared_cached, connection_identity
+
+def get_home_metrics(conn_details: dict) -> dict:
+    # One snapshot a minute per account, however many sessions have Home open
+    return shared_cached("metrics", connection_identity(conn_details), lambda: _load_home_metrics(conn_details))
+
+def _load_home_metrics(conn_details: dict) -> dict:
+    with pooled_connection(conn_details) as conn:
+        cur = conn.cursor()
+        try:
+            now = datetime.utcnow()
+            today_str = now.strftime('%Y-%m-%d')
+            # Literal cutoff truncated to the minute so reruns send identical text and can reuse the cached result
+            hour_ago_str = (now - timedelta(hours=1)).strftime('%Y-%m-%d %H:%M:00')
+
+            cur.execute(f"""SELECT COUNT(*) FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY WHERE START_TIME::DATE = '{today_str}'""")
+            total_queries = cur.fetchone()[0]
+
+            cur.execute(f"""SELECT SUM(CREDITS_USED) FROM SNOWFLAKE.ACCOUNT_USAGE.WAREHOUSE_METERING_HISTORY WHERE START_TIME::DATE = '{today_str}'""")
+            total_credits = cur.fetchone()[0] or 0
+
+            cur.execute("SHOW WAREHOUSES")
+            warehouses = cur.fetchall()
+
+            cur.execute(f"""SELECT EXECUTION_STATUS FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY WHERE START_TIME >= '{hour_ago_str} +0000'::TIMESTAMP_TZ""")
+            statuses = [row[0] for row in cur.fetchall()]
+        finally:
+            cur.close()
+
+    return {
+        "total_queries": total_queries,
+        "estimated_cost": round(float(total_credits) * 1, 2),
+        "active_warehouses": sum(1 for w in warehouses if "RUNNING" in str(w[5])),
+        "running_queries": statuses.count("RUNNING"),
+        "queued_queries": statuses.count("QUEUED"),
+    }
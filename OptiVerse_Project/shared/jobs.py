@@ -0,0 +1,221 @@
+import json
+import time
+import uuid
+import threading
+from datetime import datetime, timedelta, timezone
+from shared.snowflake_connector import connect_to_snowflake
+from shared.local_store import get_local_db
+from shared.query_tag import build_query_tag
+
+POLL_INTERVAL_SECONDS = 1.0
+MAX_IN_FLIGHT_PER_JOB = 4
+MAX_RESULT_ROWS = 10000
+FINISHED_STATES = ("succeeded", "failed", "cancelled", "interrupted")
+# The poller rewrites "updated" on every pass; a job silent for this long has lost its process
+JOB_LEASE_SECONDS = 300
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime(TIME_FORMAT)
+
+def _init_db(db):
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            kind TEXT,
+            label TEXT,
+            account TEXT,
+            status TEXT,
+            total INTEGER,
+            done INTEGER,
+            query_ids TEXT,
+            result TEXT,
+            error TEXT,
+            created TEXT,
+            updated TEXT
+        )
+    """)
+
+def _expire_abandoned(db):
+    # Other processes (the API server, a second Streamlit app) share this table, so only jobs
+    # whose lease ran out are marked; live jobs of another process keep running
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=JOB_LEASE_SECONDS)).strftime(TIME_FORMAT)
+    with db:
+        db.execute("UPDATE jobs SET status = 'interrupted', updated = ? WHERE status IN ('queued', 'running') AND updated < ?",
+                   (_now(), cutoff))
+
+class _RunningJob:
+    def __init__(self, job_id: str, conn_details: dict, statements: list, query_tag: str):
+        self.job_id = job_id
+        self.conn_details = conn_details
+        self.query_tag = query_tag
+        self.pending = list(enumerate(statements))
+        self.total = len(statements)
+        self.conn = None
+        self.in_flight = {}
+        self.query_ids = [None] * len(statements)
+        self.results = [None] * len(statements)
+        self.done = 0
+        self.cancel_requested = False
+
+class JobManager:
+    """Runs Snowflake statements with execute_async and polls them from one background thread.
+
+    Job state lives in the local SQLite store so pages can read progress and results on any rerun.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = {}
+        self.wakeup = threading.Event()
+        db = get_local_db()
+        _init_db(db)
+        _expire_abandoned(db)
+        db.close()
+        self.worker = threading.Thread(target=self._poll_loop, name="optiverse-jobs", daemon=True)
+        self.worker.start()
+
+    def submit(self, conn_details: dict, statements: list, kind: str, label: str = "") -> str:
+        job_id = uuid.uuid4().hex[:12]
+        db = get_local_db()
+        _init_db(db)
+        with db:
+            db.execute("INSERT INTO jobs VALUES (?, ?, ?, ?, 'queued', ?, 0, '[]', NULL, NULL, ?, ?)",
+                       (job_id, kind, label or kind, conn_details["account"], len(statements), _now(), _now()))
+        db.close()
+        with self.lock:
+            # Tagged with the submitting page and session, not the poller thread that runs it
+            self.running[job_id] = _RunningJob(job_id, conn_details, statements, build_query_tag(action=kind))
+        self.wakeup.set()
+        return job_id
+
+    def cancel(self, job_id: str):
+        with self.lock:
+            job = self.running.get(job_id)
+            if job:
+                job.cancel_requested = True
+        self.wakeup.set()
+
+    def _update(self, job: _RunningJob, status: str, error: str = None):
+        result = None
+        if status == "succeeded":
+            result = json.dumps(job.results, default=str)
+        db = get_local_db()
+        with db:
+            db.execute("UPDATE jobs SET status = ?, done = ?, query_ids = ?, result = COALESCE(?, result), error = ?, updated = ? WHERE job_id = ?",
+                       (status, job.done, json.dumps(job.query_ids), result, error, _now(), job.job_id))
+        db.close()
+
+    def _cancel_in_flight(self, job: _RunningJob):
+        cursor = job.conn.cursor()
+        try:
+            for query_id in job.in_flight.values():
+                cursor.execute(f"SELECT SYSTEM$CANCEL_QUERY('{query_id}')")
+        finally:
+            cursor.close()
+
+    def _fetch(self, job: _RunningJob, query_id: str) -> dict:
+        cursor = job.conn.cursor()
+        try:
+            cursor.get_results_from_sfqid(query_id)
+            columns = [c[0] for c in cursor.description] if cursor.description else []
+            rows = cursor.fetchmany(MAX_RESULT_ROWS) if columns else []
+            return {"columns": columns, "rows": [list(r) for r in rows]}
+        finally:
+            cursor.close()
+
+    def _advance(self, job: _RunningJob):
+        if job.conn is None:
+            job.conn = connect_to_snowflake(job.conn_details, job.query_tag)
+
+        if job.cancel_requested:
+            self._cancel_in_flight(job)
+            return "cancelled", None
+
+        for index, query_id in list(job.in_flight.items()):
+            status = job.conn.get_query_status(query_id)
+            if job.conn.is_still_running(status):
+                continue
+            del job.in_flight[index]
+            if job.conn.is_an_error(status):
+                self._cancel_in_flight(job)
+                return "failed", f"Query {query_id} ended with {status.name}"
+            job.results[index] = self._fetch(job, query_id)
+            job.done += 1
+
+        while job.pending and len(job.in_flight) < MAX_IN_FLIGHT_PER_JOB:
+            index, statement = job.pending.pop(0)
+            cursor = job.conn.cursor()
+            try:
+                cursor.execute_async(statement)
+                job.in_flight[index] = job.query_ids[index] = cursor.sfqid
+            finally:
+                cursor.close()
+
+        if not job.pending and not job.in_flight:
+            return "succeeded", None
+        return "running", None
+
+    def _poll_loop(self):
+        while True:
+            self.wakeup.wait(POLL_INTERVAL_SECONDS)
+            self.wakeup.clear()
+            with self.lock:
+                jobs = list(self.running.values())
+            for job in jobs:
+                try:
+                    status, error = self._advance(job)
+                except Exception as e:
+                    status, error = "failed", str(e)
+                self._update(job, status, error)
+                if status in FINISHED_STATES:
+                    with self.lock:
+                        self.running.pop(job.job_id, None)
+                    if job.conn is not None:
+                        job.conn.close()
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_job_manager() -> JobManager:
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
+
+def submit_job(conn_details: dict, statements: list, kind: str, label: str = "") -> str:
+    return get_job_manager().submit(conn_details, statements, kind, label)
+
+def cancel_job(job_id: str):
+    get_job_manager().cancel(job_id)
+
+def get_job(job_id: str) -> dict:
+    db = get_local_db()
+    _init_db(db)
+    _expire_abandoned(db)
+    cursor = db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+    row = cursor.fetchone()
+    columns = [c[0] for c in cursor.description]
+    db.close()
+    if row is None:
+        return None
+    job = dict(zip(columns, row))
+    job["query_ids"] = json.loads(job["query_ids"] or "[]")
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+def list_jobs(limit: int = 20) -> list:
+    db = get_local_db()
+    _init_db(db)
+    rows = db.execute("SELECT job_id FROM jobs ORDER BY created DESC LIMIT ?", (limit,)).fetchall()
+    db.close()
+    return [get_job(job_id) for (job_id,) in rows]
+
+def wait_for_job(job_id: str, timeout: float = None) -> dict:
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        job = get_job(job_id)
+        if job is None or job["status"] in FINISHED_STATES or (deadline and time.monotonic() > deadline):
+            return job
+        time.sleep(POLL_INTERVAL_SECONDS / 2)
@@ -1,11 +1,24 @@
 import streamlit as st
 from llm.ollama_helpers import call_llm
 from modules.api_config.config_manager import get_api_credentials
+from modules.query_optimizer.prompt_budget import prompt_budget, compact_plan, truncate_to_tokens
 
 def generate_sql_optimization(prompt):
     return call_llm(prompt)
 
+PLAN_PROMPT_OVERHEAD_TOKENS = 200
+
 def compare_explain_plans(original: str, optimized: str) -> str:
+    creds = get_api_credentials()
+    # Use selected provider and model from session
+    provider = st.session_state.get("llm_provider", "together")
+    model = creds.get(provider, {}).get("model", "meta-llama/llama-4-scout-17b-16e-instruct")
+
+    # Both plans share the budget equally; each keeps its top operators when cut
+    plan_budget = (prompt_budget(model) - PLAN_PROMPT_OVERHEAD_TOKENS) // 2
+    original = truncate_to_tokens(compact_plan(original), plan_budget)
+    optimized = truncate_to_tokens(compact_plan(optimized), plan_budget)
+
     prompt = f"""
 You are a Snowflake SQL optimization expert.
 
@@ -16,11 +29,8 @@ Compare these two EXPLAIN plans and give a layman summary:
 2️⃣ Optimized Plan:
 {optimized}
 
+Plans are one line per operator; pt/pa are partitions total/assigned and b is bytes assigned.
 Clearly explain if performance improved, worsened, or stayed the same.
 """
-    creds = get_api_credentials()
-    # Use selected provider and model from session
-    provider = st.session_state.get("llm_provider", "together")
-    model = creds.get(provider, {}).get("model", "meta-llama/llama-4-scout-17b-16e-instruct")
 
     return call_llm(prompt, model=model, provider=provider)
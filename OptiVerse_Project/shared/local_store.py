@@ -0,0 +1,16 @@
+import sqlite3
+
+LOCAL_DB_FILE = "shared/optiverse.db"
+
+def get_local_db(path: str = LOCAL_DB_FILE):
+    db = sqlite3.connect(path, timeout=30)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("CREATE TABLE IF NOT EXISTS watermarks (name TEXT PRIMARY KEY, value TEXT)")
+    return db
+
+def get_watermark(db, name: str, default: str = None) -> str:
+    row = db.execute("SELECT value FROM watermarks WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else default
+
+def set_watermark(db, name: str, value: str):
+    db.execute("INSERT INTO watermarks (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = excluded.value", (name, value))
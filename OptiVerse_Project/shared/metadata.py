@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+
+# SHOW commands are answered by the cloud services layer and never resume a warehouse; INFORMATION_SCHEMA
+# queries do. SHOW output is post-processed here in Python rather than with RESULT_SCAN, which is itself
+# a SELECT and would need a running warehouse just the same.
+
+def show_tables_sql(database: str, schema: str = None, like: str = None) -> str:
+    scope = f"SCHEMA {database}.{schema}" if schema else f"DATABASE {database}"
+    # LIKE is a case-insensitive pattern; callers match the exact name in the output
+    like_clause = " LIKE '" + like.replace("'", "''") + "'" if like else ""
+    return f"SHOW TABLES{like_clause} IN {scope}"
+
+def show_rows(columns: list, rows: list) -> list:
+    """SHOW output as dicts keyed by lower-case column name; column order differs between Snowflake releases."""
+    names = [c.lower() for c in columns]
+    return [dict(zip(names, row)) for row in rows]
+
+def has_columns(columns: list, required: set) -> bool:
+    return required <= {c.lower() for c in columns}
+
+def as_utc(value):
+    # Timestamps come back as datetimes from the connector or as ISO strings from a persisted job result
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def show_table_entries(columns: list, rows: list) -> list:
+    """Permanent and transient tables from SHOW TABLES, named like their INFORMATION_SCHEMA.TABLES columns.
+
+    Temporary and external tables are left out, matching TABLE_TYPE = 'BASE TABLE'.
+    """
+    entries = []
+    for row in show_rows(columns, rows):
+        if str(row.get("kind") or "").upper() == "TEMPORARY" or str(row.get("is_external") or "N").upper() == "Y":
+            continue
+        entries.append({
+            "table_schema": row.get("schema_name"),
+            "table_name": row.get("name"),
+            "created": row.get("created_on"),
+            "bytes": row.get("bytes"),
+            "row_count": row.get("rows"),
+            "owner": row.get("owner"),
+            # Not part of SHOW TABLES output today; callers fall back to INFORMATION_SCHEMA without them
+            "last_altered": row.get("last_altered"),
+            "last_ddl_by": row.get("last_ddl_by"),
+        })
+    return entries
+
+def table_bytes(cursor, table: str) -> float:
+    """Bytes of a fully qualified table from SHOW TABLES; 0.0 when the name is not qualified or not found."""
+    parts = table.split(".")
+    if len(parts) != 3:
+        return 0.0
+    database, schema, name = parts
+    cursor.execute(show_tables_sql(database, schema, name))
+    entries = show_table_entries([c[0] for c in cursor.description], cursor.fetchall())
+    match = next((e for e in entries if e["table_name"].upper() == name.upper()), None)
+    return float(match["bytes"] or 0) if match else 0.0
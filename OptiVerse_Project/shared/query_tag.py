@@ -0,0 +1,65 @@
+import sys
+import json
+import uuid
+
+APP_NAME = "optiverse"
+# Filter for OptiVerse's own statements in QUERY_HISTORY; matches the key order build_query_tag writes
+QUERY_TAG_PREFIX = f'{{"app": "{APP_NAME}"'
+# Sessions that are not a Streamlit browser session (API server, worker threads) share this id
+PROCESS_SESSION_ID = f"process-{uuid.uuid4().hex[:8]}"
+
+# Action of statements on pooled connections, which are attributed to their module only: re-tagging a borrowed
+# session costs an ALTER SESSION round trip, so the tag must not change with every calling function
+POOLED_ACTION = "pooled"
+# Frames in these modules only pass the connection along; the caller beyond them names the action
+PLUMBING_MODULES = {"shared.snowflake_connector", "shared.connection_pool", "shared.query_tag", "shared.cassette", "shared.jobs", "contextlib"}
+
+def _session_id() -> str:
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except Exception:
+        ctx = None
+    return ctx.session_id if ctx else PROCESS_SESSION_ID
+
+def _module_label(name: str) -> str:
+    # modules.idle_burn.idle_detector -> idle_burn, shared.jobs -> jobs, __main__ (the Streamlit app) -> main
+    parts = name.split(".")
+    if parts[0] in ("modules", "shared") and len(parts) > 1:
+        return parts[1]
+    return "main" if parts[0] == "__main__" else parts[0]
+
+def _caller() -> tuple:
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_globals.get("__name__") in PLUMBING_MODULES:
+        frame = frame.f_back
+    if frame is None:
+        return "unknown", "unknown"
+    return _module_label(frame.f_globals.get("__name__", "unknown")), _function_label(frame.f_code)
+
+def _function_label(code) -> str:
+    # A closure is named after the function that defines it: run_explain.<locals>.load -> run_explain,
+    # JobManager._poll -> _poll. co_qualname is new in Python 3.11; older versions keep the bare name.
+    qualname = getattr(code, "co_qualname", code.co_name)
+    return qualname.split(".<locals>.")[0].split(".")[-1]
+
+def build_query_tag(module: str = None, action: str = None) -> str:
+    """JSON QUERY_TAG naming the page module, the action and the user session; defaults come from the caller."""
+    caller_module, caller_action = _caller()
+    return json.dumps({
+        "app": APP_NAME,
+        "module": module or caller_module,
+        "action": action or caller_action,
+        "session": _session_id(),
+    })
+
+def set_query_tag(conn, tag: str):
+    # Pooled connections carry the tag of whoever borrowed them last
+    if getattr(conn, "optiverse_query_tag", None) == tag:
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute("ALTER SESSION SET QUERY_TAG = %s", (tag,))
+    finally:
+        cursor.close()
+    conn.optiverse_query_tag = tag
@@ -0,0 +1,88 @@
+import os
+import time
+import uuid
+import pickle
+import shutil
+import streamlit as st
+from collections import OrderedDict
+from shared.shared_cache import server_mode, approximate_size
+
+SESSION_CAP_MB_ENV = "OPTIVERSE_SESSION_CAP_MB"
+DEFAULT_SESSION_CAP_MB = 32
+# Artifacts this large go to disk as soon as they are stored
+SPILL_THRESHOLD_BYTES = 1024 * 1024
+SPILL_DIR = "shared/spill"
+# Spill folders of sessions that ended without cleanup are removed after this long
+SPILL_MAX_AGE_HOURS = 24
+
+class SpilledArtifact:
+    """Stands in for a large value in st.session_state; the value itself is pickled on disk."""
+
+    __slots__ = ("path", "size")
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+
+    def load(self):
+        with open(self.path, "rb") as f:
+            return pickle.load(f)
+
+def _spill_dir() -> str:
+    session_dir = st.session_state.setdefault("_spill_dir", os.path.join(SPILL_DIR, uuid.uuid4().hex))
+    os.makedirs(session_dir, exist_ok=True)
+    return session_dir
+
+def _spill(key: str, value, size: int) -> SpilledArtifact:
+    path = os.path.join(_spill_dir(), f"{key}.pkl")
+    with open(path, "wb") as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return SpilledArtifact(path, size)
+
+def put_artifact(key: str, value):
+    """Stores a page result in session state, keeping the session's in-memory share under its cap.
+
+    Outside server mode this is a plain assignment. In server mode large values, and the oldest
+    ones once the session is over its cap, are kept on disk and referenced from session state.
+    """
+    if not server_mode():
+        st.session_state[key] = value
+        return
+    sizes = st.session_state.setdefault("_artifact_sizes", OrderedDict())
+    sizes.pop(key, None)
+    size = approximate_size(value)
+    if size >= SPILL_THRESHOLD_BYTES:
+        st.session_state[key] = _spill(key, value, size)
+        return
+    st.session_state[key] = value
+    sizes[key] = size
+
+    cap = int(os.getenv(SESSION_CAP_MB_ENV, DEFAULT_SESSION_CAP_MB)) * 1024 * 1024
+    while sum(sizes.values()) > cap and len(sizes) > 1:
+        oldest, oldest_size = sizes.popitem(last=False)
+        if oldest in st.session_state:
+            st.session_state[oldest] = _spill(oldest, st.session_state[oldest], oldest_size)
+
+def get_artifact(key: str, default=None):
+    value = st.session_state.get(key, default)
+    if isinstance(value, SpilledArtifact):
+        try:
+            return value.load()
+        except (OSError, pickle.UnpicklingError):
+            return default
+    return value
+
+def pop_artifact(key: str):
+    value = st.session_state.pop(key, None)
+    st.session_state.get("_artifact_sizes", {}).pop(key, None)
+    if isinstance(value, SpilledArtifact) and os.path.exists(value.path):
+        os.remove(value.path)
+
+def purge_stale_spills():
+    if not os.path.isdir(SPILL_DIR):
+        return
+    cutoff = time.time() - SPILL_MAX_AGE_HOURS * 3600
+    for name in os.listdir(SPILL_DIR):
+        path = os.path.join(SPILL_DIR, name)
+        if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+from llm.gateway import single_flight
+from modules.api_config.config_manager import CONFIG_FILE, get_snowflake_connections
+
+# One OptiVerse process serving a whole team; sessions then share catalogs, plans, completions and metrics
+SERVER_MODE_ENV = "OPTIVERSE_SERVER_MODE"
+SHARED_CACHE_MB_ENV = "OPTIVERSE_SHARED_CACHE_MB"
+DEFAULT_SHARED_CACHE_MB = 256
+
+# Seconds an entry stays valid; plans go stale as data is loaded, metrics within a minute
+NAMESPACE_TTLS = {
+    "catalog": 3600,
+    "explain": 900,
+    "llm": 86400,
+    "metrics": 60,
+}
+
+def server_mode() -> bool:
+    return os.getenv(SERVER_MODE_ENV, "").lower() in ("1", "true", "yes")
+
+def approximate_size(value) -> int:
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+def connection_identity(conn_details: dict) -> list:
+    # What a result can depend on: who is asking and where, never the credentials
+    return [str(conn_details.get(k) or "").upper() for k in ["account", "user", "role", "database", "schema"]]
+
+class SharedCache:
+    """Thread-safe LRU bounded by approximate bytes, with a TTL per entry."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[2] < now:
+                if entry is not None:
+                    self._evict(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value, ttl: float):
+        size = approximate_size(value)
+        # A single value larger than a quarter of the cache would flush everything else out
+        if size > self.max_bytes // 4:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._evict(key)
+            self.entries[key] = (value, size, time.monotonic() + ttl)
+            self.bytes += size
+            while self.bytes > self.max_bytes and self.entries:
+                self._evict(next(iter(self.entries)))
+
+    def _evict(self, key: str):
+        _, size, _ = self.entries.pop(key)
+        self.bytes -= size
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_shared_cache() -> SharedCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SharedCache(int(os.getenv(SHARED_CACHE_MB_ENV, DEFAULT_SHARED_CACHE_MB)) * 1024 * 1024)
+        return _cache
+
+def shared_cached(namespace: str, key_parts: list, loader, keep=None):
+    """Returns loader() through the cross-session cache in server mode; a plain call otherwise.
+
+    Concurrent misses for the same key share one load. keep(value) decides whether a result is
+    worth caching, so error strings are not served to other sessions.
+    """
+    if not server_mode():
+        return loader()
+    key = namespace + ":" + hashlib.sha256(json.dumps(key_parts, default=str).encode()).hexdigest()
+    cache = get_shared_cache()
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    def load():
+        result = loader()
+        if result is not None and (keep is None or keep(result)):
+            cache.put(key, result, NAMESPACE_TTLS[namespace])
+        return result
+
+    return single_flight(key, load)
+
+# --- Shared Connection Details ---
+
+_connections = {"mtime": None, "value": None}
+
+def session_connections() -> dict:
+    """Saved connections for st.session_state; in server mode every session holds the same dict."""
+    if not server_mode():
+        return get_snowflake_connections()
+    mtime = os.path.getmtime(CONFIG_FILE) if os.path.exists(CONFIG_FILE) else None
+    with _cache_lock:
+        if _connections["value"] is None or _connections["mtime"] != mtime:
+            _connections.update(mtime=mtime, value=get_snowflake_connections())
+        return _connections["value"]
@@ -1,8 +1,24 @@
 import snowflake.connector
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.backends import default_backend
+from shared.cassette import get_cassette, RecordingConnection, ReplayConnection
+from shared.query_tag import build_query_tag
 
-def connect_to_snowflake(conn_details):
+def connect_to_snowflake(conn_details, query_tag=None):
+    # Every session is tagged so OptiVerse's own usage can be found in QUERY_HISTORY; see shared/query_tag.py
+    tag = query_tag or build_query_tag()
+    # Record/replay is switched on by OPTIVERSE_CASSETTE_MODE; see shared/cassette.py
+    cassette = get_cassette()
+    if cassette is None:
+        conn = _connect(conn_details, tag)
+    elif cassette.mode == "replay":
+        conn = ReplayConnection(cassette, conn_details["account"])
+    else:
+        conn = RecordingConnection(cassette, _connect(conn_details, tag), conn_details["account"])
+    conn.optiverse_query_tag = tag
+    return conn
+
+def _connect(conn_details, query_tag):
     if conn_details["auth_method"] == "Username/Password":
         return snowflake.connector.connect(
             user=conn_details["user"],
@@ -11,7 +27,8 @@ def connect_to_snowflake(conn_details):
             warehouse=conn_details["warehouse"],
             database=conn_details["database"],
             schema=conn_details["schema"],
-            role=conn_details.get("role") or None
+            role=conn_details.get("role") or None,
+            session_parameters={"QUERY_TAG": query_tag}
         )
     else:
         p_key = serialization.load_pem_private_key(
@@ -33,5 +50,6 @@ def connect_to_snowflake(conn_details):
             warehouse=conn_details["warehouse"],
             database=conn_details["database"],
             schema=conn_details["schema"],
-            role=conn_details.get("role") or None
+            role=conn_details.get("role") or None,
+            session_parameters={"QUERY_TAG": query_tag}
         )
@@ -0,0 +1,29 @@
+WAREHOUSE_CREDITS_PER_HOUR = {
+    "XSMALL": 1,
+    "SMALL": 2,
+    "MEDIUM": 4,
+    "LARGE": 8,
+    "XLARGE": 16,
+    "2XLARGE": 32,
+    "3XLARGE": 64,
+    "4XLARGE": 128,
+    "5XLARGE": 256,
+    "6XLARGE": 512,
+}
+WAREHOUSE_SIZES = ["X-Small", "Small", "Medium", "Large", "X-Large", "2X-Large", "3X-Large", "4X-Large", "5X-Large", "6X-Large"]
+MIN_BILLED_SECONDS = 60
+
+def normalize_size(size: str) -> str:
+    # QUERY_HISTORY says "X-Small", SHOW WAREHOUSES "X-Small" or "XSMALL", ALTER accepts "XXLARGE"
+    key = str(size or "").upper().replace("-", "").replace("_", "").replace(" ", "")
+    return {"XXLARGE": "2XLARGE", "XXXLARGE": "3XLARGE"}.get(key, key)
+
+def credits_per_hour(size: str) -> float:
+    return WAREHOUSE_CREDITS_PER_HOUR.get(normalize_size(size), 1)
+
+def credits_for(seconds: float, size: str) -> float:
+    return seconds / 3600 * credits_per_hour(size)
+
+def credits_per_hour_sql(size_column: str = "WAREHOUSE_SIZE") -> str:
+    cases = " ".join(f"WHEN '{size}' THEN {rate}" for size, rate in WAREHOUSE_CREDITS_PER_HOUR.items())
+    return f"CASE REPLACE(UPPER({size_column}), '-', '') {cases} ELSE 1 END"
@@ -0,0 +1,125 @@
+import re
+import hashlib
+import sqlglot
+from sqlglot import exp
+from sqlglot.tokens import TokenType
+from sqlglot.dialects.snowflake import Snowflake
+
+POINT_PREDICATES = (exp.EQ, exp.In)
+RANGE_PREDICATES = (exp.GT, exp.GTE, exp.LT, exp.LTE, exp.Between)
+# sqlglot names; SYSDATE/GETDATE parse as CURRENT_TIMESTAMP, RANDOM as RAND and UUID_STRING as UUID
+NONDETERMINISTIC_FUNCTIONS = {"CURRENT_TIMESTAMP", "CURRENT_DATE", "CURRENT_TIME", "LOCALTIME", "LOCALTIMESTAMP",
+                              "RAND", "RANDOM", "UUID", "UUID_STRING", "SEQ1", "SEQ2", "SEQ4", "SEQ8"}
+
+def parse_sql(sql: str):
+    try:
+        return sqlglot.parse_one(sql.strip().rstrip(";"), read="snowflake")
+    except sqlglot.errors.SqlglotError:
+        return None
+
+# Fallback for statements sqlglot cannot parse: string and numeric literals
+LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+def fingerprint_sql(sql: str) -> str:
+    """Hash of a statement's shape: literals become placeholders, keywords and whitespace are normalized.
+
+    Two runs of the same query with different filter values share a fingerprint.
+    """
+    tree = parse_sql(sql)
+    if tree is None:
+        text = " ".join(LITERAL_PATTERN.sub("?", sql.strip().rstrip(";")).split())
+    else:
+        tree = tree.copy()
+        for literal in list(tree.find_all(exp.Literal)):
+            literal.replace(exp.Placeholder())
+        text = tree.sql(dialect="snowflake")
+    return hashlib.sha256(text.upper().encode()).hexdigest()[:16]
+
+LITERAL_TOKEN_TYPES = {TokenType.STRING, TokenType.NUMBER, TokenType.RAW_STRING, TokenType.HEREDOC_STRING}
+
+def parameterize_sql(sql: str):
+    """Splits a statement into a template hash and its literals as (start, end, text) spans, in order.
+
+    Unlike fingerprint_sql the template keeps identifiers and keywords exactly as written, so two
+    statements share it only when they differ in nothing but literal values. None if untokenizable.
+    """
+    try:
+        tokens = Snowflake().tokenize(sql)
+    except sqlglot.errors.SqlglotError:
+        return None
+    skeleton, literals = [], []
+    for token in tokens:
+        text = sql[token.start:token.end + 1]
+        if token.token_type == TokenType.SEMICOLON:
+            continue
+        if token.token_type in LITERAL_TOKEN_TYPES:
+            literals.append((token.start, token.end + 1, text))
+            skeleton.append("?")
+        else:
+            skeleton.append(text)
+    return hashlib.sha256(" ".join(skeleton).encode()).hexdigest()[:16], literals
+
+def _qualified_name(table: exp.Table, database: str, schema: str) -> str:
+    db = table.catalog or database
+    sch = table.db or schema
+    return ".".join(p for p in [db, sch, table.name] if p).upper()
+
+def nondeterministic_functions(tree) -> set:
+    found = set()
+    for func in tree.find_all(exp.Func):
+        name = (func.sql_name() if not isinstance(func, exp.Anonymous) else func.name).upper()
+        if name in NONDETERMINISTIC_FUNCTIONS:
+            found.add(name)
+    return found
+
+def _scope_tables(select: exp.Select, database: str, schema: str, cte_names: set) -> dict:
+    tables = {}
+    sources = [select.args.get("from_") or select.args.get("from")] + list(select.args.get("joins") or [])
+    for source in sources:
+        if source is not None and isinstance(source.this, exp.Table) and source.this.name.lower() not in cte_names:
+            tables[source.this.alias_or_name.lower()] = _qualified_name(source.this, database, schema)
+    return tables
+
+def referenced_tables(sql: str, database: str = "", schema: str = "") -> set:
+    tree = parse_sql(sql)
+    if tree is None:
+        return set()
+    cte_names = {cte.alias.lower() for cte in tree.find_all(exp.CTE)}
+    return {_qualified_name(t, database, schema) for t in tree.find_all(exp.Table) if t.name and t.name.lower() not in cte_names}
+
+def _column_table(column: exp.Column, tables: dict):
+    if column.table:
+        return tables.get(column.table.lower())
+    return next(iter(tables.values())) if len(tables) == 1 else None
+
+def extract_column_usage(sql: str, database: str = "", schema: str = "") -> list:
+    # Returns (table, column, kind) for every filter or join predicate; kind is point, range or join
+    tree = parse_sql(sql)
+    if tree is None:
+        return []
+    cte_names = {cte.alias.lower() for cte in tree.find_all(exp.CTE)}
+
+    usage = set()
+    for select in tree.find_all(exp.Select):
+        tables = _scope_tables(select, database, schema, cte_names)
+        if not tables:
+            continue
+        conditions = [select.args.get("where")] + [j.args.get("on") for j in select.args.get("joins") or []]
+        for condition in conditions:
+            if condition is None:
+                continue
+            for predicate in condition.find_all(*POINT_PREDICATES, *RANGE_PREDICATES):
+                if predicate.find_ancestor(exp.Select) is not select:
+                    continue
+                columns = [c for c in predicate.find_all(exp.Column) if c.find_ancestor(exp.Select) is select]
+                if isinstance(predicate, exp.EQ) and isinstance(predicate.this, exp.Column) and isinstance(predicate.expression, exp.Column):
+                    kind = "join"
+                elif isinstance(predicate, POINT_PREDICATES):
+                    kind = "point"
+                else:
+                    kind = "range"
+                for column in columns:
+                    table = _column_table(column, tables)
+                    if table:
+                        usage.add((table, column.name.upper(), kind))
+    return sorted(usage)
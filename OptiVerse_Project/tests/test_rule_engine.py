@@ -0,0 +1,96 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.query_optimizer.rule_engine import (
+    apply_rules, union_to_union_all, expand_select_star, row_number_to_qualify, push_filters_into_ctes,
+)
+import sqlglot
+
+
+def parse(sql):
+    return sqlglot.parse_one(sql, read="snowflake")
+
+
+def columns_of(table):
+    return {"T": ["ID", "A", "B", "C"]}.get(table.upper(), [])
+
+
+def test_union_keeps_dedup_for_equal_numbers_written_differently():
+    tree = parse("SELECT DISTINCT 1 AS k, a FROM t UNION SELECT DISTINCT 1.0 AS k, a FROM u")
+    _, changed = union_to_union_all(tree)
+    assert not changed
+
+
+def test_union_all_for_distinct_constants():
+    tree = parse("SELECT DISTINCT 1 AS k, a FROM t UNION SELECT DISTINCT 2 AS k, a FROM u")
+    _, changed = union_to_union_all(tree)
+    assert changed
+
+
+def test_star_expansion_skips_join_using():
+    tree = parse("WITH c AS (SELECT * FROM t) SELECT c.a FROM c JOIN u USING (id)")
+    _, changed = expand_select_star(tree, columns_of)
+    assert not changed
+
+
+def test_star_expansion_keeps_referenced_columns():
+    tree, changed = expand_select_star(parse("WITH c AS (SELECT * FROM t) SELECT c.a FROM c"), columns_of)
+    assert changed
+    assert "SELECT A FROM t" in tree.sql(dialect="snowflake")
+
+
+def test_qualify_keeps_row_number_column_for_select_star():
+    sql = "SELECT * FROM (SELECT a, ROW_NUMBER() OVER (PARTITION BY a ORDER BY b) AS rn FROM t) s WHERE rn = 1"
+    tree, changed = row_number_to_qualify(parse(sql))
+    assert changed
+    assert [p.alias_or_name.lower() for p in tree.expressions] == ["a", "rn"]
+
+
+def test_qualify_skips_distinct_inner_select():
+    sql = "SELECT a FROM (SELECT DISTINCT a, ROW_NUMBER() OVER (PARTITION BY b ORDER BY c) AS rn FROM t) s WHERE rn = 1"
+    _, changed = row_number_to_qualify(parse(sql))
+    assert not changed
+
+
+def test_qualify_maps_order_by_through_renamed_outputs():
+    sql = ("SELECT x AS y FROM (SELECT a + 1 AS x, ROW_NUMBER() OVER (PARTITION BY b ORDER BY c) AS rn FROM t) s "
+           "WHERE rn = 1 ORDER BY x")
+    tree, changed = row_number_to_qualify(parse(sql))
+    assert changed
+    assert tree.args["order"].sql(dialect="snowflake") == "ORDER BY a + 1"
+
+
+def test_qualify_keeps_order_by_on_outer_alias():
+    sql = ("SELECT x AS y FROM (SELECT a + 1 AS x, ROW_NUMBER() OVER (PARTITION BY b ORDER BY c) AS rn FROM t) s "
+           "WHERE rn = 1 ORDER BY y")
+    tree, changed = row_number_to_qualify(parse(sql))
+    assert changed
+    assert tree.args["order"].sql(dialect="snowflake") == "ORDER BY y"
+
+
+def test_qualify_skips_unknown_order_by_column():
+    sql = "SELECT x FROM (SELECT a AS x, ROW_NUMBER() OVER (PARTITION BY b ORDER BY c) AS rn FROM t) s WHERE rn = 1 ORDER BY z"
+    _, changed = row_number_to_qualify(parse(sql))
+    assert not changed
+
+
+def test_filter_on_nondeterministic_cte_column_stays_outside():
+    tree = parse("WITH c AS (SELECT RANDOM() AS r, a FROM t) SELECT a FROM c WHERE r > 0")
+    _, changed = push_filters_into_ctes(tree)
+    assert not changed
+
+
+def test_nondeterministic_filter_stays_outside_cte():
+    tree = parse("WITH c AS (SELECT a, b FROM t) SELECT a FROM c WHERE b > RANDOM() AND a = 1")
+    tree, changed = push_filters_into_ctes(tree)
+    assert changed
+    cte_where = tree.args["with_" if "with_" in tree.args else "with"].expressions[0].this.args["where"].sql()
+    assert "RAND" not in cte_where.upper()
+    assert "a = 1" in cte_where
+
+
+def test_apply_rules_leaves_unsafe_query_unchanged():
+    sql = "WITH c AS (SELECT a, b FROM t) SELECT a FROM c WHERE b > RANDOM()"
+    assert apply_rules(sql) == (sql, [])